@@ -1,33 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status as fast_status, Query
 from core.auth import get_current_user
-from core.db import DB
+from core.database import get_db,get_read_db
+from sqlalchemy.orm import Session
 from core.models.base import DATA_STATUS
 from core.models.article import Article,ArticleBase
+from core.feeds import FEEDS
 from sqlalchemy import and_, or_, desc
 from .base import success_response, error_response
 from core.config import cfg
-from apis.base import format_search_kw
+from apis.base import format_search_kw,keyset_filter,keyset_order,next_cursor,SEARCH_DOC
 from core.print import print_warning, print_info, print_error, print_success
 router = APIRouter(prefix=f"/articles", tags=["文章管理"])
 
 
     
 @router.delete("/clean", summary="清理无效文章(MP_ID不存在于Feeds表中的文章)")
-async def clean_orphan_articles(
+def clean_orphan_articles(
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
-        from core.models.feed import Feed
-        from core.models.article import Article
-        
-        # 找出Articles表中mp_id不在Feeds表中的记录
-        subquery = session.query(Feed.id).subquery()
-        deleted_count = session.query(Article)\
-            .filter(~Article.mp_id.in_(subquery))\
-            .delete(synchronize_session=False)
-        
-        session.commit()
+        from core.db import DB
+        deleted_count = DB.delete_orphan_articles()
         
         return success_response({
             "message": "清理无效文章成功",
@@ -45,7 +39,7 @@ async def clean_orphan_articles(
         )
     
 @router.delete("/clean_duplicate_articles", summary="清理重复文章")
-async def clean_duplicate(
+def clean_duplicate(
     current_user: dict = Depends(get_current_user)
 ):
     try:
@@ -67,37 +61,60 @@ async def clean_duplicate(
 
 
 @router.api_route("", summary="获取文章列表",methods= ["GET", "POST"], operation_id="get_articles_list")
-async def get_articles(
+def get_articles(
     offset: int = Query(0, ge=0),
     limit: int = Query(5, ge=1, le=100),
     status: str = Query(None),
-    search: str = Query(None),
+    search: str = Query(None, description=SEARCH_DOC),
     mp_id: str = Query(None),
     has_content:bool=Query(False),
+    cursor: str = Query(None, description="分页游标，传入上一页返回的next_cursor"),
+    with_total: bool = Query(True, description="是否返回总数"),
+    session: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
       
         
         # 构建查询条件
         query = session.query(ArticleBase)
         if has_content:
-            query=session.query(Article)
+            # 只有需要正文时才加载正文存储
+            from sqlalchemy.orm import selectinload
+            query=session.query(Article).options(selectinload(Article.body))
         if status:
             query = query.filter(Article.status == status)
         else:
             query = query.filter(Article.status != DATA_STATUS.DELETED)
         if mp_id:
             query = query.filter(Article.mp_id == mp_id)
+        ranked = None
         if search:
-            query = query.filter(
-               format_search_kw(search)
-            )
+            from core.search import SEARCH
+            ranked = SEARCH.rank_subquery(session, search) if not cursor else None
+            if ranked is not None:
+                query = query.join(ranked, ranked.c.article_id == Article.id)
+            else:
+                query = query.filter(
+                   format_search_kw(search, session)
+                )
         
-        # 获取总数
-        total = query.count()
-        query= query.order_by(Article.publish_time.desc()).offset(offset).limit(limit)
+        # 获取总数(游标分页时可关闭)，无检索条件时读取统计计数
+        total = None
+        if with_total:
+            if not search:
+                from core.stats import STATS
+                total = STATS.articles_total(session, mp_id, status)
+            if total is None:
+                total = query.count()
+        if ranked is not None:
+            # 全文检索按相关度排序
+            query = query.order_by(ranked.c.rank, *keyset_order()).offset(offset).limit(limit)
+        elif cursor:
+            # 游标分页：按(publish_time, id)定位，不再扫描offset之前的记录
+            query = query.filter(keyset_filter(cursor)).order_by(*keyset_order()).limit(limit)
+        else:
+            query= query.order_by(*keyset_order()).offset(offset).limit(limit)
         # query= query.order_by(Article.id.desc()).offset(offset).limit(limit)
         # 分页查询（按发布时间降序）
         articles = query.all()
@@ -105,25 +122,30 @@ async def get_articles(
         # 打印生成的 SQL 语句（包含分页参数）
         print_warning(query.statement.compile(compile_kwargs={"literal_binds": True}))
                        
-        # 查询公众号名称
-        from core.models.feed import Feed
-        mp_names = {}
-        for article in articles:
-            if article.mp_id and article.mp_id not in mp_names:
-                feed = session.query(Feed).filter(Feed.id == article.mp_id).first()
-                mp_names[article.mp_id] = feed.mp_name if feed else "未知公众号"
-        
         # 合并公众号名称到文章列表
         article_list = []
         for article in articles:
-            article_dict = article.__dict__
-            article_dict["mp_name"] = mp_names.get(article.mp_id, "未知公众号")
+            article_dict = {k: v for k, v in article.__dict__.items() if k != "body"}
+            if has_content:
+                article_dict["content"] = article.content
+            # 公众号名称从缓存读取
+            article_dict["mp_name"] = FEEDS.name(article.mp_id)
+            if search:
+                # 检索结果附带高亮标题和摘要片段
+                from core.search import SEARCH, highlight, snippet
+                terms = SEARCH.terms(search)
+                article_dict["highlight"] = {
+                    "title": highlight(article.title, terms),
+                    "snippet": snippet(article.description or article.title, terms),
+                }
             article_list.append(article_dict)
         
         from .base import success_response
         return success_response({
             "list": article_list,
-            "total": total
+            "total": total,
+            # 按相关度排序的检索结果使用offset分页，游标只适用于按发布时间排序的结果
+            "next_cursor": next_cursor(articles, limit) if ranked is None else None
         })
     except HTTPException as e:
         raise e
@@ -137,12 +159,12 @@ async def get_articles(
         )
 
 @router.get("/{article_id}", summary="获取文章详情")
-async def get_article_detail(
+def get_article_detail(
     article_id: str,
     content: bool = False,
+    session: Session = Depends(get_read_db),
     # current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         article = session.query(Article).filter(Article.id==article_id).filter(Article.status != DATA_STATUS.DELETED).first()
         if not article:
@@ -154,7 +176,9 @@ async def get_article_detail(
                     message="文章不存在"
                 )
             )
-        return success_response(article)
+        data = {k: v for k, v in article.__dict__.items() if k != "body"}
+        data["content"] = article.content
+        return success_response(data)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -167,11 +191,11 @@ async def get_article_detail(
         )   
 
 @router.delete("/{article_id}", summary="删除文章")
-async def delete_article(
+def delete_article(
     article_id: str,
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.article import Article
         
@@ -203,11 +227,11 @@ async def delete_article(
         )
 
 @router.get("/{article_id}/next", summary="获取下一篇文章")
-async def get_next_article(
+def get_next_article(
     article_id: str,
+    session: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         # 获取当前文章的发布时间
         current_article = session.query(Article).filter(Article.id == article_id).first()
@@ -250,11 +274,11 @@ async def get_next_article(
         )
 
 @router.get("/{article_id}/prev", summary="获取上一篇文章")
-async def get_prev_article(
+def get_prev_article(
     article_id: str,
+    session: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         # 获取当前文章的发布时间
         current_article = session.query(Article).filter(Article.id == article_id).first()
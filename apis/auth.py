@@ -23,24 +23,24 @@ def ApiSuccess(data):
     else:
             print("\n登录失败，请检查上述错误信息")
 @router.get("/qr/code", summary="获取登录二维码")
-async def get_qrcode(current_user=Depends(get_current_user)):
+def get_qrcode(current_user=Depends(get_current_user)):
     code_url=WX_API.GetCode(Success)
     return success_response(code_url)
 @router.get("/qr/image", summary="获取登录二维码图片")
-async def qr_image(current_user=Depends(get_current_user)):
+def qr_image(current_user=Depends(get_current_user)):
     return success_response(WX_API.GetHasCode())
 
 @router.get("/qr/status",summary="获取扫描状态")
-async def qr_status(current_user=Depends(get_current_user)):
+def qr_status(current_user=Depends(get_current_user)):
     #  from driver.success import  getStatus
      return success_response({
           "login_status":WX_API.HasLogin,
      })    
 @router.get("/qr/over",summary="扫码完成")
-async def qr_success(current_user=Depends(get_current_user)):
+def qr_success(current_user=Depends(get_current_user)):
      return success_response(WX_API.Close())    
 @router.post("/login", summary="用户登录")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+def login(form_data: OAuth2PasswordRequestForm = Depends()):
     user = authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -62,7 +62,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 
 @router.post("/token",summary="获取Token")
-async def getToken(form_data: OAuth2PasswordRequestForm = Depends()):
+def getToken(form_data: OAuth2PasswordRequestForm = Depends()):
     user = authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -84,11 +84,11 @@ async def getToken(form_data: OAuth2PasswordRequestForm = Depends()):
 
 
 @router.post("/logout", summary="用户注销")
-async def logout(current_user: dict = Depends(get_current_user)):
+def logout(current_user: dict = Depends(get_current_user)):
     return {"code": 0, "message": "注销成功"}
 
 @router.post("/refresh", summary="刷新Token")
-async def refresh_token(current_user: dict = Depends(get_current_user)):
+def refresh_token(current_user: dict = Depends(get_current_user)):
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": current_user["username"]}, expires_delta=access_token_expires
@@ -100,7 +100,7 @@ async def refresh_token(current_user: dict = Depends(get_current_user)):
     })
 
 @router.get("/verify", summary="验证Token有效性")
-async def verify_token(current_user: dict = Depends(get_current_user)):
+def verify_token(current_user: dict = Depends(get_current_user)):
     """验证当前token是否有效"""
     return success_response({
         "is_valid": True,
@@ -24,7 +24,62 @@ def error_response(code: int, message: str, data=None):
     }
 from sqlalchemy import and_,or_
 from core.models import Article
-def format_search_kw(keyword: str):
-    words = keyword.replace("-"," ").replace("|"," ").split(" ")
-    rule = or_(*[Article.title.like(f"%{w}%") for w in words])
-    return rule
\ No newline at end of file
+# 检索参数的接口说明
+SEARCH_DOC = ("检索关键字，空格分隔的多个关键字为OR关系。全文索引检索标题、摘要和正文；"
+              "关键字含单个汉字或全文索引不可用时按标题和摘要LIKE检索")
+
+def format_search_kw(keyword: str, session=None):
+    """文章检索条件，全文索引可用时使用全文索引，否则回退到标题和摘要LIKE"""
+    if session is not None:
+        from core.search import SEARCH
+        from sqlalchemy import select
+        ranked = SEARCH.rank_subquery(session, keyword)
+        if ranked is not None:
+            return Article.id.in_(select(ranked.c.article_id))
+    words = [w for w in keyword.replace("-"," ").replace("|"," ").split(" ") if w.strip()] or [keyword]
+    rule = or_(*[or_(Article.title.like(f"%{w}%"), Article.description.like(f"%{w}%")) for w in words])
+    return rule
+
+def encode_cursor(publish_time: int, article_id: str) -> str:
+    """将(publish_time, id)编码为不透明的分页游标"""
+    import base64,json
+    raw = json.dumps([publish_time, article_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """解析分页游标，返回(publish_time, id)"""
+    import base64,json
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        publish_time, article_id = json.loads(raw.decode("utf-8"))
+        return int(publish_time), str(article_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+def keyset_filter(cursor: str):
+    """游标分页条件：按(publish_time, id)降序取游标之后的记录
+
+    没有发布时间的文章无法参与比较，游标分页时不返回
+    """
+    publish_time, article_id = decode_cursor(cursor)
+    return and_(
+        Article.publish_time.isnot(None),
+        or_(
+            Article.publish_time < publish_time,
+            and_(Article.publish_time == publish_time, Article.id < article_id)
+        )
+    )
+
+def keyset_order():
+    """与游标分页配合使用的排序"""
+    return (Article.publish_time.desc(), Article.id.desc())
+
+def next_cursor(articles: list, limit: int):
+    """根据当前页结果生成下一页游标，没有更多数据时返回None"""
+    if len(articles) < limit or not articles:
+        return None
+    last = articles[-1]
+    if last.publish_time is None:
+        # 降序排列时没有发布时间的文章排在最后，之后没有可用游标定位的记录
+        return None
+    return encode_cursor(last.publish_time, last.id)
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 from core.models.config_management import ConfigManagement
-from core.db  import DB
+from core.database import get_db
 from core.auth import get_current_user
 from .base import  success_response, error_response
 from core.config import cfg
@@ -38,9 +38,9 @@ def list_configs(
 @router.get("/{config_key}", summary="获取单个配置项详情")
 def get_config(
     config_key: str,
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db=DB.get_session()
     """获取单个配置项详情"""
     try:
         config = db.query(ConfigManagement).filter(ConfigManagement.config_key == config_key).first()
@@ -58,9 +58,9 @@ class ConfigManagementCreate(BaseModel):
 @router.post("", summary="创建配置项")
 def create_config(
     config_data: ConfigManagementCreate = Body(...),
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db=DB.get_session()
     """创建配置项"""
     try:
         # 检查config_key是否已存在
@@ -85,9 +85,9 @@ def create_config(
 def update_config(
     config_key: str=Path(...,min_length=1),
     config_data: ConfigManagementCreate = Body(...),
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db=DB.get_session()
     """更新配置项"""
     try:
         db_config = db.query(ConfigManagement).filter(ConfigManagement.config_key == config_key).first()
@@ -109,9 +109,9 @@ def update_config(
 @router.delete("/{config_key}",summary="删除配置项")
 def delete_config(
     config_key: str,
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db=DB.get_session()
     """删除配置项"""
     try:
         db_config = db.query(ConfigManagement).filter(ConfigManagement.config_key == config_key).first()
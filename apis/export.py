@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Uplo
 from fastapi.responses import FileResponse
 from starlette.background import BackgroundTask
 from core.auth import get_current_user
-from core.db import DB
+from core.database import get_db
+from sqlalchemy.orm import Session
 from core.wx import search_Biz
 from .base import success_response, error_response
 from datetime import datetime
@@ -14,13 +15,13 @@ import io
 import os
 router = APIRouter(prefix=f"/export", tags=["导入/导出"])
 @router.get("/mps/export", summary="导出公众号列表")
-async def export_mps(
+def export_mps(
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
     kw: str = Query(""),
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         query = session.query(Feed)
@@ -67,16 +68,16 @@ async def export_mps(
         )
 
 @router.post("/mps/import", summary="导入公众号列表")
-async def import_mps(
+def import_mps(
     file: UploadFile = File(...),
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         
         # 读取上传的CSV文件
-        contents = (await file.read()).decode('utf-8-sig')
+        contents = file.file.read().decode('utf-8-sig')
         csv_reader = csv.DictReader(io.StringIO(contents))
         
         # 验证必要字段
@@ -133,6 +134,9 @@ async def import_mps(
                 imported += 1
         
         session.commit()
+        # 导入后刷新公众号缓存
+        from core.feeds import FEEDS
+        FEEDS.invalidate()
         
         return success_response({
             "message": "导入公众号列表成功",
@@ -156,14 +160,14 @@ async def import_mps(
         )
 
 @router.get("/mps/opml", summary="导出公众号列表为OPML格式")
-async def export_mps_opml(
+def export_mps_opml(
     request: Request,
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
     kw: str = Query(""),
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         query = session.query(Feed)
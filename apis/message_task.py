@@ -12,20 +12,20 @@ from sqlalchemy.orm import Session
 
 # 3. 本地应用/模块导入
 from core.auth import get_current_user
-from core.db import DB
+from core.database import get_db
 from core.models.message_task import MessageTask
 from .base import success_response, error_response
 
 router = APIRouter(prefix="/message_tasks", tags=["消息任务"])
 
 @router.get("", summary="获取消息任务列表")
-async def list_message_tasks(
+def list_message_tasks(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     status: Optional[int] = None,
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db=DB.get_session()
     """
     获取消息任务列表
     
@@ -47,7 +47,11 @@ async def list_message_tasks(
         if status is not None:
             query = query.filter(MessageTask.status == status)
         
-        total = query.count()
+        if status is not None:
+            total = query.count()
+        else:
+            from core.stats import STATS
+            total = STATS.total(db, "message_tasks", query=query)
         message_tasks = query.offset(offset).limit(limit).all()
         
         return success_response({
@@ -62,11 +66,11 @@ async def list_message_tasks(
         return error_response(code=500, message=str(e))
 
 @router.get("/{task_id}", summary="获取单个消息任务详情")
-async def get_message_task(
+def get_message_task(
     task_id: str,
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db=DB.get_session()
     """
     获取单个消息任务详情
     
@@ -90,7 +94,7 @@ async def get_message_task(
     except Exception as e:
         return error_response(code=500, message=str(e))
 @router.get("/{task_id}/run", summary="执行单个消息任务详情")
-async def run_message_task(
+def run_message_task(
     task_id: str,
     isTest:bool=Query(False),
     current_user: dict = Depends(get_current_user)
@@ -151,8 +155,9 @@ class MessageTaskCreate(BaseModel):
     status: Optional[int] = 0
 
 @router.post("", summary="创建消息任务", status_code=status.HTTP_201_CREATED)
-async def create_message_task(
+def create_message_task(
     task_data: MessageTaskCreate = Body(...),
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -168,7 +173,6 @@ async def create_message_task(
         400: 请求数据验证失败
         500: 数据库操作异常
     """
-    db=DB.get_session()
     try:
         db_task = MessageTask(
             id=str(uuid.uuid4()),
@@ -190,12 +194,12 @@ async def create_message_task(
         return error_response(code=500, message=str(e))
 
 @router.put("/{task_id}", summary="更新消息任务")
-async def update_message_task(
+def update_message_task(
     task_id: str,
     task_data: MessageTaskCreate = Body(...),
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    db=DB.get_session()
     """
     更新消息任务
     
@@ -237,7 +241,7 @@ async def update_message_task(
         db.rollback()
         return error_response(code=500, message=str(e))
 @router.put("/job/fresh",summary="重载任务")
-async def fresh_message_task(
+def fresh_message_task(
      current_user: dict = Depends(get_current_user)
 ):
     """
@@ -247,8 +251,9 @@ async def fresh_message_task(
     reload_job()
     return success_response(message="任务已经重载成功")
 @router.delete("/{task_id}",summary="删除消息任务")
-async def delete_message_task(
+def delete_message_task(
     task_id: str,
+    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -264,7 +269,6 @@ async def delete_message_task(
         404: 消息任务不存在
         500: 数据库操作异常
     """
-    db=DB.get_session()
     try:
         db_task = db.query(MessageTask).filter(MessageTask.id == task_id).first()
         if not db_task:
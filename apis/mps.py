@@ -2,15 +2,18 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Uplo
 from fastapi.responses import FileResponse
 from fastapi.background import BackgroundTasks
 from core.auth import get_current_user
-from core.db import DB
+from core.database import get_db
+from sqlalchemy.orm import Session
 from core.wx import search_Biz
 from .base import success_response, error_response
 from datetime import datetime
 from core.config import cfg
 from core.res import save_avatar_locally
+from core.blocking import run_blocking
+from core.feeds import FEEDS
 import io
 import os
-from jobs.article import UpdateArticle
+from jobs.article import UpdateArticle,UpdateArticles
 router = APIRouter(prefix=f"/mps", tags=["公众号管理"])
 # import core.db as db
 # UPDB=db.Db("数据抓取")
@@ -25,9 +28,9 @@ async def search_mp(
     offset: int = 0,
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
-        result = search_Biz(kw,limit=limit,offset=offset)
+        # 网络请求放入线程池，避免阻塞事件循环
+        result = await run_blocking(search_Biz,kw,limit=limit,offset=offset)
         data={
             'list':result.get('list') if result is not None else [],
             'page':{
@@ -48,19 +51,23 @@ async def search_mp(
         )
 
 @router.get("", summary="获取公众号列表")
-async def get_mps(
+def get_mps(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     kw: str = Query(""),
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         query = session.query(Feed)
         if kw:
             query = query.filter(Feed.mp_name.ilike(f"%{kw}%"))
-        total = query.count()
+        if kw:
+            total = query.count()
+        else:
+            from core.stats import STATS
+            total = STATS.total(session, "feeds", query=query)
         mps = query.order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
         return success_response({
             "list": [{
@@ -89,13 +96,13 @@ async def get_mps(
         )
 
 @router.get("/update/{mp_id}", summary="更新公众号文章")
-async def update_mps(
+def update_mps(
      mp_id: str,
      start_page: int = 0,
      end_page: int = 1,
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         mp = session.query(Feed).filter(Feed.id == mp_id).first()
@@ -119,7 +126,7 @@ async def update_mps(
         def UpArt(mp):
             from core.wx import WxGather
             wx=WxGather().Model()
-            wx.get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,CallBack=UpdateArticle,start_page=start_page,MaxPage=end_page)
+            wx.get_Articles(mp.faker_id,Mps_id=mp.id,Mps_title=mp.mp_name,CallBack=UpdateArticle,BatchCallBack=UpdateArticles,start_page=start_page,MaxPage=end_page)
             result=wx.articles
         import threading
         threading.Thread(target=UpArt,args=(mp,)).start()
@@ -140,11 +147,11 @@ async def update_mps(
         )
 
 @router.get("/{mp_id}", summary="获取公众号详情")
-async def get_mp(
+def get_mp(
     mp_id: str,
+    session: Session = Depends(get_db),
     # current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         mp = session.query(Feed).filter(Feed.id == mp_id).first()
@@ -173,7 +180,7 @@ async def get_mp_by_article(
 ):
     try:
         from driver.wxarticle import Web
-        info=Web.get_article_content(url)
+        info=await run_blocking(Web.get_article_content,url)
         if not info:
             raise HTTPException(
                 status_code=status.HTTP_201_CREATED,
@@ -194,15 +201,15 @@ async def get_mp_by_article(
         )
 
 @router.post("", summary="添加公众号")
-async def add_mp(
+def add_mp(
     mp_name: str = Body(..., min_length=1, max_length=255),
     mp_cover: str = Body(None, max_length=255),
     mp_id: str = Body(None, max_length=255),
     avatar: str = Body(None, max_length=500),
     mp_intro: str = Body(None, max_length=255),
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         import time
@@ -238,6 +245,7 @@ async def add_mp(
             session.add(new_feed)
            
         session.commit()
+        FEEDS.invalidate()
         
         feed = existing_feed if existing_feed else new_feed
          #在这里实现第一次添加获取公众号文章
@@ -245,7 +253,7 @@ async def add_mp(
             from core.queue import TaskQueue
             from core.wx import WxGather
             Max_page=int(cfg.get("max_page","2"))
-            TaskQueue.add_task( WxGather().Model().get_Articles,faker_id=feed.faker_id,Mps_id=feed.id,CallBack=UpdateArticle,MaxPage=Max_page,Mps_title=mp_name)
+            TaskQueue.add_task( WxGather().Model().get_Articles,faker_id=feed.faker_id,Mps_id=feed.id,CallBack=UpdateArticle,BatchCallBack=UpdateArticles,MaxPage=Max_page,Mps_title=mp_name)
             
         return success_response({
             "id": feed.id,
@@ -269,11 +277,11 @@ async def add_mp(
 
 
 @router.delete("/{mp_id}", summary="删除订阅号")
-async def delete_mp(
+def delete_mp(
     mp_id: str,
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    session = DB.get_session()
     try:
         from core.models.feed import Feed
         mp = session.query(Feed).filter(Feed.id == mp_id).first()
@@ -288,6 +296,7 @@ async def delete_mp(
         
         session.delete(mp)
         session.commit()
+        FEEDS.invalidate()
         return success_response({
             "message": "订阅号删除成功",
             "id": mp_id
@@ -1,94 +1,233 @@
 from fastapi import APIRouter, Request, HTTPException
 import httpx
-from fastapi.responses import Response
+from fastapi.responses import Response, FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import os
+import anyio
+import asyncio
 import hashlib
-import time
-import json
 from core.config import cfg
-CACHE_DIR = cfg.get("cache.dir","data/cache")
-CACHE_TTL = 3600  # 缓存过期时间1小时
+from core.http_client import get_http_client
+from core.image_cache import IMAGES, IMAGE_HOSTS, ImageMeta, url_key
+from core.image_resize import IMAGE_RESIZER
+from core.print import print_warning
+# 不转发、不缓存的上游响应头：逐跳头，以及由本服务重新计算的长度和编码
+EXCLUDED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "keep-alive", "date", "server"}
+# 正在从上游获取的图片 缓存键 -> 完成事件，同一图片的并发请求只回源一次，其余请求等待写入缓存后直接发送
+_inflight = {}
+# 缓存索引(SQLite)的读写和文件操作都放入线程池执行，不阻塞事件循环
+
+
+def _release(key: str, flight: asyncio.Event):
+    """回源结束，唤醒等待同一图片的请求"""
+    if _inflight.get(key) is flight:
+        del _inflight[key]
+    flight.set()
+
+
+def _filter_headers(headers) -> dict:
+    return {k: v for k, v in headers.items() if k.lower() not in EXCLUDED_HEADERS}
+
+
+def _vary() -> dict:
+    # 按Accept协商格式时，不同客户端得到的内容不同
+    return {"Vary": "Accept"} if IMAGE_RESIZER.negotiate() else {}
+
+
+async def _cached_response(meta: ImageMeta) -> FileResponse:
+    """缓存命中时直接发送文件，支持Range请求"""
+    await run_in_threadpool(IMAGES.hit, meta)
+    return FileResponse(IMAGES.path(meta.blob), media_type=meta.content_type,
+                        headers={"Cache-Control": f"public, max-age={IMAGES.ttl()}", **_vary()})
+
+
+async def _image_response(meta: ImageMeta, opts: dict) -> FileResponse:
+    """发送缓存的图片，需要缩放或转换格式时发送转换结果"""
+    if opts is not None:
+        meta = await IMAGE_RESIZER.derive(meta, opts)
+    return await _cached_response(meta)
+
+
+def _tee(resp: httpx.Response, key: str, url: str, flight: asyncio.Event):
+    """将上游内容边转发边写入缓存，完整接收后再放入缓存位置"""
+    async def body():
+        tmp = None
+        f = None
+        size = 0
+        digest = hashlib.sha256()
+        complete = False
+        try:
+            tmp = await run_in_threadpool(IMAGES.temp_path, key)
+            f = await anyio.open_file(tmp, 'wb')
+        except OSError as e:
+            print_warning(f"缓存响应失败: {str(e)}")
+        try:
+            async for chunk in resp.aiter_bytes():
+                size += len(chunk)
+                if f is not None:
+                    try:
+                        await f.write(chunk)
+                        digest.update(chunk)
+                    except OSError as e:
+                        print_warning(f"缓存响应失败: {str(e)}")
+                        await f.aclose()
+                        f = None
+                        await run_in_threadpool(os.unlink, tmp)
+                yield chunk
+            complete = True
+        finally:
+            try:
+                await resp.aclose()
+                if f is not None:
+                    await f.aclose()
+                    try:
+                        if complete:
+                            await run_in_threadpool(IMAGES.commit, key, tmp, url, size, digest.hexdigest(),
+                                                    content_type=resp.headers.get("content-type"),
+                                                    etag=resp.headers.get("etag"),
+                                                    last_modified=resp.headers.get("last-modified"))
+                        else:
+                            await run_in_threadpool(os.unlink, tmp)
+                    except Exception as e:
+                        print_warning(f"缓存响应失败: {str(e)}")
+            finally:
+                # 请求被取消时遗留的临时文件由后台清理
+                _release(key, flight)
+    return body()
+
+
+async def _close_quietly(resp: httpx.Response):
+    try:
+        await resp.aclose()
+    except Exception:
+        pass
+
+
+def _finish(body, resp: httpx.Response, key: str, flight: asyncio.Event) -> BackgroundTask:
+    """响应结束后的清理：客户端在开始读取正文前断开时，生成器的finally不会执行，
+    在这里关闭生成器和上游响应并释放回源标记(已正常结束时均为空操作)"""
+    async def finish():
+        try:
+            await body.aclose()
+            await _close_quietly(resp)
+        finally:
+            _release(key, flight)
+    return BackgroundTask(finish)
 
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
 
 router = APIRouter(prefix="/res", tags=["资源反向代理"])
 @router.api_route("/logo/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"], operation_id="reverse_proxy_logo")
 async def reverse_proxy(request: Request, path: str):
-    hosts=["mmbiz.qpic.cn","mmbiz.qlogo.cn","mmecoa.qpic.cn"]
     path=path.replace("https://", "http://")
     from urllib.parse import urlparse
     parsed_url = urlparse(path)
     host = parsed_url.netloc
-    if  host not  in hosts:
+    if  host not  in IMAGE_HOSTS:
         return Response(
         content="只允许访问微信公众号图标，请使用正确的域名。",
         status_code=301,
         headers={"Location":path},
     )
-    
-    # 生成缓存文件名
-    cache_key = f"{request.method}_{path}".encode('utf-8')
-    cache_filename = os.path.join(CACHE_DIR, hashlib.sha256(cache_key).hexdigest())
-    
+
+    # 生成缓存键
+    cache_key = url_key(path)
+
+    # 缩放及格式转换参数
+    opts = None
+    if request.method == "GET":
+        opts = IMAGE_RESIZER.options(request.query_params, request.headers.get("accept", ""))
+
     # 检查缓存是否存在且有效
-    if os.path.exists(cache_filename):
-        file_mtime = os.path.getmtime(cache_filename)
-        if time.time() - file_mtime < CACHE_TTL:
-            with open(cache_filename, 'rb') as f:
-                content = f.read()
-            
-            # 读取缓存的状态码和响应头
-            headers_filename = cache_filename + ".headers"
-            if os.path.exists(headers_filename):
-                with open(headers_filename, 'r', encoding='utf-8') as f:
-                    headers = json.load(f)
-            else:
-                headers = {}
-            
-            media_type = headers.get("Content-Type")
-            status_code = 200  # 默认状态码
-            
-            return Response(
-                content=content,
+    meta = await run_in_threadpool(IMAGES.get, cache_key) if request.method == "GET" else None
+    if meta is not None and meta.fresh():
+        return await _image_response(meta, opts)
+
+    flight = None
+    if request.method == "GET":
+        waiting = _inflight.get(cache_key)
+        if waiting is not None:
+            # 同一图片正在回源，等待其写入缓存；超时或回源失败时自行获取
+            try:
+                await asyncio.wait_for(waiting.wait(), float(cfg.get("http.timeout", 15)))
+            except asyncio.TimeoutError:
+                pass
+            meta = await run_in_threadpool(IMAGES.get, cache_key)
+            if meta is not None and meta.fresh():
+                return await _image_response(meta, opts)
+        flight = _inflight[cache_key] = asyncio.Event()
+
+    resp = None
+    try:
+        target_url = path
+
+        # 共享连接池，上游内容以流的方式转发
+        client = get_http_client()
+        request_data = await request.body()
+        headers = {}
+        if meta is not None:
+            # 缓存已过期，使用条件请求重新验证
+            if meta.etag:
+                headers["If-None-Match"] = meta.etag
+            if meta.last_modified:
+                headers["If-Modified-Since"] = meta.last_modified
+        upstream = client.build_request(
+            method=request.method,
+            url=target_url,
+            headers=headers,
+            content=request_data
+        )
+        try:
+            resp = await client.send(upstream, stream=True)
+        except httpx.HTTPError as e:
+            if flight is not None:
+                _release(cache_key, flight)
+            if meta is not None:
+                # 上游不可用时继续使用过期的缓存
+                return await _image_response(meta, opts)
+            raise HTTPException(status_code=502, detail=f"获取资源失败: {str(e)}")
+
+        status_code = resp.status_code
+        if meta is not None and status_code == 304:
+            await resp.aclose()
+            await run_in_threadpool(IMAGES.revalidated, meta)
+            _release(cache_key, flight)
+            return await _image_response(meta, opts)
+        if request.method == "GET":
+            IMAGES.miss()
+        headers = _filter_headers(resp.headers)
+        media_type = resp.headers.get("Content-Type")
+        if request.method != "GET" or status_code != 200:
+            # 只缓存成功的GET请求
+            if flight is not None:
+                _release(cache_key, flight)
+            return StreamingResponse(
+                resp.aiter_bytes(),
                 status_code=status_code,
                 headers=headers,
-                media_type=media_type
+                media_type=media_type,
+                background=BackgroundTask(resp.aclose)
             )
-    
-    target_url = path
-    
-    client = httpx.AsyncClient()
-    request_data = await request.body()
-    headers = dict(request.headers)
-    headers.pop("host", host)
-    headers.pop("referer", None)
-    print(headers)
-    resp = await client.request(
-        method=request.method,
-        url=target_url,
-        # headers=headers,
-        content=request_data
-    )
-    
-    content = resp.content
-    status_code = resp.status_code
-    headers = dict(resp.headers)
-    media_type = resp.headers.get("Content-Type")
-    try:
-        # 缓存响应
-        with open(cache_filename, 'wb') as f:
-            f.write(content)
-        
-        # 缓存响应头
-        headers_filename = cache_filename + ".headers"
-        with open(headers_filename, 'w', encoding='utf-8') as f:
-            json.dump(headers, f)
-    except Exception as e:
-        print(f"缓存响应失败: {str(e)}")    
-    return Response(
-        content=content,
-        status_code=status_code,
-        headers=headers,
-        media_type=media_type
-    )
\ No newline at end of file
+        body = _tee(resp, cache_key, path, flight)
+        if opts is not None:
+            # 需要缩放或转换格式时先完整接收原图
+            async for _ in body:
+                pass
+            meta = await run_in_threadpool(IMAGES.get, cache_key)
+            if meta is None:
+                raise HTTPException(status_code=502, detail="获取资源失败")
+            return await _image_response(meta, opts)
+        return StreamingResponse(
+            body,
+            status_code=status_code,
+            headers={**headers, **_vary()},
+            media_type=media_type,
+            background=_finish(body, resp, cache_key, flight)
+        )
+    except BaseException:
+        # 登记回源之后的任何异常(包括客户端断开导致的取消)都释放等待者并关闭上游响应
+        if flight is not None:
+            _release(cache_key, flight)
+        if resp is not None:
+            await _close_quietly(resp)
+        raise
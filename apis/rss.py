@@ -1,14 +1,24 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, Request,Response
 from fastapi import status
-from fastapi.responses import Response
+from fastapi.responses import Response,StreamingResponse
 from core.db import DB
+from core.database import get_read_db
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from core.rss import RSS
 from core.models.feed import Feed
+from core.feeds import FEEDS
+from core.feed_cache import FEED_CACHE,conditional_response
+from core.content_cache import CONTENT_CACHE
+from core.feed_warmer import FEED_WARMER
 import json
+import functools
+import itertools
+from urllib.parse import quote
 from .base import success_response, error_response
 from core.auth import get_current_user
 from core.config import cfg
-from apis.base import format_search_kw
+from apis.base import format_search_kw,keyset_filter,keyset_order,next_cursor,encode_cursor,decode_cursor,SEARCH_DOC
 from core.print import print_error,print_success
 def verify_rss_access(current_user: dict = Depends(get_current_user)):
     """
@@ -26,38 +36,50 @@ def verify_rss_access(current_user: dict = Depends(get_current_user)):
         )
     return current_user
 
+def cursor_headers(request: Request,next_page:str=None)->dict:
+    """游标分页时通过Link头返回下一页地址"""
+    if not next_page:
+        return {}
+    # request.url中的路径已解码，中文关键词需重新编码，否则无法写入响应头
+    url=request.url
+    next_url=url.replace(path=quote(url.path)).include_query_params(cursor=next_page)
+    return {"Link":f'<{next_url}>; rel="next"',"X-Next-Cursor":next_page}
+
 router = APIRouter(prefix="/rss",tags=["Rss"])
 feed_router = APIRouter(prefix="/feed",tags=["Feed"])
 
 @router.get("/{feed_id}/api", summary="获取特定RSS源详情")
-async def get_rss_source(
+def get_rss_source(
     feed_id: str,
     request: Request,
     limit: int = Query(100, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    session: Session = Depends(get_read_db),
     # current_user: dict = Depends(verify_rss_access)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True)
+    return get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True,session=session)
 
 
 
 
 
 @router.get("/fresh", summary="更新并获取RSS订阅列表")
-async def update_rss_feeds( 
+def update_rss_feeds( 
     request: Request,
     limit: int = Query(100, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    session: Session = Depends(get_read_db),
     # current_user: dict = Depends(get_current_user)
 ):
-    return await get_rss_feeds(request=request, limit=limit,offset=offset, is_update=True)
+    return get_rss_feeds(request=request, limit=limit,offset=offset, is_update=True,session=session)
 
 @router.get("", summary="获取RSS订阅列表")
-async def get_rss_feeds(
+def get_rss_feeds(
     request: Request,
     limit: int = Query(10, ge=1, le=30),
     offset: int = Query(0, ge=0),
     is_update:bool=False,
+    session: Session = Depends(get_read_db),
     # current_user: dict = Depends(get_current_user)
 ):
     rss=RSS(name=f'all_{limit}_{offset}')
@@ -67,10 +89,11 @@ async def get_rss_feeds(
             content=rss_xml,
             media_type="application/xml"
         )
-    session = DB.get_session()
     try:
-        total = session.query(Feed).count()
-        feeds = session.query(Feed).order_by(Feed.created_at.desc()).limit(limit).offset(offset).all()
+        from datetime import datetime
+        # 分页在数据库中完成，创建时间为空的排在最后，相同时按id排序保证翻页稳定
+        feeds = session.query(Feed).order_by(Feed.created_at.is_(None), Feed.created_at.desc(), Feed.id)\
+            .offset(offset).limit(limit).all()
         rss_domain=cfg.get("rss.base_url",request.base_url)
         # 转换为RSS格式数据
         rss_list = [{
@@ -79,7 +102,8 @@ async def get_rss_feeds(
             "link":  f"{rss_domain}rss/{feed.id}",
             "description": feed.mp_intro,
             "image": feed.mp_cover,
-            "updated": feed.created_at.isoformat()
+            # 没有创建时间的公众号使用更新时间
+            "updated": (feed.created_at or feed.updated_at or datetime.fromtimestamp(0)).isoformat()
         } for feed in feeds]
         
         # 生成RSS XML
@@ -100,9 +124,28 @@ async def get_rss_feeds(
         )
 
 @router.get("/content/{content_id}", summary="获取缓存的文章内容")
-async def get_rss_feed(content_id: str):
+def get_rss_feed(content_id: str, session: Session = Depends(get_read_db)):
     rss = RSS()
     content = rss.get_cached_content(content_id)
+    if content is None:
+        # 未缓存时从正文存储读取
+        from core.models.article import Article
+        from sqlalchemy.orm import selectinload
+        article = session.query(Article)\
+            .options(selectinload(Article.body))\
+            .filter(Article.id == content_id).first()
+        if article is not None and article.content is not None:
+            _feed = FEEDS.get(article.mp_id)
+            content = {
+                "id": article.id,
+                "title": article.title,
+                "content": article.content,
+                "publish_time": article.publish_time,
+                "mp_id": article.mp_id,
+                "pic_url": article.pic_url,
+                "mp_name": _feed.mp_name if _feed else ""
+            }
+            rss.cache_content(article.id, content, article.body.content_hash if article.body else None)
       
     if content is None:
         raise HTTPException(
@@ -148,11 +191,12 @@ def UpdateArticle(art:dict):
 
 
 @router.api_route("/{feed_id}/fresh", summary="更新并获取公众号文章RSS")
-async def update_rss_feeds( 
+def update_rss_feeds( 
     request: Request,
     feed_id: str,
     limit: int = Query(100, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    session: Session = Depends(get_read_db),
     # current_user: dict = Depends(get_current_user)
 ):
         #如果需要放开授权，请只允许内网访问，防止 被利用攻击 放开授权办法，注释上面current_user: dict = Depends(get_current_user)
@@ -164,82 +208,98 @@ async def update_rss_feeds(
         # wx.get_Articles(mp.faker_id,Mps_id=mp.id,CallBack=UpdateArticle)
         # result=wx.articles
 
-        return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True)
+        FEED_CACHE.invalidate(feed_id)
+        return get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=True,session=session)
 
 
 
-@router.get("/{feed_id}", summary="获取公众号文章")
-async def get_mp_articles_source(
-    request: Request,
-    feed_id: str=None,
-    tag_id:str=None,
-    ext:str="xml",
-    limit: int = Query(10, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-    kw:str="",
-    is_update:bool=True,
-    content_type:str=Query(None,alias="ctype"),
-    template:str=None
-    # current_user: dict = Depends(get_current_user)
-):
-    rss=RSS(name=f'{tag_id}_{feed_id}_{limit}_{offset}',ext=ext)
-    rss.set_content_type(content_type)
-    rss_xml = rss.get_cache()
-    if rss_xml is not None and is_update==False:
-         return Response(
-            content=rss_xml,
-            media_type=rss.get_type()
-        )
-    session = DB.get_session()
-    try:
-        from core.models.article import Article
-        from core.models.tags import Tags
-        # 查询公众号信息
-        feed = session.query(Feed)
-        query=session.query(Feed, Article).join(Article, Feed.id == Article.mp_id)
-        rss_domain=cfg.get("rss.base_url",str(request.base_url))
-        if feed_id not in ["all",None]:
-            feed=feed.filter(Feed.id == feed_id).first()
-            query=query.filter(Article.mp_id==feed_id)
-        else:
-            feed=Feed()
-            feed.mp_name=cfg.get("rss.title","WeRss") or "WeRss"
-            feed.mp_intro=cfg.get("rss.description") or "WeRss高效订阅我的公众号"
-            feed.mp_cover=cfg.get("rss.cover") or f"{rss_domain}static/logo.svg"
-            #如果传入了tag_id就加载tag对应的订阅信息
-            if tag_id is not None:
-                tags=session.query(Tags).filter(Tags.id == tag_id).first()
-                if tags:
-                    mps_ids = [str(mp['id']) for mp in json.loads(tags.mps_id)] if tags.mps_id else []
-                    query=query.filter(Feed.id.in_(mps_ids))
-                    feed.mp_name = tags.name
-                    feed.mp_intro = tags.intro
-                    feed.mp_cover = f'{rss_domain}{tags.cover}'
+def feed_source(session: Session, request: Request, feed_id: str=None, tag_id: str=None, offset: int=0, kw: str="", cursor: str=None):
+    """订阅源信息及排序后的文章查询(未限制条数)
 
-        
-        if not feed:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=error_response(
-                    code=40401,
-                    message="公众号不存在"
-                )
+    Returns:
+        tuple: (订阅源信息, 文章查询, 站点地址)
+    """
+    from core.models.article import Article
+    from core.models.tags import Tags
+    # 公众号信息从缓存读取，文章只关联存在的公众号
+    query=session.query(Article)
+    # 使用子查询而不是展开公众号id列表，公众号很多时不会超出SQLite的参数数量限制
+    mps_ids=select(Feed.id)
+    rss_domain=cfg.get("rss.base_url",str(request.base_url))
+    if feed_id not in ["all",None]:
+        feed=FEEDS.get(feed_id)
+        query=query.filter(Article.mp_id==feed_id)
+    else:
+        feed=Feed()
+        feed.mp_name=cfg.get("rss.title","WeRss") or "WeRss"
+        feed.mp_intro=cfg.get("rss.description") or "WeRss高效订阅我的公众号"
+        feed.mp_cover=cfg.get("rss.cover") or f"{rss_domain}static/logo.svg"
+        #如果传入了tag_id就加载tag对应的订阅信息
+        if tag_id is not None:
+            tags=session.query(Tags).filter(Tags.id == tag_id).first()
+            if tags:
+                tag_ids = [str(mp['id']) for mp in json.loads(tags.mps_id)] if tags.mps_id else []
+                # 标签包含的公众号有限，按缓存过滤后直接作为列表条件
+                mps_ids = [id for id in tag_ids if FEEDS.get(id) is not None]
+                feed.mp_name = tags.name
+                feed.mp_intro = tags.intro
+                feed.mp_cover = f'{rss_domain}{tags.cover}'
+        query=query.filter(Article.mp_id.in_(mps_ids))
+
+    
+    if not feed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=error_response(
+                code=40401,
+                message="公众号不存在"
             )
-      
-        # 查询文章列表
-        total = query.count()
-        # articles = query.order_by(Article.publish_time.desc()).limit(limit).offset(offset).all()
-        if kw!="":
-            query=query.filter(format_search_kw(kw))
-        articles =query.order_by(Article.publish_time.desc()).limit(limit).offset(offset).all()
+        )
+  
+    # 查询文章列表
+    # articles = query.order_by(Article.publish_time.desc()).limit(limit).offset(offset).all()
+    if kw!="":
+        # 订阅源检索只作为过滤条件，仍按发布时间排序，游标分页保持有效
+        query=query.filter(format_search_kw(kw,session))
+    if cursor:
+        # 游标分页：按(publish_time, id)定位下一页
+        query=query.filter(keyset_filter(cursor)).order_by(*keyset_order())
+    else:
+        query=query.order_by(*keyset_order()).offset(offset)
+    return feed,query,rss_domain
+
+
+def feed_items(rss: RSS, articles, rss_domain: str, need_content: bool):
+    """将文章转换为RSS条目，需要全文时同时缓存文章内容"""
+    import datetime
+    for article in articles:
+        _feed=FEEDS.get(article.mp_id)
+        if _feed is None:
+            continue
+        hash=None
+        if need_content:
+            # 缓存文章内容，正文哈希未变化时跳过
+            hash=article.body.content_hash if article.body else None
+            if hash is None or not CONTENT_CACHE.has(article.id,hash):
+                content_data = {
+                    "id": article.id,
+                    "title": article.title,
+                    "content": article.content,
+                    "publish_time": article.publish_time,
+                    "mp_id": article.mp_id,
+                    "pic_url": article.pic_url,
+                    "mp_name": _feed.mp_name
+                }
+                rss.cache_content(article.id, content_data, hash)
         # 转换为RSS格式数据
-        import datetime
-        rss_list = [{
+        yield {
             "id": str(article.id),
             "title": article.title or "",
             "link":  f"{rss_domain}rss/feed/{article.id}" if cfg.get("rss.local",False) else article.url,
             "description": article.description if article.description != "" else article.title or "",
-            "content": article.content or "",
+            "content": (article.content or "") if need_content else "",
+            # 正文哈希，用于条目片段缓存
+            "content_hash": hash,
             "image": article.pic_url or "",
             "mp_name":_feed.mp_name or "",
             "updated": datetime.datetime.fromtimestamp(article.publish_time),
@@ -249,28 +309,202 @@ async def get_mp_articles_source(
                     "cover":_feed.mp_cover,
                     "intro":_feed.mp_intro
             }
-        } for _feed,article in articles]
-        
+        }
 
-        # 缓存文章内容
-        for _feed,article in articles:
-            content_data = {
-                "id": article.id,
-                "title": article.title,
-                "content": article.content,
-                "publish_time": article.publish_time,
-                "mp_id": article.mp_id,
-                "pic_url": article.pic_url,
-                "mp_name": _feed.mp_name
-            }
-            rss.cache_content(article.id, content_data)
-        # 生成RSS XML
-        rss_xml = rss.generate(rss_list,ext=ext, title=f"{feed.mp_name}",link=rss_domain,description=feed.mp_intro,image_url=feed.mp_cover,template=template)
-        
-        return Response(
+
+def need_feed_content(ext: str, template: str=None) -> bool:
+    # 只有输出全文(全文RSS、JSON、自定义模板)时才加载正文存储，否则正文由/rss/content按需读取
+    return bool(cfg.get("rss.full_context",False)) or ext=="json" or bool(template)
+
+
+def render_feed(session: Session, request: Request, rss: RSS, feed_id: str=None, tag_id: str=None, ext: str="xml",
+                limit: int=10, offset: int=0, kw: str="", template: str=None, cursor: str=None):
+    """查询文章并生成订阅源
+
+    Returns:
+        tuple: (内容, 媒体类型, 响应头, 依赖的公众号ID列表，None表示依赖全部公众号)
+    """
+    from core.models.article import Article
+    feed,query,rss_domain=feed_source(session,request,feed_id,tag_id,offset,kw,cursor)
+    need_content=need_feed_content(ext,template)
+    if need_content:
+        from sqlalchemy.orm import selectinload
+        query=query.options(selectinload(Article.body))
+    articles =query.limit(limit).all()
+    next_page=next_cursor(articles,limit)
+    rss_list=list(feed_items(rss,articles,rss_domain,need_content))
+    # 生成RSS XML
+    rss_xml = rss.generate(rss_list,ext=ext, title=f"{feed.mp_name}",link=rss_domain,description=feed.mp_intro,image_url=feed.mp_cover,template=template,next_cursor=next_page)
+    # 单个公众号的缓存只在该公众号有新文章时失效，全部文章和标签订阅源依赖所有公众号
+    depends=[feed_id] if feed_id not in ["all",None] else None
+    return rss_xml,rss.get_type(),cursor_headers(request,next_page),depends
+
+
+def stream_feed(session: Session, request: Request, rss: RSS, feed_id: str=None, tag_id: str=None, ext: str="xml",
+                limit: int=10, offset: int=0, kw: str="", cursor: str=None, cache_key: str=None, spec: dict=None) -> StreamingResponse:
+    """流式输出订阅源，文章通过服务端游标逐批读取，内存中只保留当前批次
+
+    第一批条目在返回响应前生成，查询或生成出错时仍可返回错误状态码；之后出错时中断连接，
+    不会以200状态码结束一个不完整的文档。
+    完整内容不超过rss.stream_cache_max_size时写入订阅源内存缓存并记录预热，之后的请求走缓存
+    并支持ETag/304；更大的订阅源不放入内存，每次请求重新流式生成。
+    """
+    from core.models.article import Article
+    from sqlalchemy.orm import selectinload
+    feed,query,rss_domain=feed_source(session,request,feed_id,tag_id,offset,kw,cursor)
+    # 响应头需要在输出内容前确定，先只查询分页键生成下一页游标
+    keys=query.with_entities(Article.publish_time,Article.id).limit(limit).all()
+    next_page=next_cursor(keys,limit)
+    title,intro,cover=feed.mp_name,feed.mp_intro,feed.mp_cover
+    batch=int(cfg.get("rss.stream_batch",20))
+    headers=cursor_headers(request,next_page)
+    media_type=rss.get_type()
+    generation=FEED_CACHE.generation()
+    # 请求会话在响应开始前已关闭，使用独立的只读会话
+    _session=DB.read_session_factory()
+    try:
+        articles=query.with_session(_session).options(selectinload(Article.body)).limit(limit).yield_per(batch)
+        items=feed_items(rss,articles,rss_domain,True)
+        parts=rss.stream(items,ext=ext,title=f"{title}",link=rss_domain,description=intro,image_url=cover,next_cursor=next_page)
+        # 预先生成头部和第一批条目
+        first=[]
+        for chunk in parts:
+            first.append(chunk)
+            if len(first)>batch:
+                break
+    except Exception as e:
+        _session.close()
+        print_error(f"流式输出RSS错误:{e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=error_response(code=50001,message=f"生成RSS失败: {str(e)}")
+        )
+
+    def generate():
+        max_size=int(cfg.get("rss.stream_cache_max_size",4194304))
+        body=[] if cache_key and max_size>0 else None
+        size=0
+        try:
+            for chunk in itertools.chain(first,parts):
+                if body is not None:
+                    body.append(chunk)
+                    size+=len(chunk)
+                    if size>max_size:
+                        body=None
+                yield chunk
+        except Exception as e:
+            print_error(f"流式输出RSS错误:{e}")
+            # 重新抛出使连接中断，客户端不会把不完整的内容当作完整的订阅源
+            raise
+        finally:
+            _session.close()
+        if body is not None:
+            depends=[feed_id] if feed_id not in ["all",None] else None
+            FEED_CACHE.set(cache_key,"".join(body),media_type,headers,depends,generation=generation)
+            if spec is not None:
+                FEED_WARMER.record(cache_key,spec)
+    return StreamingResponse(generate(),media_type=media_type,headers=headers)
+
+
+def feed_rss(feed_id: str=None, tag_id: str=None, ext: str="xml", limit: int=10, offset: int=0,
+             cursor: str=None, content_type: str=None) -> RSS:
+    """订阅源对应的RSS生成器，文件名同时作为磁盘缓存名"""
+    cache_name=f'{tag_id}_{feed_id}_{limit}_{offset}'
+    if cursor:
+        cache_name=f'{cache_name}_{cursor}'
+    rss=RSS(name=cache_name,ext=ext,feed_id=feed_id,tag_id=tag_id)
+    rss.set_content_type(content_type)
+    return rss
+
+
+def request_scope(request: Request) -> dict:
+    """保存生成订阅源所需的请求信息(站点地址、分页链接)，用于后台预热时重建请求"""
+    scope=request.scope
+    return {
+        "type":"http","method":"GET","http_version":"1.1",
+        "scheme":scope.get("scheme","http"),"server":scope.get("server"),"root_path":scope.get("root_path",""),
+        "path":scope.get("path",""),"query_string":scope.get("query_string",b""),
+        "headers":[(k,v) for k,v in scope.get("headers",[]) if k==b"host"],
+    }
+
+
+def warm_feed(key: str, spec: dict):
+    """后台预热：按记录的参数重新生成订阅源并写入缓存"""
+    request=Request(dict(spec["scope"]))
+    rss=feed_rss(spec["feed_id"],spec["tag_id"],spec["ext"],spec["limit"],spec["offset"],spec["cursor"],spec["content_type"])
+    def build():
+        session=DB.read_session_factory()
+        try:
+            return render_feed(session,request,rss,feed_id=spec["feed_id"],tag_id=spec["tag_id"],ext=spec["ext"],
+                               limit=spec["limit"],offset=spec["offset"],kw=spec["kw"],template=spec["template"],cursor=spec["cursor"])
+        finally:
+            session.close()
+    return FEED_CACHE.fetch(key,build)
+
+
+@router.get("/{feed_id}", summary="获取公众号文章")
+def get_mp_articles_source(
+    request: Request,
+    feed_id: str=None,
+    tag_id:str=None,
+    ext:str="xml",
+    limit: int = Query(10, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    kw:str="",
+    is_update:bool=True,
+    content_type:str=Query(None,alias="ctype"),
+    template:str=None,
+    cursor:str=None,
+    session: Session = Depends(get_read_db),
+    # current_user: dict = Depends(get_current_user)
+):
+    if cursor:
+        try:
+            # 规范化游标，避免非法字符进入缓存文件名
+            cursor=encode_cursor(*decode_cursor(cursor))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=error_response(code=40001,message=str(e))
+            )
+    rss=feed_rss(feed_id,tag_id,ext,limit,offset,cursor,content_type)
+    # 内存缓存：同一订阅源、格式、分页、内容类型的生成结果在新文章写入前直接复用
+    memory_key=FEED_CACHE.key(feed=feed_id,tag=tag_id,ext=ext,limit=limit,offset=offset,cursor=cursor,
+                              kw=kw,ctype=content_type,template=template,base=cfg.get("rss.base_url",str(request.base_url)))
+    rss_xml = rss.get_cache()
+    if rss_xml is not None and is_update==False:
+         return Response(
             content=rss_xml,
             media_type=rss.get_type()
         )
+    spec={
+        "feed_id":feed_id,"tag_id":tag_id,"ext":ext,"limit":limit,"offset":offset,"kw":kw,
+        "content_type":content_type,"template":template,"cursor":cursor,"scope":request_scope(request),
+    }
+    # 大分页的全文订阅源流式输出，已缓存(内容未超过流式缓存上限)时仍走缓存
+    stream_min_limit=int(cfg.get("rss.stream_min_limit",100))
+    if stream_min_limit>0 and limit>=stream_min_limit and need_feed_content(ext,template) and not template and rss.can_stream(ext):
+        entry=FEED_CACHE.get(memory_key)
+        if entry is None:
+            return stream_feed(session,request,rss,feed_id=feed_id,tag_id=tag_id,ext=ext,limit=limit,offset=offset,kw=kw,cursor=cursor,
+                               cache_key=memory_key,spec=spec)
+        FEED_WARMER.record(memory_key,spec)
+        return conditional_response(request,entry)
+    # 记录访问次数，采集完成后优先预热访问最多的订阅源
+    FEED_WARMER.record(memory_key,spec)
+    render=functools.partial(render_feed,request=request,rss=rss,feed_id=feed_id,tag_id=tag_id,ext=ext,
+                             limit=limit,offset=offset,kw=kw,template=template,cursor=cursor)
+    def refresh():
+        # 后台刷新时请求会话已关闭，使用独立的只读会话
+        _session=DB.read_session_factory()
+        try:
+            return render(_session)
+        finally:
+            _session.close()
+    try:
+        # 同一订阅源并发生成时只查询一次，过期内容先返回旧版本并在后台刷新
+        entry=FEED_CACHE.fetch(memory_key,lambda:render(session),refresh)
+        return conditional_response(request,entry)
     except Exception as e:
         print_error(f"获取RSS错误:{e}")
         # raise
@@ -282,7 +516,7 @@ async def get_mp_articles_source(
 
 
 @feed_router.get("/{feed_id}.{ext}", summary="获取公众号文章源")
-async def rss(
+def rss(
     request: Request,
     feed_id: str,
     ext: str,
@@ -290,13 +524,15 @@ async def rss(
     offset: int = Query(0, ge=0),
     kw:str="",
     content_type:str=Query(None,alias="ctype"),
-    is_update:bool=True
+    is_update:bool=True,
+    cursor:str=None,
+    session: Session = Depends(get_read_db)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type)
+    return get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type,cursor=cursor,session=session)
 
 
-@feed_router.get("/search/{kw}/{feed_id}.{ext}", summary="获取公众号文章源")
-async def rss(
+@feed_router.get("/search/{kw}/{feed_id}.{ext}", summary="获取公众号文章源", description=f"kw: {SEARCH_DOC}")
+def rss(
     request: Request,
     feed_id: str,
     ext: str,
@@ -304,11 +540,13 @@ async def rss(
     offset: int = Query(0, ge=0),
     kw:str="",
     content_type:str=Query(None,alias="ctype"),
-    is_update:bool=True
+    is_update:bool=True,
+    cursor:str=None,
+    session: Session = Depends(get_read_db)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type)
+    return get_mp_articles_source(request=request,feed_id=feed_id, limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type,cursor=cursor,session=session)
 @feed_router.get("/tag/{tag_id}.{ext}", summary="获取公众号文章源")
-async def rss(
+def rss(
     request: Request,
     tag_id:str="",
     feed_id: str=None,
@@ -317,8 +555,10 @@ async def rss(
     offset: int = Query(0, ge=0),
     kw:str="",
     content_type:str=Query(None,alias="ctype"),
-    is_update:bool=True
+    is_update:bool=True,
+    cursor:str=None,
+    session: Session = Depends(get_read_db)
 ):
-    return await get_mp_articles_source(request=request,feed_id=feed_id, tag_id=tag_id,limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type)
+    return get_mp_articles_source(request=request,feed_id=feed_id, tag_id=tag_id,limit=limit,offset=offset, is_update=is_update,ext=ext,kw=kw,content_type=content_type,cursor=cursor,session=session)
 
 
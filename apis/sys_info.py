@@ -10,12 +10,14 @@ from driver.token import wx_cfg
 from core.config import cfg
 from jobs.mps import TaskQueue
 from driver.success import getLoginInfo,getStatus
+from core.database import get_read_db
+from sqlalchemy.orm import Session
 router = APIRouter(prefix="/sys", tags=["系统信息"])
 
 # 记录服务器启动时间
 _START_TIME = time.time()
 @router.get("/base_info", summary="常规信息")
-async def get_base_info() -> Dict[str, Any]:
+def get_base_info() -> Dict[str, Any]:
     try:
         from .ver import API_VERSION
         from core.ver import VERSION as CORE_VERSION,LATEST_VERSION
@@ -37,7 +39,7 @@ async def get_base_info() -> Dict[str, Any]:
 
 from core.resource import get_system_resources
 @router.get("/resources", summary="获取系统资源使用情况")
-async def system_resources(
+def system_resources(
     current_user: dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """获取系统资源使用情况
@@ -51,6 +53,12 @@ async def system_resources(
     try:
         resources_info=get_system_resources()
         resources_info["queue"]=TaskQueue.get_queue_info(),
+        # 数据库连接池使用情况
+        from core.engine import ENGINES
+        resources_info["database"]=ENGINES.metrics()
+        # 图片缓存命中率及占用空间
+        from core.image_cache import IMAGES
+        resources_info["image_cache"]=IMAGES.stats()
         return success_response(data=resources_info)
     except Exception as e:
         return error_response(
@@ -61,7 +69,8 @@ from core.article_lax import ARTICLE_INFO,laxArticle
 from .ver import API_VERSION
 from core.ver import VERSION as CORE_VERSION,LATEST_VERSION
 @router.get("/info", summary="获取系统信息")
-async def get_system_info(
+def get_system_info(
+    session: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ) -> Dict[str, Any]:
     """获取当前系统的各种信息
@@ -75,7 +84,7 @@ async def get_system_info(
     """
     try:
       
-        wx_cfg.reload()
+        wx_cfg.refresh()
         # 获取系统信息
         system_info = {
             'os': {
@@ -100,7 +109,8 @@ async def get_system_info(
                 "info":getLoginInfo(),
                 "login":getStatus(),
             },
-            "article":ARTICLE_INFO,
+            # 读取维护的统计计数，不再使用启动时的快照
+            "article":laxArticle(session),
             'queue':TaskQueue.get_queue_info(),
         }
         return success_response(data=system_info)
@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 from schemas.tags import Tags, TagsCreate
 from .base import success_response, error_response
 from core.auth import get_current_user, requires_permission
+from core.feed_warmer import FEED_WARMER
+from core.rss import RSS
 
 # 标签管理API路由
 # 提供标签的增删改查功能
@@ -16,7 +18,7 @@ router = APIRouter(prefix="/tags", tags=["标签管理"])
 @router.get("", 
     summary="获取标签列表",
     description="分页获取所有标签信息")
-async def get_tags(offset: int = 0, limit: int = 100, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
+def get_tags(offset: int = 0, limit: int = 100, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
     """
     获取标签列表
     
@@ -28,7 +30,8 @@ async def get_tags(offset: int = 0, limit: int = 100, db: Session = Depends(get_
     - 包含标签列表和分页信息的成功响应
     """
     query = db.query(TagsModel)
-    total = query.count()
+    from core.stats import STATS
+    total = STATS.total(db, "tags", query=query)
     tags = query.offset(offset).limit(limit).all()
     return success_response(data={
         "list": tags,
@@ -44,7 +47,7 @@ async def get_tags(offset: int = 0, limit: int = 100, db: Session = Depends(get_
     summary="创建新标签",
     description="创建一个新的标签"
    )
-async def create_tag(tag: TagsCreate, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
+def create_tag(tag: TagsCreate, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
     """
     创建新标签
     
@@ -91,7 +94,7 @@ async def create_tag(tag: TagsCreate, db: Session = Depends(get_db),cur_user: di
         )
 
 @router.get("/{tag_id}", summary="获取单个标签详情",  description="根据标签ID获取标签详细信息")
-async def get_tag(tag_id: str, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
+def get_tag(tag_id: str, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
     """
     获取单个标签详情
     
@@ -111,7 +114,7 @@ async def get_tag(tag_id: str, db: Session = Depends(get_db),cur_user: dict = De
     summary="更新标签信息",
     description="根据标签ID更新标签信息",
  )
-async def update_tag(tag_id: str, tag_data: TagsCreate, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
+def update_tag(tag_id: str, tag_data: TagsCreate, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
     """
     更新标签信息
     
@@ -145,6 +148,9 @@ async def update_tag(tag_id: str, tag_data: TagsCreate, db: Session = Depends(ge
         
         db.commit()
         db.refresh(tag)
+        RSS().clear_tag_cache(tag_id)
+        # 标签修改后订阅源缓存已失效，后台重新生成常用订阅源
+        FEED_WARMER.schedule()
         return success_response(data=tag)
     except Exception as e:
         return error_response(code=500, message=str(e))
@@ -153,7 +159,7 @@ async def update_tag(tag_id: str, tag_data: TagsCreate, db: Session = Depends(ge
     summary="删除标签",
     description="根据标签ID删除标签",
    )
-async def delete_tag(tag_id: str, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
+def delete_tag(tag_id: str, db: Session = Depends(get_db),cur_user: dict = Depends(get_current_user)):
     """
     删除标签
     
@@ -170,6 +176,7 @@ async def delete_tag(tag_id: str, db: Session = Depends(get_db),cur_user: dict =
             return error_response(code=status.HTTP_201_CREATED, message="Tag not found")
         db.delete(tag)
         db.commit()
+        RSS().clear_tag_cache(tag_id)
         return success_response(message="Tag deleted successfully")
     except Exception as e:
         return error_response(code=status.HTTP_201_CREATED, message=str(e))
\ No newline at end of file
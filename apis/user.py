@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from datetime import datetime
 from core.auth import get_current_user
-from core.db import DB
+from core.database import get_db
+from sqlalchemy.orm import Session
 from core.models import User as DBUser
 from core.auth import pwd_context
 import os
@@ -9,8 +10,7 @@ from .base import success_response, error_response
 router = APIRouter(prefix="/user", tags=["用户管理"])
 
 @router.get("", summary="获取用户信息")
-async def get_user_info(current_user: dict = Depends(get_current_user)):
-    session = DB.get_session()
+def get_user_info(session: Session = Depends(get_db),current_user: dict = Depends(get_current_user)):
     try:
         user = session.query(DBUser).filter(
             DBUser.username == current_user["username"]
@@ -43,13 +43,13 @@ async def get_user_info(current_user: dict = Depends(get_current_user)):
         )
 
 @router.get("/list", summary="获取用户列表")
-async def get_user_list(
+def get_user_list(
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
     page: int = 1,
     page_size: int = 10
 ):
     """获取所有用户列表（仅管理员可用）"""
-    session = DB.get_session()
     try:
         # 验证当前用户是否为管理员
         if current_user["role"] != "admin":
@@ -99,12 +99,12 @@ async def get_user_list(
         )
 
 @router.post("", summary="添加用户")
-async def add_user(
+def add_user(
     user_data: dict,
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """添加新用户"""
-    session = DB.get_session()
     try:
         # 验证当前用户是否为管理员
         if current_user["role"] != "admin":
@@ -165,12 +165,12 @@ async def add_user(
         )
 
 @router.put("", summary="修改用户资料")
-async def update_user_info(
+def update_user_info(
     update_data: dict,
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """修改用户基本信息(不包括密码)"""
-    session = DB.get_session()
     try:
         # 获取目标用户
         target_username = update_data.get("username", current_user["username"])
@@ -228,12 +228,12 @@ async def update_user_info(
    
 
 @router.put("/password", summary="修改密码")
-async def change_password(
+def change_password(
     password_data: dict,
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """修改用户密码"""
-    session = DB.get_session()
     try:
         # 验证请求数据
         if "old_password" not in password_data or "new_password" not in password_data:
@@ -304,9 +304,10 @@ async def change_password(
             detail=f"密码修改失败: {str(e)}"
         )
 @router.post("/avatar", summary="上传用户头像")
-async def upload_avatar(
+def upload_avatar(
     file: UploadFile = File(...),
     # file: typing.Optional[UploadFile] = None,
+    session: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """处理用户头像上传"""
@@ -318,10 +319,9 @@ async def upload_avatar(
         # 保存文件
         file_path = f"{avatar_dir}/{current_user['username']}.jpg"
         with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
+            buffer.write(file.file.read())
         
         # 更新用户头像字段
-        session = DB.get_session()
         try:
             user = session.query(DBUser).filter(
                 DBUser.username == current_user["username"]
@@ -344,7 +344,7 @@ async def upload_avatar(
             detail=f"头像上传失败: {str(e)}"
         )
 @router.post("/upload", summary="上传文件")
-async def upload_file(
+def upload_file(
     file: UploadFile = File(...),
     type: str = "tags",
     current_user: dict = Depends(get_current_user)
@@ -372,7 +372,7 @@ async def upload_file(
 
         # 保存文件
         with open(file_path, "wb") as buffer:
-            buffer.write(await file.read())
+            buffer.write(file.file.read())
         return success_response(data={"url": f"/{file_url_path}/{file_name}"})
     except HTTPException as e:
         raise e
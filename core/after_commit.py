@@ -0,0 +1,30 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from core.print import print_error
+# Desc: 将ORM事件中的缓存失效推迟到事务结束后执行
+# 映射器事件在flush中触发，此时写入尚未提交，立即失效时并发请求可能按旧数据重新生成缓存
+# 写会话(AtomicFlushSession)在每次flush结束时已提交，因此会话回滚或关闭时同样执行
+
+# 会话info中保存待执行回调的键
+_PENDING = "after_commit"
+
+
+def after_commit(target, callback, *args):
+    """在target所属会话的事务结束后执行callback(*args)，相同的回调和参数只执行一次"""
+    session = object_session(target)
+    if session is None:
+        callback(*args)
+        return
+    session.info.setdefault(_PENDING, {})[(callback, args)] = None
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _transaction_end(session, transaction):
+    if transaction.parent is not None:
+        return
+    pending = session.info.pop(_PENDING, None)
+    for callback, args in pending or ():
+        try:
+            callback(*args)
+        except Exception as e:
+            print_error(f"执行提交后回调失败: {e}")
@@ -1,5 +1,6 @@
 from core.models import Article,Feed,DATA_STATUS
 from core.db import DB
+from core.stats import STATS,ARTICLES
 import json
 class ArticleInfo():
     #没有内容的文章数量
@@ -12,11 +13,22 @@ class ArticleInfo():
     wrong_count:int=0
     #公众号总数
     mp_all_count:int=0
-def laxArticle():
+def laxArticle(session=None):
     info=ArticleInfo()
-    session=DB.get_session()
+    session=session or DB.get_session()
+    stats=STATS.get(session,ARTICLES)
+    feeds=STATS.get(session,"feeds")
+    if stats is not None and feeds is not None:
+        #直接读取维护的计数
+        info.all_count=stats.total
+        info.has_content_count=stats.has_content
+        info.no_content_count=info.all_count-info.has_content_count
+        info.wrong_count=info.all_count-stats.active
+        info.mp_all_count=feeds.total
+        return info.__dict__
+    #计数未初始化时回退为统计查询
     #获取没有内容的文章数量
-    info.no_content_count=session.query(Article).filter(Article.content == None).count()
+    info.no_content_count=session.query(Article).filter(~Article.has_content()).count()
     #所有文章数量
     info.all_count=session.query(Article).count()
     #有内容的文章数量
@@ -31,4 +43,4 @@ def laxArticle():
     return info.__dict__
     pass
 ARTICLE_INFO=laxArticle()
-print(ARTICLE_INFO)
\ No newline at end of file
+print(ARTICLE_INFO)
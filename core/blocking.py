@@ -0,0 +1,98 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+import functools
+import anyio
+from core.config import cfg
+from core.print import print_info, print_warning
+# Desc: 阻塞调用的执行模型
+# 同步路由(def)由FastAPI放入线程池执行，线程池大小由server.threadpool_size限制；
+# 异步代码中的阻塞调用(网络请求、浏览器抓取等)通过run_blocking放入独立的有界线程池，
+# 避免慢请求占满处理数据库查询的线程
+# 调试模式下可开启事件循环阻塞检测，超过阈值时输出阻塞位置的调用栈
+
+_blocking_limiter = None
+
+
+def configure_threadpool():
+    """设置FastAPI同步路由使用的线程池大小，需在事件循环中调用"""
+    size = int(cfg.get("server.threadpool_size", 40))
+    anyio.to_thread.current_default_thread_limiter().total_tokens = size
+    print_info(f"同步路由线程池大小: {size}")
+
+
+def _get_blocking_limiter():
+    global _blocking_limiter
+    if _blocking_limiter is None:
+        _blocking_limiter = anyio.CapacityLimiter(int(cfg.get("server.blocking_threads", 8)))
+    return _blocking_limiter
+
+
+async def run_blocking(func, *args, **kwargs):
+    """在独立的有界线程池中执行阻塞函数"""
+    return await anyio.to_thread.run_sync(functools.partial(func, *args, **kwargs), limiter=_get_blocking_limiter())
+
+
+class LoopBlockDetector:
+    """事件循环阻塞检测
+
+    后台线程定期向事件循环投递回调，回调超过阈值仍未执行时，
+    输出事件循环线程当前的调用栈及正在运行的协程
+    """
+
+    def __init__(self, threshold_ms: int = 100):
+        self.threshold = threshold_ms / 1000
+        self.loop = None
+        self.loop_thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._watch, name="loop-block-detector", daemon=True)
+        self._thread.start()
+        print_warning(f"事件循环阻塞检测已开启，阈值{int(self.threshold * 1000)}ms")
+
+    def stop(self):
+        self._stop.set()
+
+    def _report(self, blocked: float):
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)[-8:]) if frame else ""
+        task = getattr(asyncio.tasks, "_current_tasks", {}).get(self.loop)
+        coro = task.get_coro() if task else None
+        name = getattr(coro, "__qualname__", None) or repr(coro)
+        print_warning(f"事件循环已阻塞{int(blocked * 1000)}ms，当前协程: {name}\n{stack}")
+
+    def _watch(self):
+        while not self._stop.is_set():
+            done = threading.Event()
+            start = time.perf_counter()
+            try:
+                self.loop.call_soon_threadsafe(done.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                return
+            reported = False
+            while not done.wait(self.threshold):
+                if self._stop.is_set():
+                    return
+                if not reported:
+                    self._report(time.perf_counter() - start)
+                    reported = True
+            if reported:
+                print_warning(f"事件循环恢复，共阻塞{int((time.perf_counter() - start) * 1000)}ms")
+            self._stop.wait(self.threshold)
+
+
+def start_loop_block_detector():
+    """调试模式下开启事件循环阻塞检测，需在事件循环中调用"""
+    threshold = int(cfg.get("server.loop_block_ms", 0) or 0)
+    if threshold <= 0 or not cfg.get("debug", False):
+        return None
+    detector = LoopBlockDetector(threshold)
+    detector.start(asyncio.get_running_loop())
+    return detector
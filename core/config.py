@@ -1,16 +1,27 @@
 import yaml
 import sys
 import os
+import time
 import argparse
+import threading
+from types import MappingProxyType
 from string import Template
 from core.print import print_warning, print_error,print_info
 from .file import FileCrypto
+# 检查配置文件是否被修改的最短间隔(秒)
+MTIME_CHECK_INTERVAL = 1.0
 class Config: 
     config_path=None
     config={}
     def __init__(self, config_path=None, encrypt=False):
         self.args = self.parse_args()
         self.config_path = config_path or self.args.config
+        # 解析环境变量后展开的只读快照，key为点号分隔的完整路径
+        self._snapshot = MappingProxyType({})
+        self._file_stat = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._hooks = []
 
         # 确保目录存在
         if os.path.dirname(self.config_path) != "":
@@ -113,16 +124,67 @@ class Config:
                     config = yaml.safe_load(content)
                 
                 if config is None:
+                    self._build_snapshot({})
                     return {}
                 
                 self.config = config
                 self._config = self.replace_env_vars(config)
+                self._build_snapshot(self._config)
                 return self.config
         except Exception as e:
             print_error(f"加载配置文件 {self.config_path} 错误: {e}")
             # sys.exit(1)
     def reload(self):
-        self.config=self.get_config()
+        config=self.get_config()
+        # 读取失败时保留当前配置
+        if config is not None:
+            self.config=config
+    def refresh(self) -> bool:
+        """配置文件被修改时重新加载，返回是否重新加载"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._stat() == self._file_stat:
+                return False
+            self.reload()
+            return True
+    def on_change(self, callback):
+        """注册配置变化回调 callback(cfg, changed_keys)，用于缓存了派生值的模块"""
+        self._hooks.append(callback)
+        return callback
+    def _stat(self):
+        try:
+            st = os.stat(self.config_path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+    def _flatten(self, data, prefix: str, result: dict):
+        for k, v in data.items():
+            key = f"{prefix}{k}"
+            result[key] = self.__fix(v)
+            if isinstance(v, dict):
+                self._flatten(v, f"{key}.", result)
+        return result
+    def _build_snapshot(self, resolved: dict):
+        """按已解析环境变量的配置重建快照，并通知发生变化的key"""
+        with self._lock:
+            self._file_stat = self._stat()
+            self._checked_at = time.monotonic()
+            old = self._snapshot
+            snapshot = self._flatten(resolved, "", {}) if isinstance(resolved, dict) else {}
+            self._snapshot = MappingProxyType(snapshot)
+        changed = {k for k in set(old) | set(snapshot)
+                   if not isinstance(snapshot.get(k), dict) and old.get(k) != snapshot.get(k)}
+        if changed and old:
+            for hook in list(self._hooks):
+                try:
+                    hook(self, changed)
+                except Exception as e:
+                    print_error(f"配置变化回调执行失败: {e}")
+    def snapshot(self) -> MappingProxyType:
+        """当前配置快照，配置文件被修改时自动重新加载"""
+        if time.monotonic() - self._checked_at > MTIME_CHECK_INTERVAL:
+            self.refresh()
+        return self._snapshot
     def set(self,key,default:any=None):
         self.config[key] = default
         self.save_config()
@@ -143,22 +205,16 @@ class Config:
         except:
             return v
     def get(self,key,default:any=None):
-        _config=self.replace_env_vars(self.config)
-        
-        # 支持嵌套key访问
-        keys = key.split('.') if isinstance(key, str) else [key]
-        value = _config
+        # 支持嵌套key访问，快照中已按完整路径展开
         try:
-            for k in keys:
-                value = value[k]
-            val=self.__fix(value)
-            if val is None and default is not None  :
-                return default
-            else:
-                return val
-        except (KeyError, TypeError):
+            val=self.snapshot()[key if isinstance(key, str) else str(key)]
+        except KeyError:
             print_warning("Key {} not found in configuration".format(key))
-        return default 
+            return default
+        if val is None and default is not None  :
+            return default
+        else:
+            return val
 
 cfg=Config()
 def set_config(key:str,value:str):
@@ -0,0 +1,109 @@
+import os
+import json
+import sqlite3
+import threading
+from sqlalchemy import event
+from core.models.article import ArticleContent
+from core.content_store import pack_content, unpack_content, content_hash
+from core.config import cfg
+from core.print import print_error
+from core.after_commit import after_commit
+# Desc: 文章内容缓存(/rss/content使用)
+# 所有文章内容保存在一个SQLite键值文件中，压缩后的紧凑JSON按文章ID存储并记录内容哈希
+# 内容未变化时不再重复写入；进程内记录已写入的哈希，订阅源请求命中时不产生任何IO
+# 正文更新或删除时对应的缓存随之失效
+
+# 进程内记录的已写入哈希数量上限，超出后清空重新记录
+MAX_KNOWN = 50000
+
+
+class ContentCache:
+    """文章内容缓存"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._local = threading.local()
+        self._known = {}
+
+    def _get_path(self) -> str:
+        if self.path is None:
+            self.path = os.path.join(cfg.get("cache.dir", "data/cache") or "data/cache", "content.db")
+        return self.path
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            path = self._get_path()
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS content_cache "
+                         "(id TEXT PRIMARY KEY, hash TEXT NOT NULL, codec TEXT NOT NULL, data BLOB NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def put(self, content_id: str, content: dict, hash: str = None) -> bool:
+        """写入文章内容，内容哈希与已缓存的一致时跳过
+
+        Args:
+            content_id: 文章ID
+            content: 文章内容
+            hash: 正文哈希(article_contents.content_hash)，为空时按内容计算
+
+        Returns:
+            bool: 是否实际写入
+        """
+        text = None
+        if hash is None:
+            text = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+            hash = content_hash(text.encode("utf-8"))
+        if self._known.get(content_id) == hash:
+            return False
+        try:
+            conn = self._conn()
+            row = conn.execute("SELECT hash FROM content_cache WHERE id=?", (content_id,)).fetchone()
+            if row is None or row[0] != hash:
+                if text is None:
+                    text = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+                packed = pack_content(text)
+                conn.execute("INSERT OR REPLACE INTO content_cache (id, hash, codec, data) VALUES (?, ?, ?, ?)",
+                             (content_id, hash, packed["codec"], packed["data"]))
+            if len(self._known) >= MAX_KNOWN:
+                self._known.clear()
+            self._known[content_id] = hash
+            return row is None or row[0] != hash
+        except Exception as e:
+            print_error(f"写入文章内容缓存失败: {e}")
+            return False
+
+    def has(self, content_id: str, hash: str) -> bool:
+        """进程内是否已写入该版本的内容"""
+        return self._known.get(content_id) == hash
+
+    def get(self, content_id: str):
+        try:
+            row = self._conn().execute("SELECT codec, data FROM content_cache WHERE id=?", (content_id,)).fetchone()
+        except Exception as e:
+            print_error(f"读取文章内容缓存失败: {e}")
+            return None
+        if row is None:
+            return None
+        return json.loads(unpack_content(row[0], row[1]))
+
+    def delete(self, content_id: str):
+        self._known.pop(content_id, None)
+        try:
+            self._conn().execute("DELETE FROM content_cache WHERE id=?", (content_id,))
+        except Exception as e:
+            print_error(f"删除文章内容缓存失败: {e}")
+
+
+CONTENT_CACHE = ContentCache()
+
+
+# 正文更新或删除提交后使缓存失效
+@event.listens_for(ArticleContent, "after_update")
+@event.listens_for(ArticleContent, "after_delete")
+def _content_changed(mapper, connection, target):
+    after_commit(target, CONTENT_CACHE.delete, target.article_id)
@@ -0,0 +1,108 @@
+import zlib
+import hashlib
+from datetime import datetime
+from core.config import cfg
+from core.print import print_info, print_warning, print_error
+# Desc: 文章正文压缩存储
+# 正文不再保存在articles表中，而是压缩后写入article_contents表，按文章ID关联
+# 默认使用zlib压缩，安装zstandard后可配置为zstd；读取时按记录中的codec解压
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def get_codec() -> str:
+    """当前配置的压缩算法，zstd不可用时回退为zlib"""
+    codec = str(cfg.get("article.content_codec", "zlib") or "zlib").lower()
+    if codec == "zstd" and zstandard is None:
+        return "zlib"
+    return codec if codec in ("zlib", "zstd") else "zlib"
+
+
+def content_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def pack_content(text: str) -> dict:
+    """压缩正文，返回article_contents表的列值(不含article_id)"""
+    raw = (text or "").encode("utf-8")
+    codec = get_codec()
+    level = int(cfg.get("article.content_level", 6))
+    if codec == "zstd":
+        data = zstandard.ZstdCompressor(level=level).compress(raw)
+    else:
+        data = zlib.compress(raw, level)
+    return {
+        "codec": codec,
+        "data": data,
+        "content_hash": content_hash(raw),
+        "size": len(raw),
+        "stored_size": len(data),
+        "updated_at": datetime.now().replace(microsecond=0),
+    }
+
+
+def unpack_content(codec: str, data: bytes) -> str:
+    """按压缩算法解压正文"""
+    if data is None:
+        return None
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("正文使用zstd压缩，请先安装zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return raw.decode("utf-8")
+
+
+def migrate_legacy_content(db, batch_size: int = 500) -> int:
+    """将articles表中旧的content列按批次迁移到压缩存储
+
+    每批在一个事务中写入article_contents并清空原列，可中断后重复执行
+
+    Args:
+        db: core.db.Db实例
+        batch_size: 每批迁移的文章数量
+
+    Returns:
+        int: 迁移的文章数量
+    """
+    from sqlalchemy import inspect, text, select, column
+    from core.models.article import Article, ArticleContent
+    table = Article.__table__
+    try:
+        columns = {c["name"] for c in inspect(db.engine).get_columns(table.name)}
+    except Exception as e:
+        print_error(f"检查文章表结构失败: {e}")
+        return 0
+    if "content" not in columns:
+        return 0
+    # 旧列已不在模型中，单独声明用于读写
+    legacy = column("content")
+    last_id = ""
+    count = 0
+    while True:
+        try:
+            with db.write_lock(), db.transaction() as conn:
+                with conn.begin():
+                    rows = conn.execute(
+                        select(table.c.id, legacy).select_from(table)
+                        .where(table.c.id > last_id, legacy.is_not(None))
+                        .order_by(table.c.id).limit(batch_size)
+                    ).all()
+                    if not rows:
+                        break
+                    params = [{"article_id": id, **pack_content(content)} for id, content in rows]
+                    conn.execute(db.insert_ignore(ArticleContent.__table__), params)
+                    conn.execute(text(f"UPDATE {table.name} SET content=NULL WHERE id=:id"), [{"id": id} for id, _ in rows])
+        except Exception as e:
+            print_error(f"迁移文章正文失败: {e}")
+            break
+        last_id = rows[-1][0]
+        count += len(rows)
+        print_info(f"已迁移文章正文{count}篇")
+    if count:
+        print_warning("文章正文已迁移到article_contents表，articles.content列已清空，可在确认后手动删除该列")
+    return count
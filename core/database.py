@@ -1,3 +1,7 @@
 from core.db import DB
 def get_db():
-    return DB.get_session()
\ No newline at end of file
+    """请求范围的数据库会话，配合 Depends(get_db) 使用"""
+    yield from DB.session_dependency()
+def get_read_db():
+    """请求范围的只读数据库会话，用于RSS等只读接口"""
+    yield from DB.read_session_dependency()
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Engine,Text,event
+from sqlalchemy import create_engine, Engine,Text,event,text
 from sqlalchemy.orm import sessionmaker, declarative_base,scoped_session
 from sqlalchemy import Column, Integer, String, DateTime
 from typing import Optional, List
@@ -6,6 +6,55 @@ from .models import Feed, Article
 from .config import cfg
 from core.models.base import Base  
 from core.print import print_warning,print_info,print_error,print_success
+# 导入全文检索模块，同时注册文章写入时的索引更新事件
+from core.search import SEARCH
+# 导入时注册统计计数的ORM事件
+from core.stats import STATS
+# 导入时注册公众号缓存的失效事件
+from core.feeds import FEEDS
+# 导入时注册订阅源内存缓存的失效事件
+from core.feed_cache import FEED_CACHE
+from core.image_prefetch import IMAGE_PREFETCH
+from core.engine import ENGINES,is_sqlite_optimized
+import time
+import threading
+# SQLite同一时间只允许一个写入者，进程内的所有写入通过该锁串行执行
+SQLITE_WRITE_LOCK=threading.RLock()
+from sqlalchemy.orm import Session as _Session
+class AtomicFlushSession(_Session):
+    """写会话：引擎为AUTOCOMMIT，flush时显式开启事务
+
+    行变更与ORM事件中的统计计数、全文索引更新在同一事务内提交，中途失败时一起回滚
+    """
+    def flush(self, objects=None):
+        if not (self.new or self.dirty or self.deleted):
+            return super().flush(objects)
+        conn=self.connection()
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.dialect.name=="sqlite" else "BEGIN")
+        try:
+            super().flush(objects)
+        except BaseException:
+            try:
+                conn.exec_driver_sql("ROLLBACK")
+            except Exception:
+                # flush失败时会话自身的回滚可能已结束事务
+                pass
+            raise
+        conn.exec_driver_sql("COMMIT")
+class SerializedWriteSession(AtomicFlushSession):
+    """SQLite性能模式下的写会话：flush及UPDATE/DELETE等语句持有写锁执行
+    
+    写连接池保留溢出连接，线程范围的会话读取后长期占用连接不会阻塞其他线程，
+    真正的写入仍由写锁串行执行，不会互相等待数据库锁
+    """
+    def flush(self, objects=None):
+        with SQLITE_WRITE_LOCK:
+            super().flush(objects)
+    def execute(self, statement, *args, **kwargs):
+        if getattr(statement, "is_dml", False):
+            with SQLITE_WRITE_LOCK:
+                return super().execute(statement, *args, **kwargs)
+        return super().execute(statement, *args, **kwargs)
 # 声明基类
 # Base = declarative_base()
 
@@ -14,8 +63,12 @@ class Db:
     def __init__(self,tag:str="默认",User_In_Thread=True):
         self.Session= None
         self.engine = None
+        self.read_engine = None
         self.User_In_Thread=User_In_Thread
         self.tag=tag
+        # 最后一次确认连接可用的时间戳，避免每次获取会话都查询数据库
+        self.last_healthy:float=0
+        self.health_check_interval=int(cfg.get("database.health_check_interval",60))
         print_success(f"[{tag}]连接初始化")
         self.init(cfg.get("db"))
     def get_engine(self) -> Engine:
@@ -23,34 +76,26 @@ class Db:
         if self.engine is None:
             raise ValueError("Database connection has not been initialized.")
         return self.engine
-    def get_session_factory(self):
-        return sessionmaker(bind=self.engine, autoflush=True, expire_on_commit=True, future=True)
+    def get_session_factory(self,engine:Engine=None):
+        engine=engine or self.engine
+        if engine is self.engine and self.is_sqlite_optimized():
+            return sessionmaker(bind=engine, class_=SerializedWriteSession, autoflush=True, expire_on_commit=True, future=True)
+        if engine is self.engine:
+            return sessionmaker(bind=engine, class_=AtomicFlushSession, autoflush=True, expire_on_commit=True, future=True)
+        return sessionmaker(bind=engine, autoflush=True, expire_on_commit=True, future=True)
+    def is_sqlite_optimized(self) -> bool:
+        """是否启用SQLite性能模式"""
+        return is_sqlite_optimized(self.connection_str)
     def init(self, con_str: str) -> None:
-        """Initialize database connection and create tables"""
+        """绑定进程内共享的引擎，同一连接串只创建一个连接池"""
         try:
             self.connection_str=con_str
-            # 检查SQLite数据库文件是否存在
-            if con_str.startswith('sqlite:///'):
-                import os
-                db_path = con_str[10:]  # 去掉'sqlite:///'前缀
-                if not os.path.exists(db_path):
-                    try:
-                        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-                    except Exception as e:
-                        pass
-                    open(db_path, 'w').close()
-            self.engine = create_engine(con_str,
-                                     pool_size=2,          # 最小空闲连接数
-                                     max_overflow=20,      # 允许的最大溢出连接数
-                                     pool_timeout=30,      # 获取连接时的超时时间（秒）
-                                     echo=False,
-                                     pool_recycle=60,  # 连接池回收时间（秒）
-                                     isolation_level="AUTOCOMMIT",  # 设置隔离级别
-                                    #  isolation_level="READ COMMITTED",  # 设置隔离级别
-                                    #  query_cache_size=0,
-                                     connect_args={"check_same_thread": False} if con_str.startswith('sqlite:///') else {}
-                                     )
+            entry=ENGINES.get(con_str,self.tag)
+            self.engine=entry.engine
+            self.read_engine=entry.read_engine
             self.session_factory=self.get_session_factory()
+            self.read_session_factory=self.get_session_factory(self.read_engine) if self.read_engine is not self.engine else self.session_factory
+            self.last_healthy=0
         except Exception as e:
             print(f"Error creating database connection: {e}")
             raise
@@ -104,21 +149,196 @@ class Db:
                 art.updated_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             art.created_at=datetime.strptime(art.created_at ,'%Y-%m-%d %H:%M:%S')
             art.updated_at=datetime.strptime(art.updated_at,'%Y-%m-%d %H:%M:%S')
-            art.content=art.content
             from core.models.base import DATA_STATUS
             art.status=DATA_STATUS.ACTIVE
             session.add(art)
             # self._session.merge(art)
             sta=session.commit()
-            
         except Exception as e:
             if "UNIQUE" in str(e) or "Duplicate entry" in str(e):
                 print_warning(f"Article already exists: {art.id}")
             else:
                 print_error(f"Failed to add article: {e}")
             return False
-        return True    
+        # 写入成功后才预取图片，重复或失败的文章不提交，与批量写入一致
+        IMAGE_PREFETCH.submit([article_data])
+        return True
         
+    def _parse_time(self,value,default):
+        """将采集到的时间字段统一转换为datetime"""
+        from datetime import datetime
+        if value is None or value=="":
+            return default
+        if isinstance(value,datetime):
+            return value
+        return datetime.strptime(value,'%Y-%m-%d %H:%M:%S')
+    def insert_ignore(self,table):
+        """生成忽略主键冲突的INSERT语句，按数据库方言使用原生语法"""
+        dialect=self.engine.dialect.name
+        if dialect=="sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+            return insert(table).on_conflict_do_nothing()
+        if dialect=="mysql":
+            from sqlalchemy.dialects.mysql import insert
+            return insert(table).prefix_with("IGNORE")
+        if dialect=="postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+            return insert(table).on_conflict_do_nothing()
+        from sqlalchemy import insert
+        return insert(table)
+    def write_lock(self):
+        """SQLite性能模式下串行化进程内的写入，会话的flush和DML语句也使用同一把锁"""
+        if self.is_sqlite_optimized():
+            return SQLITE_WRITE_LOCK
+        from contextlib import nullcontext
+        return nullcontext()
+    def transaction(self):
+        """开启一个显式事务连接(引擎默认为AUTOCOMMIT)"""
+        level="SERIALIZABLE" if self.engine.dialect.name=="sqlite" else "READ COMMITTED"
+        return self.engine.connect().execution_options(isolation_level=level)
+    def delete_orphan_articles(self) -> int:
+        """删除公众号已不存在的文章及其正文
+
+        批量删除不会触发ORM事件，在同一事务内按公众号和状态扣减统计计数并删除全文索引
+        """
+        from sqlalchemy import select,delete,func,case
+        from core.models.base import DATA_STATUS
+        from core.models.article import ArticleContent
+        a=Article.__table__
+        c=ArticleContent.__table__
+        orphan=~a.c.mp_id.in_(select(Feed.__table__.c.id))
+        with self.write_lock(), self.transaction() as conn:
+            with conn.begin():
+                ids=[r[0] for r in conn.execute(select(a.c.id).where(orphan))]
+                if not ids:
+                    return 0
+                groups=conn.execute(select(
+                    a.c.mp_id,
+                    func.count(a.c.id),
+                    func.sum(case((a.c.status==DATA_STATUS.ACTIVE,1),else_=0)),
+                    func.sum(case((a.c.status==DATA_STATUS.DELETED,1),else_=0)),
+                    func.sum(case((c.c.size>0,1),else_=0)),
+                ).select_from(a.outerjoin(c,c.c.article_id==a.c.id)).where(orphan).group_by(a.c.mp_id)).all()
+                conn.execute(delete(c).where(c.c.article_id.in_(select(a.c.id).where(orphan))))
+                deleted=conn.execute(delete(a).where(orphan)).rowcount
+                for mp_id,total,active,deleted_status,has_content in groups:
+                    STATS.article_delta(conn,mp_id,total=-total,active=-(active or 0),
+                                        deleted=-(deleted_status or 0),has_content=-(has_content or 0))
+                SEARCH.delete_ids(conn,ids)
+        print_info(f"[{self.tag}] 已删除无效文章{deleted}篇")
+        return deleted
+    def _insert_new(self,conn,table,new_rows):
+        """写入预查后不存在的文章，返回实际写入的行"""
+        if not new_rows:
+            return []
+        # 统一列集合，保证executemany参数一致
+        keys=set().union(*[row.keys() for row,_ in new_rows])
+        params=[{k:row.get(k) for k in keys} for row,_ in new_rows]
+        stmt=self.insert_ignore(table)
+        if self.engine.dialect.insert_executemany_returning:
+            ids={r[0] for r in conn.execute(stmt.returning(table.c.id),params)}
+            return [(row,data) for row,data in new_rows if row["id"] in ids]
+        savepoint=conn.begin_nested()
+        ret=conn.execute(stmt,params)
+        if ret.rowcount is None or ret.rowcount<0 or ret.rowcount==len(new_rows):
+            savepoint.commit()
+            return new_rows
+        # 部分行被忽略时无法从rowcount得知是哪些行，撤销后逐行写入
+        savepoint.rollback()
+        return [(row,data) for (row,data),param in zip(new_rows,params) if conn.execute(stmt,param).rowcount==1]
+    def _add_one_by_one(self,batch,result):
+        """批量写入失败时逐篇写入，单篇的错误不影响同批次的其他文章"""
+        columns={c.name for c in Article.__table__.columns}|{"content"}
+        counts={"inserted":0,"skipped":0}
+        for data in batch:
+            if self.add_article({k:v for k,v in data.items() if k in columns}):
+                counts["inserted"]+=1
+                result["articles"].append(data)
+            else:
+                counts["skipped"]+=1
+        result["inserted"]+=counts["inserted"]
+        result["skipped"]+=counts["skipped"]
+        result["batches"].append(counts)
+    def _count_articles(self,conn,new_rows):
+        """按公众号累加新增文章的计数"""
+        groups={}
+        for row,data in new_rows:
+            g=groups.setdefault(row.get("mp_id"),{"total":0,"active":0,"has_content":0,"publish_time":None})
+            g["total"]+=1
+            g["active"]+=1
+            if data.get("content"):
+                g["has_content"]+=1
+            if row.get("publish_time") is not None:
+                g["publish_time"]=max(g["publish_time"] or 0,int(row["publish_time"]))
+        for mp_id,g in groups.items():
+            STATS.article_delta(conn,mp_id,**g)
+    def add_articles(self, articles: List[dict], batch_size:int=100) -> dict:
+        """批量写入文章
+        
+        每个批次在一个事务中使用原生的冲突忽略语法写入，已存在的文章直接跳过
+        
+        Args:
+            articles: 文章数据列表，字段与add_article一致
+            batch_size: 每批写入的文章数量
+            
+        Returns:
+            dict: inserted/skipped 为总计数，batches 为每批的计数，articles 为新增的原始文章数据
+        """
+        from datetime import datetime
+        from sqlalchemy import select
+        from core.models.base import DATA_STATUS
+        from core.models.article import ArticleContent
+        from core.content_store import pack_content
+        table=Article.__table__
+        content_table=ArticleContent.__table__
+        columns={c.name for c in table.columns}
+        result={"inserted":0,"skipped":0,"batches":[],"articles":[]}
+        for start in range(0,len(articles),batch_size):
+            batch=articles[start:start+batch_size]
+            now=datetime.now().replace(microsecond=0)
+            rows={}
+            for data in batch:
+                row={k:v for k,v in data.items() if k in columns}
+                if row.get("id"):
+                    row["id"]=f"{str(row.get('mp_id'))}-{row['id']}".replace("MP_WXS_","")
+                row["created_at"]=self._parse_time(row.get("created_at"),now)
+                row["updated_at"]=self._parse_time(row.get("updated_at"),now)
+                row["status"]=DATA_STATUS.ACTIVE
+                if row.get("id") not in rows:
+                    rows[row.get("id")]=(row,data)
+            try:
+                with self.write_lock(), self.transaction() as conn:
+                    with conn.begin():
+                        existing={r[0] for r in conn.execute(select(table.c.id).where(table.c.id.in_(list(rows.keys()))))}
+                        new_rows=[(row,data) for id,(row,data) in rows.items() if id not in existing]
+                        # 并发写入时预查之后可能出现已存在的文章，只处理实际写入的行
+                        new_rows=self._insert_new(conn,table,new_rows)
+                        inserted=len(new_rows)
+                        if new_rows:
+                            # 正文压缩后写入正文存储
+                            contents=[{"article_id":row["id"],**pack_content(data.get("content"))} for row,data in new_rows if data.get("content") is not None]
+                            if contents:
+                                conn.execute(self.insert_ignore(content_table),contents)
+                            # 同一事务内更新全文索引和统计计数
+                            SEARCH.index_rows(conn,[{**row,"content":data.get("content")} for row,data in new_rows])
+                            self._count_articles(conn,new_rows)
+            except Exception as e:
+                print_error(f"[{self.tag}] 批量写入文章失败，改为逐篇写入: {e}")
+                self._add_one_by_one(batch,result)
+                continue
+            skipped=len(batch)-inserted
+            result["inserted"]+=inserted
+            result["skipped"]+=skipped
+            result["batches"].append({"inserted":inserted,"skipped":skipped})
+            result["articles"].extend([data for _,data in new_rows])
+            if new_rows:
+                # 事务提交后使相关公众号的订阅源缓存失效
+                FEED_CACHE.invalidate({str(row.get("mp_id")) for row,_ in new_rows})
+                # 后台预取新文章中的图片
+                IMAGE_PREFETCH.submit([data for _,data in new_rows])
+            print_info(f"[{self.tag}] 批量写入文章: 新增{inserted}篇, 跳过{skipped}篇")
+        return result
+
     def get_articles(self, id:str=None, limit:int=30, offset:int=0) -> List[Article]:
         try:
             data = self.get_session().query(Article).limit(limit).offset(offset)
@@ -201,18 +421,29 @@ class Db:
             print_info(f"[{self.tag}] Session is already closed.")
             _session()
             return self.Session()
-        # 检查数据库连接是否已断开
-        try:
-            from core.models import User
-            # 尝试执行一个简单的查询来检查连接状态
-            session.query(User.id).count()
-        except Exception as e:
-            from core.print import print_warning
-            print_warning(f"[{self.tag}] Database connection lost: {e}. Reconnecting...")
+        # 检查数据库连接是否已断开(按间隔探测，结果缓存)
+        if not self.is_healthy():
+            print_warning(f"[{self.tag}] Database connection lost. Reconnecting...")
+            ENGINES.dispose(self.connection_str)
             self.init(self.connection_str)
             _session()
             return self.Session()
         return session
+    def ping(self) -> bool:
+        """探测数据库连接，成功时记录最后健康时间"""
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            self.last_healthy=time.time()
+            return True
+        except Exception as e:
+            print_warning(f"[{self.tag}] Database ping failed: {e}")
+            return False
+    def is_healthy(self) -> bool:
+        """在检查间隔内直接使用缓存的健康状态，超过间隔才重新探测"""
+        if time.time()-self.last_healthy < self.health_check_interval:
+            return True
+        return self.ping()
     def auto_refresh(self):
         # 定义一个事件监听器，在对象更新后自动刷新
         def receive_after_update(mapper, connection, target):
@@ -222,12 +453,28 @@ class Db:
         event.listen(MessageTask,'after_update',receive_after_update)
         
     def session_dependency(self):
-        """FastAPI依赖项，用于请求范围的会话管理"""
-        session = self.get_session()
+        """FastAPI依赖项，用于请求范围的会话管理
+        
+        每个请求创建独立会话，请求结束后关闭并归还连接
+        """
+        session = self.session_factory()
+        try:
+            yield session
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    def read_session_dependency(self):
+        """FastAPI依赖项，请求范围的只读会话
+        
+        SQLite性能模式下使用只读连接池，读取不会等待写入
+        """
+        session = self.read_session_factory()
         try:
             yield session
         finally:
-            session.remove()
+            session.close()
 
 # 全局数据库实例
 DB = Db(User_In_Thread=True)
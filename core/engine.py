@@ -0,0 +1,206 @@
+import os
+import time
+import threading
+from sqlalchemy import create_engine, Engine, event, text
+from sqlalchemy.pool import QueuePool
+from core.config import cfg
+from core.print import print_info, print_success
+# Desc: 进程内共享的数据库引擎
+# 各模块的Db(tag=...)只是命名的逻辑会话，同一连接串在进程内只创建一组引擎和连接池
+
+
+class PoolMetrics:
+    """连接池获取连接的统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, failed: bool = False):
+        with self.lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            count = self.checkouts + self.failed
+            return {
+                "checkouts": self.checkouts,
+                "failed": self.failed,
+                "wait_avg_ms": round(self.wait_total / count * 1000, 3) if count else 0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """记录获取连接等待时间的连接池"""
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.record(time.perf_counter() - start, failed=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # dispose()会重建连接池，保留统计数据
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class EngineEntry:
+    """同一连接串共享的读写引擎"""
+
+    def __init__(self, con_str: str, engine: Engine, read_engine: Engine, sqlite_optimized: bool):
+        self.con_str = con_str
+        self.engine = engine
+        self.read_engine = read_engine
+        self.sqlite_optimized = sqlite_optimized
+        # 使用该引擎的逻辑会话名称
+        self.tags = []
+
+
+def is_sqlite_optimized(con_str: str) -> bool:
+    """是否启用SQLite性能模式"""
+    return con_str.startswith('sqlite:///') and bool(cfg.get("database.sqlite_optimize", False))
+
+
+def bind_sqlite_pragmas(engine: Engine, readonly: bool = False):
+    """为SQLite连接设置WAL及性能相关的PRAGMA"""
+    mmap_size = int(cfg.get("database.sqlite_mmap_size", 268435456))
+    cache_size = int(cfg.get("database.sqlite_cache_size", 65536))
+    busy_timeout = int(cfg.get("database.sqlite_busy_timeout", 5000))
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not readonly:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+        # 负数表示以KB为单位
+        cursor.execute(f"PRAGMA cache_size=-{cache_size}")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if readonly:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+class EngineRegistry:
+    """进程级引擎注册表，按连接串复用引擎和连接池"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _create_engine(self, con_str: str, pool_size: int, max_overflow: int, connect_args: dict) -> Engine:
+        engine = create_engine(con_str,
+                               poolclass=MeteredQueuePool,
+                               pool_size=pool_size,
+                               max_overflow=max_overflow,
+                               pool_timeout=int(cfg.get("database.pool_timeout", 30)),  # 获取连接时的超时时间（秒）
+                               pool_recycle=int(cfg.get("database.pool_recycle", 1800)),  # 连接池回收时间（秒）
+                               pool_pre_ping=True,  # 从连接池取出连接时检测连接是否可用
+                               echo=False,
+                               isolation_level="AUTOCOMMIT",
+                               connect_args=connect_args
+                               )
+        engine.pool.metrics = PoolMetrics()
+        return engine
+
+    def _create(self, con_str: str) -> EngineEntry:
+        # 检查SQLite数据库文件是否存在
+        if con_str.startswith('sqlite:///'):
+            db_path = con_str[10:]  # 去掉'sqlite:///'前缀
+            if not os.path.exists(db_path):
+                try:
+                    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                except Exception as e:
+                    pass
+                open(db_path, 'w').close()
+        if is_sqlite_optimized(con_str):
+            # SQLite性能模式：写入由进程内写锁串行执行(见core.db.SerializedWriteSession)，多个只读连接并发读取
+            busy_timeout = int(cfg.get("database.sqlite_busy_timeout", 5000))
+            connect_args = {"check_same_thread": False, "timeout": busy_timeout / 1000}
+            engine = self._create_engine(con_str, 1, int(cfg.get("database.sqlite_writer_overflow", 4)), connect_args)
+            bind_sqlite_pragmas(engine)
+            # 先打开写连接，确保数据库已切换到WAL模式
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            readers = int(cfg.get("database.sqlite_readers", 4))
+            read_engine = self._create_engine(con_str, readers, readers, connect_args)
+            bind_sqlite_pragmas(read_engine, readonly=True)
+            print_info(f"SQLite性能模式已启用: WAL, 只读连接{readers}个")
+            return EngineEntry(con_str, engine, read_engine, True)
+        connect_args = {"check_same_thread": False} if con_str.startswith('sqlite:///') else {}
+        engine = self._create_engine(con_str,
+                                     int(cfg.get("database.pool_size", 5)),
+                                     int(cfg.get("database.max_overflow", 10)),
+                                     connect_args)
+        return EngineEntry(con_str, engine, engine, False)
+
+    def get(self, con_str: str, tag: str = None) -> EngineEntry:
+        """获取连接串对应的引擎，首次使用时创建"""
+        with self._lock:
+            entry = self._entries.get(con_str)
+            if entry is None:
+                entry = self._create(con_str)
+                self._entries[con_str] = entry
+                print_success(f"数据库连接池已创建: {entry.engine.url.render_as_string(hide_password=True)}")
+            if tag and tag not in entry.tags:
+                entry.tags.append(tag)
+            return entry
+
+    def dispose(self, con_str: str):
+        """丢弃连接池中的空闲连接，用于数据库断开后重连"""
+        entry = self._entries.get(con_str)
+        if entry is None:
+            return
+        entry.engine.dispose()
+        if entry.read_engine is not entry.engine:
+            entry.read_engine.dispose()
+
+    def pool_status(self, engine: Engine) -> dict:
+        pool = engine.pool
+        status = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+        metrics = getattr(pool, "metrics", None)
+        if metrics is not None:
+            status.update(metrics.to_dict())
+        return status
+
+    def metrics(self) -> list:
+        """各连接池的使用情况"""
+        result = []
+        for entry in list(self._entries.values()):
+            item = {
+                "url": entry.engine.url.render_as_string(hide_password=True),
+                "sessions": entry.tags,
+                "write": self.pool_status(entry.engine),
+            }
+            if entry.read_engine is not entry.engine:
+                item["read"] = self.pool_status(entry.read_engine)
+            result.append(item)
+        return result
+
+
+ENGINES = EngineRegistry()
@@ -0,0 +1,349 @@
+import gzip
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from sqlalchemy import event
+from fastapi.responses import Response
+from core.models.article import ArticleBase
+from core.models.feed import Feed
+from core.models.tags import Tags
+from core.config import cfg
+from core.print import print_error
+from core.after_commit import after_commit
+# Desc: 已生成订阅源的内存缓存
+# 按公众号、标签、格式、分页、内容类型等缓存生成结果(LRU+TTL)，公众号有新文章写入时失效
+# 响应带强ETag和Last-Modified，客户端条件请求命中时返回304
+# 同一订阅源的并发生成合并为一次(single-flight)；过期但仍在容忍期内的内容先返回，由后台线程刷新
+# 缓存时同时保存gzip、brotli压缩版本，按Accept-Encoding直接返回，命中时不再压缩
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 依赖全部公众号的缓存(全部文章、标签)
+ALL_FEEDS = "*"
+
+
+# 压缩格式的优先顺序及对应的ETag后缀
+ENCODINGS = (("br", "-br"), ("gzip", "-gz"))
+
+
+def compress_variants(raw: bytes) -> dict:
+    """生成内容的压缩版本，内容过小时不压缩"""
+    variants = {}
+    if len(raw) < int(cfg.get("rss.compress_min_size", 1024)):
+        return variants
+    # mtime固定为0，相同内容的压缩结果保持一致
+    variants["gzip"] = gzip.compress(raw, compresslevel=int(cfg.get("rss.gzip_level", 6)), mtime=0)
+    if brotli is not None:
+        variants["br"] = brotli.compress(raw, quality=int(cfg.get("rss.brotli_quality", 5)))
+    return variants
+
+
+def parse_accept_encoding(value: str) -> dict:
+    """解析Accept-Encoding，返回编码 -> q值"""
+    result = {}
+    for part in (value or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        result[name] = q
+    return result
+
+
+class FeedCacheEntry:
+    def __init__(self, body: str, media_type: str, headers: dict, feeds: set, last_modified: float):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.media_type = media_type
+        self.headers = headers or {}
+        self.feeds = feeds
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.last_modified = int(last_modified)
+        self.created_at = time.time()
+        self.variants = compress_variants(self.body) if cfg.get("rss.compress", True) else {}
+
+    def etag_for(self, encoding: str) -> str:
+        """各编码版本使用不同的强ETag"""
+        for name, suffix in ENCODINGS:
+            if name == encoding:
+                return self.etag[:-1] + suffix + '"'
+        return self.etag
+
+    def etags(self) -> set:
+        return {self.etag} | {self.etag_for(name) for name in self.variants}
+
+    def negotiate(self, accept_encoding: str) -> str:
+        """按Accept-Encoding选择压缩版本，返回identity表示不压缩"""
+        if not self.variants or not accept_encoding:
+            return "identity"
+        accepted = parse_accept_encoding(accept_encoding)
+        best, best_q = "identity", 0.0
+        for name, _ in ENCODINGS:
+            q = accepted.get(name, accepted.get("*", 0.0))
+            if name in self.variants and q > best_q:
+                best, best_q = name, q
+        return best
+
+    def content(self, encoding: str) -> bytes:
+        return self.variants.get(encoding, self.body)
+
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def response_headers(self, encoding: str = "identity") -> dict:
+        headers = dict(self.headers)
+        headers["ETag"] = self.etag_for(encoding)
+        headers["Last-Modified"] = formatdate(self.last_modified, usegmt=True)
+        headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return headers
+
+
+class _Flight:
+    """进行中的一次订阅源生成"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class FeedCache:
+    """订阅源内存缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # 公众号ID -> 依赖它的缓存键
+        self._by_feed = {}
+        # 缓存键 -> 进行中的生成
+        self._flights = {}
+        # 每次失效递增，生成期间发生失效的结果不写入缓存
+        self._generation = 0
+        self._executor = None
+
+    def enabled(self) -> bool:
+        return int(cfg.get("rss.memory_cache_size", 500)) > 0
+
+    def key(self, **parts) -> str:
+        return "&".join(f"{k}={parts[k]}" for k in sorted(parts))
+
+    def generation(self) -> int:
+        """当前的失效计数，在缓存外生成内容时用于set的generation参数"""
+        return self._generation
+
+    def lookup(self, key: str):
+        """读取缓存
+
+        Returns:
+            tuple: (缓存项, 是否未过期)，超过容忍期或不存在时缓存项为None
+        """
+        if not self.enabled():
+            return None, False
+        ttl = int(cfg.get("rss.memory_cache_ttl", 600))
+        stale = int(cfg.get("rss.memory_cache_stale", 300))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            age = entry.age()
+            if ttl > 0 and age > ttl + max(stale, 0):
+                return None, False
+            self._entries.move_to_end(key)
+            return entry, ttl <= 0 or age <= ttl
+
+    def get(self, key: str):
+        """读取未过期的缓存"""
+        entry, fresh = self.lookup(key)
+        return entry if fresh else None
+
+    def set(self, key: str, body: str, media_type: str, headers: dict = None, feeds: set = None,
+            generation: int = None) -> FeedCacheEntry:
+        """写入缓存，内容未变化时保留原Last-Modified
+
+        generation为生成开始时的失效计数，期间发生过失效时结果只返回不缓存
+        """
+        now = time.time()
+        entry = FeedCacheEntry(body, media_type, headers, set(feeds or [ALL_FEEDS]), now)
+        if not self.enabled():
+            return entry
+        size = int(cfg.get("rss.memory_cache_size", 500))
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return entry
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._unindex(key, old)
+                if old.etag == entry.etag:
+                    entry.last_modified = old.last_modified
+            self._entries[key] = entry
+            for feed_id in entry.feeds:
+                self._by_feed.setdefault(feed_id, set()).add(key)
+            while len(self._entries) > size:
+                k, e = self._entries.popitem(last=False)
+                self._unindex(k, e)
+        return entry
+
+    def _unindex(self, key: str, entry: FeedCacheEntry):
+        for feed_id in entry.feeds:
+            keys = self._by_feed.get(feed_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    self._by_feed.pop(feed_id, None)
+
+    def fetch(self, key: str, build, refresh=None) -> FeedCacheEntry:
+        """读取缓存，未命中时生成
+
+        并发的相同请求等待同一次生成；缓存已过期但仍在容忍期内时直接返回旧内容，
+        并在后台调用refresh刷新
+
+        Args:
+            key: 缓存键
+            build: 在当前线程生成订阅源，返回(内容, 媒体类型, 响应头, 依赖的公众号ID)
+            refresh: 在后台线程生成订阅源，返回值同build，为None时不在后台刷新
+        """
+        entry, fresh = self.lookup(key)
+        if entry is not None and fresh:
+            return entry
+        if entry is not None and refresh is not None:
+            self._refresh(key, refresh)
+            return entry
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if leader:
+            return self._run(key, flight, build)
+        timeout = int(cfg.get("rss.memory_cache_wait", 30))
+        if flight.done.wait(timeout):
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+        # 等待超时，自行生成但不影响进行中的生成
+        return self.set(key, *build())
+
+    def _run(self, key: str, flight: _Flight, build) -> FeedCacheEntry:
+        generation = self._generation
+        try:
+            flight.entry = self.set(key, *build(), generation=generation)
+            return flight.entry
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def _refresh(self, key: str, refresh):
+        with self._lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = _Flight()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=int(cfg.get("rss.refresh_workers", 2)),
+                                                    thread_name_prefix="feed-refresh")
+
+        def task():
+            try:
+                self._run(key, flight, refresh)
+            except Exception as e:
+                print_error(f"后台刷新订阅源失败: {e}")
+        self._executor.submit(task)
+
+    def invalidate(self, feed_ids):
+        """使指定公众号及依赖全部公众号的缓存失效"""
+        if isinstance(feed_ids, str):
+            feed_ids = [feed_ids]
+        with self._lock:
+            self._generation += 1
+            keys = set(self._by_feed.get(ALL_FEEDS, ()))
+            for feed_id in feed_ids:
+                if feed_id == ALL_FEEDS:
+                    keys = set(self._entries.keys())
+                    break
+                keys |= self._by_feed.get(feed_id, set())
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._unindex(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_feed.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "feeds": len(self._by_feed), "building": len(self._flights)}
+
+
+FEED_CACHE = FeedCache()
+
+
+def is_not_modified(request, entry: FeedCacheEntry) -> bool:
+    """判断条件请求是否命中，If-None-Match优先于If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [t.strip() for t in if_none_match.split(",")]
+        etags = entry.etags()
+        return any(t.removeprefix("W/") in etags for t in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return entry.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_response(request, entry: FeedCacheEntry) -> Response:
+    """按条件请求返回304或完整内容，按Accept-Encoding返回缓存的压缩版本"""
+    encoding = entry.negotiate(request.headers.get("accept-encoding"))
+    headers = entry.response_headers(encoding)
+    if is_not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.content(encoding), media_type=entry.media_type, headers=headers)
+
+
+# 文章写入、删除或状态变化提交后使对应公众号的缓存失效
+@event.listens_for(ArticleBase, "after_insert", propagate=True)
+@event.listens_for(ArticleBase, "after_update", propagate=True)
+@event.listens_for(ArticleBase, "after_delete", propagate=True)
+def _article_changed(mapper, connection, target):
+    after_commit(target, FEED_CACHE.invalidate, target.mp_id)
+
+
+# 公众号或标签信息变化时清空缓存
+@event.listens_for(Feed, "after_update")
+@event.listens_for(Feed, "after_delete")
+@event.listens_for(Tags, "after_insert")
+@event.listens_for(Tags, "after_update")
+@event.listens_for(Tags, "after_delete")
+def _feed_changed(mapper, connection, target):
+    after_commit(target, FEED_CACHE.invalidate, ALL_FEEDS)
+
+
+# RSS输出相关配置变化后，已生成的订阅源不再有效
+@cfg.on_change
+def _config_changed(config, changed_keys):
+    if any(key.startswith("rss.") for key in changed_keys):
+        FEED_CACHE.clear()
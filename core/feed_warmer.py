@@ -0,0 +1,108 @@
+import time
+import threading
+from core.config import cfg
+from core.print import print_info, print_error
+# Desc: 订阅源预热
+# 订阅源请求时按缓存键记录访问次数，采集完成或标签修改后由后台线程重新生成访问最多的订阅源并放入缓存，
+# 使读者请求尽量命中已生成的内容
+# 预热只作用于当前进程的订阅源缓存，多进程部署时各进程按自身的访问记录预热
+
+
+class FeedWarmer:
+    """订阅源预热"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # 缓存键 -> {"count", "spec", "last"}
+        self._hits = {}
+        # 等待预热的公众号ID，None表示全部
+        self._pending = set()
+        self._pending_all = False
+        self._thread = None
+
+    def enabled(self) -> bool:
+        return int(cfg.get("rss.warm_top", 20)) > 0
+
+    def record(self, key: str, spec: dict):
+        """记录一次订阅源访问
+
+        Args:
+            key: 订阅源缓存键
+            spec: 重新生成该订阅源所需的参数
+        """
+        if not self.enabled():
+            return
+        with self._lock:
+            hit = self._hits.get(key)
+            if hit is None:
+                max_tracked = int(cfg.get("rss.warm_track", 1000))
+                if len(self._hits) >= max_tracked:
+                    # 丢弃访问最少的记录
+                    coldest = min(self._hits, key=lambda k: (self._hits[k]["count"], self._hits[k]["last"]))
+                    del self._hits[coldest]
+                hit = self._hits[key] = {"count": 0, "spec": spec}
+            hit["count"] += 1
+            hit["last"] = time.time()
+
+    def schedule(self, feed_ids=None):
+        """安排预热，feed_ids为空时预热全部访问记录"""
+        if not self.enabled():
+            return
+        with self._lock:
+            if feed_ids is None:
+                self._pending_all = True
+            else:
+                self._pending.update([feed_ids] if isinstance(feed_ids, str) else feed_ids)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="feed-warmer", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _take(self) -> list:
+        """取出需要预热的订阅源，按访问次数从高到低，同时衰减访问次数"""
+        top = int(cfg.get("rss.warm_top", 20))
+        with self._lock:
+            feed_ids, warm_all = self._pending, self._pending_all
+            self._pending, self._pending_all = set(), False
+            candidates = []
+            for key, hit in self._hits.items():
+                feed_id = hit["spec"].get("feed_id")
+                # 全部文章和标签订阅源依赖所有公众号
+                if warm_all or feed_id in ("all", None) or feed_id in feed_ids:
+                    candidates.append((hit["count"], key, hit["spec"]))
+            candidates.sort(key=lambda c: c[0], reverse=True)
+            for key in list(self._hits):
+                self._hits[key]["count"] //= 2
+                if self._hits[key]["count"] <= 0:
+                    del self._hits[key]
+        return candidates[:top]
+
+    def _run(self):
+        from apis.rss import warm_feed
+        while True:
+            if not self._wakeup.wait(600):
+                # 长时间空闲时退出线程，下次安排预热时重新启动
+                with self._lock:
+                    if not self._pending and not self._pending_all:
+                        self._thread = None
+                        return
+                continue
+            # 等待一段时间，合并连续的采集和修改
+            time.sleep(float(cfg.get("rss.warm_delay", 2)))
+            self._wakeup.clear()
+            candidates = self._take()
+            if not candidates:
+                continue
+            start = time.perf_counter()
+            warmed = 0
+            for _, key, spec in candidates:
+                try:
+                    warm_feed(key, spec)
+                    warmed += 1
+                except Exception as e:
+                    print_error(f"预热订阅源失败: {e}")
+            print_info(f"已预热订阅源{warmed}个，耗时{time.perf_counter() - start:.2f}秒")
+
+
+FEED_WARMER = FeedWarmer()
@@ -0,0 +1,68 @@
+import time
+import threading
+from sqlalchemy import event
+from core.models.feed import Feed
+from core.config import cfg
+from core.print import print_error
+# Desc: 公众号信息的进程内缓存
+# feeds表记录少且很少变动，列表、RSS等路径直接从缓存读取公众号名称、封面等信息，不再逐条查询
+# /mps、导入接口写入后主动失效；ORM写入同时标记失效；多进程部署时依赖过期时间刷新
+
+
+class FeedRegistry:
+    """公众号缓存，id -> Feed(已脱离会话的对象)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._feeds = {}
+        self._loaded_at = 0
+        self._dirty = True
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _expired(self) -> bool:
+        ttl = int(cfg.get("feeds.cache_ttl", 300))
+        return self._dirty or (ttl > 0 and time.time() - self._loaded_at > ttl)
+
+    def _load(self):
+        from core.db import DB
+        session = DB.session_factory()
+        try:
+            # 先清除标记，加载期间发生的写入会再次标记失效
+            self._dirty = False
+            feeds = session.query(Feed).all()
+            session.expunge_all()
+        except Exception as e:
+            self._dirty = True
+            print_error(f"加载公众号缓存失败: {e}")
+            return
+        finally:
+            session.close()
+        self._feeds = {feed.id: feed for feed in feeds}
+        self._loaded_at = time.time()
+
+    def _data(self) -> dict:
+        if self._expired():
+            with self._lock:
+                if self._expired():
+                    self._load()
+        return self._feeds
+
+    def get(self, feed_id: str):
+        return self._data().get(feed_id)
+
+    def name(self, feed_id: str, default: str = "未知公众号") -> str:
+        feed = self.get(feed_id)
+        return feed.mp_name if feed else default
+
+
+FEEDS = FeedRegistry()
+
+
+# ORM写入公众号时标记缓存失效
+@event.listens_for(Feed, "after_insert")
+@event.listens_for(Feed, "after_update")
+@event.listens_for(Feed, "after_delete")
+def _feed_changed(mapper, connection, target):
+    FEEDS.invalidate()
@@ -0,0 +1,77 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from core.config import cfg
+# Desc: 订阅源条目片段缓存
+# 每篇文章的<item>/<entry>/JSON对象按(格式, 输出选项, 条目内容)只生成一次，
+# 公众号、全部文章、标签、关键词等订阅源直接拼接缓存的片段，不再重复格式化正文和时间
+# 条目内容变化(标题、链接、正文哈希等)时键随之变化，旧片段由LRU淘汰
+
+
+class FragmentCache:
+    """条目片段的内存缓存(LRU，按条数和总大小限制)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind: str, options: tuple, item: dict) -> str:
+        """片段缓存键：格式、输出选项指纹和条目内容指纹"""
+        meta = {k: v for k, v in item.items() if k not in ("content", "content_hash")}
+        digest = hashlib.sha1(json.dumps(meta, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        content = item.get("content")
+        if content:
+            # 有正文哈希时直接使用，避免对长正文重复计算
+            digest.update((item.get("content_hash") or hashlib.sha1(str(content).encode("utf-8")).hexdigest()).encode("ascii"))
+        # 选项按位置区分含义，不排序；使用sha1而不是hash()，键在各进程间保持一致
+        opts = hashlib.sha1(repr(options).encode("utf-8")).hexdigest()[:16]
+        return f"{kind}:{opts}:{digest.hexdigest()}"
+
+    def get(self, key: str):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def set(self, key: str, text: str):
+        max_entries = int(cfg.get("rss.fragment_cache_size", 5000))
+        max_size = int(cfg.get("rss.fragment_cache_mb", 64)) * 1024 * 1024
+        if max_entries <= 0 or len(text) > max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = text
+            self._size += len(text)
+            while self._entries and (len(self._entries) > max_entries or self._size > max_size):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def render(self, kind: str, options: tuple, item: dict, render) -> str:
+        """读取片段，未命中时调用render(item)生成并缓存"""
+        key = self.key(kind, options, item)
+        text = self.get(key)
+        if text is None:
+            text = render(item)
+            self.set(key, text)
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "size": self._size, "hits": self.hits, "misses": self.misses}
+
+
+FRAGMENTS = FragmentCache()
@@ -0,0 +1,52 @@
+import httpx
+import threading
+from core.config import cfg
+# Desc: 进程内共享的HTTP客户端
+# 图片代理等高频外部请求复用同一个连接池(HTTP/1.1 keep-alive)，限制连接数并设置超时，应用关闭时统一释放
+
+_client = None
+# 后台线程(图片预取等)使用的同步客户端
+_sync_client = None
+_sync_lock = threading.Lock()
+
+
+def _options() -> dict:
+    limits = httpx.Limits(
+        max_connections=int(cfg.get("http.max_connections", 100)),
+        max_keepalive_connections=int(cfg.get("http.max_keepalive", 20)),
+        keepalive_expiry=float(cfg.get("http.keepalive_expiry", 30)),
+    )
+    timeout = httpx.Timeout(
+        float(cfg.get("http.timeout", 15)),
+        connect=float(cfg.get("http.connect_timeout", 5)),
+    )
+    return {"limits": limits, "timeout": timeout, "follow_redirects": True}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享的异步HTTP客户端，需在事件循环中调用"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(**_options())
+    return _client
+
+
+def get_sync_http_client() -> httpx.Client:
+    """获取共享的同步HTTP客户端，可在多个线程中同时使用"""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(**_options())
+        return _sync_client
+
+
+async def close_http_client():
+    """关闭共享客户端，释放连接池"""
+    global _client, _sync_client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    with _sync_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
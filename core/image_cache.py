@@ -0,0 +1,318 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from core.config import cfg
+from core.print import print_info, print_warning, print_error
+# Desc: 图片磁盘缓存
+# 图片按内容的sha256分两级子目录保存(images/ab/cd/<sha256>)，不同文章引用的相同图片只保存一份
+# URL到内容哈希的对应关系及元数据统一记录在images/index.db中，不再写.headers文件
+# 总大小超过上限时按最近访问时间淘汰(LRU)，后台线程定期清理；访问时间批量写入索引
+# 微信CDN图片内容不会变化，缓存有效期较长，过期后使用条件请求(If-None-Match/If-Modified-Since)重新验证
+
+# 旧版本平铺在缓存目录下的图片及.headers文件
+LEGACY_NAME = re.compile(r"^[0-9a-f]{64}(\.headers)?$")
+# 允许代理和预取的图片域名
+IMAGE_HOSTS = ("mmbiz.qpic.cn", "mmbiz.qlogo.cn", "mmecoa.qpic.cn")
+
+
+def normalize_url(url: str) -> str:
+    """与代理路由一致的上游地址：统一为http，去掉查询参数和锚点"""
+    url = url.strip().replace("https://", "http://")
+    return url.split("#", 1)[0].split("?", 1)[0]
+
+
+def url_key(url: str) -> str:
+    """图片地址对应的缓存键"""
+    return hashlib.sha256(f"GET_{normalize_url(url)}".encode('utf-8')).hexdigest()
+
+
+class ImageMeta:
+    def __init__(self, row):
+        (self.key, self.url, self.blob, self.size, self.content_type, self.etag,
+         self.last_modified, self.expires_at) = row
+
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+class ImageCache:
+    """图片缓存管理"""
+
+    def __init__(self, root: str = None):
+        self.root = root
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 待写入索引的访问记录 key -> (访问时间, 命中次数)
+        self._touched = {}
+        self._total_size = None
+        self._sweeper = None
+        self._wakeup = threading.Event()
+        self.counters = {"hits": 0, "misses": 0, "revalidated": 0, "prefetched": 0, "derived": 0, "bytes_served": 0,
+                         "bytes_fetched": 0, "evictions": 0, "bytes_evicted": 0}
+
+    def _get_root(self) -> str:
+        if self.root is None:
+            self.root = os.path.join(cfg.get("cache.dir", "data/cache") or "data/cache", "images")
+        return self.root
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            root = self._get_root()
+            os.makedirs(root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS images ("
+                         "key TEXT PRIMARY KEY, url TEXT, blob TEXT, size INTEGER NOT NULL, content_type TEXT, "
+                         "etag TEXT, last_modified TEXT, created_at REAL, accessed_at REAL, "
+                         "hits INTEGER DEFAULT 0, expires_at REAL)")
+            columns = {r[1] for r in conn.execute("PRAGMA table_info(images)")}
+            if "blob" not in columns:
+                # 旧索引的文件按URL哈希命名，直接作为内容文件继续使用
+                conn.execute("ALTER TABLE images ADD COLUMN blob TEXT")
+                conn.execute("UPDATE images SET blob=key")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_images_accessed_at ON images (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_images_blob ON images (blob)")
+            self._local.conn = conn
+        return conn
+
+    def ttl(self) -> int:
+        return int(cfg.get("cache.image_ttl", 2592000))
+
+    def max_size(self) -> int:
+        return int(cfg.get("cache.image_max_size", 1024)) * 1024 * 1024
+
+    def path(self, blob: str) -> str:
+        """按内容哈希前缀分片的文件路径"""
+        return os.path.join(self._get_root(), blob[:2], blob[2:4], blob)
+
+    def temp_path(self, key: str) -> str:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{threading.get_ident()}.{time.time_ns()}.tmp"
+
+    def get(self, key: str):
+        """读取缓存元数据，文件不存在时返回None"""
+        row = self._conn().execute(
+            "SELECT key, url, blob, size, content_type, etag, last_modified, expires_at FROM images WHERE key=?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        meta = ImageMeta(row)
+        if not os.path.exists(self.path(meta.blob)):
+            self._delete(key)
+            return None
+        return meta
+
+    def hit(self, meta: ImageMeta):
+        """记录一次命中，访问时间由后台批量写入"""
+        with self._lock:
+            self.counters["hits"] += 1
+            self.counters["bytes_served"] += meta.size or 0
+            _, hits = self._touched.get(meta.key, (0, 0))
+            self._touched[meta.key] = (time.time(), hits + 1)
+            flush = len(self._touched) >= 1000
+        if flush:
+            self.flush()
+
+    def miss(self):
+        self.count("misses")
+
+    def count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def _blob_used(self, blob: str) -> bool:
+        return self._conn().execute("SELECT 1 FROM images WHERE blob=? LIMIT 1", (blob,)).fetchone() is not None
+
+    def commit(self, key: str, tmp: str, url: str, size: int, blob: str, content_type: str = None,
+               etag: str = None, last_modified: str = None, fetched: bool = True):
+        """将完整接收的临时文件按内容哈希放入缓存并记录元数据
+
+        Args:
+            blob: 文件内容的sha256，相同内容的图片共用一个文件
+            fetched: 是否从上游下载，本地生成的文件不计入下载字节数
+        """
+        now = time.time()
+        path = self.path(blob)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        added = 0
+        if self._blob_used(blob) and os.path.exists(path):
+            os.unlink(tmp)
+        else:
+            os.replace(tmp, path)
+            added = size
+        old = conn.execute("SELECT blob, size FROM images WHERE key=?", (key,)).fetchone()
+        conn.execute("INSERT OR REPLACE INTO images (key, url, blob, size, content_type, etag, last_modified, "
+                     "created_at, accessed_at, hits, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)",
+                     (key, url, blob, size, content_type, etag, last_modified, now, now, now + self.ttl()))
+        if old and old[0] != blob and not self._blob_used(old[0]):
+            # 图片内容已变化，旧文件不再被引用
+            self._unlink(old[0])
+            added -= old[1]
+        with self._lock:
+            if fetched:
+                self.counters["bytes_fetched"] += size
+            if self._total_size is not None:
+                self._total_size += added
+            over = self._total_size is not None and self._total_size > self.max_size() > 0
+        if over:
+            self._wakeup.set()
+
+    def link(self, key: str, meta: ImageMeta):
+        """新增一个指向已有文件的缓存键"""
+        now = time.time()
+        self._conn().execute("INSERT OR REPLACE INTO images (key, url, blob, size, content_type, etag, last_modified, "
+                             "created_at, accessed_at, hits, expires_at) VALUES (?, ?, ?, ?, ?, NULL, NULL, ?, ?, 0, ?)",
+                             (key, meta.url, meta.blob, meta.size, meta.content_type, now, now, now + self.ttl()))
+
+    def revalidated(self, meta: ImageMeta):
+        """条件请求返回304，延长有效期"""
+        self._conn().execute("UPDATE images SET expires_at=?, accessed_at=? WHERE key=?",
+                             (time.time() + self.ttl(), time.time(), meta.key))
+        self.count("revalidated")
+
+    def _unlink(self, blob: str):
+        try:
+            os.unlink(self.path(blob))
+        except FileNotFoundError:
+            pass
+
+    def _delete(self, key: str, unlink: bool = False):
+        """删除一条索引记录，内容文件不再被引用时一并删除，返回释放的空间"""
+        conn = self._conn()
+        row = conn.execute("SELECT blob, size FROM images WHERE key=?", (key,)).fetchone()
+        conn.execute("DELETE FROM images WHERE key=?", (key,))
+        freed = 0
+        if row and not self._blob_used(row[0]):
+            freed = row[1]
+            if unlink:
+                self._unlink(row[0])
+        with self._lock:
+            self._touched.pop(key, None)
+            if self._total_size is not None:
+                self._total_size -= freed
+        return freed
+
+    def flush(self):
+        """将访问记录写入索引"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            conn.executemany("UPDATE images SET accessed_at=?, hits=hits+? WHERE key=?",
+                             [(at, hits, key) for key, (at, hits) in touched.items()])
+            conn.execute("COMMIT")
+
+    def total_size(self) -> int:
+        if self._total_size is None:
+            size = self._conn().execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM images GROUP BY blob)").fetchone()[0]
+            with self._lock:
+                self._total_size = size
+        return self._total_size
+
+    def evict(self) -> int:
+        """超过大小上限时按最近访问时间淘汰到上限的90%"""
+        max_size = self.max_size()
+        if max_size <= 0 or self.total_size() <= max_size:
+            return 0
+        target = int(max_size * 0.9)
+        evicted = 0
+        conn = self._conn()
+        while self.total_size() > target:
+            # 按内容文件最近一次被访问的时间淘汰
+            rows = conn.execute("SELECT blob FROM images GROUP BY blob ORDER BY MAX(accessed_at) LIMIT 500").fetchall()
+            if not rows:
+                break
+            for (blob,) in rows:
+                size = 0
+                for (key,) in conn.execute("SELECT key FROM images WHERE blob=?", (blob,)).fetchall():
+                    size += self._delete(key, unlink=True)
+                evicted += 1
+                with self._lock:
+                    self.counters["evictions"] += 1
+                    self.counters["bytes_evicted"] += size
+                if self.total_size() <= target:
+                    break
+        if evicted:
+            print_info(f"图片缓存已淘汰{evicted}个文件，当前{self.total_size() // 1024 // 1024}MB")
+        return evicted
+
+    def purge_legacy(self) -> int:
+        """删除旧版本平铺在缓存目录中的图片和.headers文件"""
+        legacy_dir = os.path.dirname(self._get_root())
+        count = 0
+        try:
+            for entry in os.scandir(legacy_dir):
+                if entry.is_file() and LEGACY_NAME.match(entry.name):
+                    os.unlink(entry.path)
+                    count += 1
+        except OSError as e:
+            print_warning(f"清理旧图片缓存失败: {e}")
+        if count:
+            print_info(f"已清理旧版本图片缓存文件{count}个")
+        return count
+
+    def purge_temp(self, max_age: int = 3600) -> int:
+        """删除中断下载遗留的临时文件"""
+        count = 0
+        now = time.time()
+        for dirpath, _, filenames in os.walk(self._get_root()):
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        if now - os.path.getmtime(path) > max_age:
+                            os.unlink(path)
+                            count += 1
+                    except OSError:
+                        pass
+        return count
+
+    def sweep(self):
+        self.flush()
+        self.evict()
+
+    def start_sweeper(self):
+        """启动后台清理线程"""
+        if self._sweeper is not None:
+            return
+        self._sweeper = threading.Thread(target=self._sweep_loop, name="image-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep_loop(self):
+        try:
+            self.purge_legacy()
+            self.purge_temp()
+        except Exception as e:
+            print_error(f"清理图片缓存失败: {e}")
+        while True:
+            self._wakeup.wait(int(cfg.get("cache.image_sweep_interval", 300)))
+            self._wakeup.clear()
+            try:
+                self.sweep()
+            except Exception as e:
+                print_error(f"清理图片缓存失败: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        total = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / total, 4) if total else 0
+        try:
+            counters["size"] = self.total_size()
+            counters["entries"], counters["files"] = self._conn().execute(
+                "SELECT COUNT(*), COUNT(DISTINCT blob) FROM images").fetchone()
+        except Exception as e:
+            print_error(f"读取图片缓存统计失败: {e}")
+        return counters
+
+
+IMAGES = ImageCache()
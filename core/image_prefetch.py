@@ -0,0 +1,108 @@
+import re
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from core.config import cfg
+from core.http_client import get_sync_http_client
+from core.image_cache import IMAGES, IMAGE_HOSTS, normalize_url, url_key
+from core.print import print_info, print_warning
+# Desc: 采集时预取文章图片
+# 文章写入后从正文和封面中提取微信图片地址，由有限大小的线程池并发下载到图片缓存(按内容哈希去重)，
+# 读者请求/static/res/logo/时直接读取本地文件，不再依赖微信CDN链接是否过期或限流
+
+# 正文中的图片地址，微信文章懒加载的图片使用data-src
+IMAGE_SRC = re.compile(r'\b(?:data-)?src=["\'](https?://[^"\'\s>]+)["\']', re.IGNORECASE)
+
+
+def extract_image_urls(article: dict) -> list:
+    """提取文章封面和正文中允许代理的图片地址，按出现顺序去重"""
+    candidates = [article.get("pic_url") or ""]
+    content = article.get("content") or ""
+    if content:
+        candidates.extend(IMAGE_SRC.findall(content))
+    urls = {}
+    for url in candidates:
+        url = normalize_url(url.replace("&amp;", "&"))
+        if urlparse(url).netloc in IMAGE_HOSTS:
+            urls.setdefault(url_key(url), url)
+    return list(urls.items())
+
+
+class ImagePrefetcher:
+    """文章图片预取"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        # 已排队或正在下载的缓存键
+        self._pending = set()
+
+    def enabled(self) -> bool:
+        return bool(cfg.get("cache.image_prefetch", True))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            workers = max(1, int(cfg.get("cache.image_prefetch_workers", 4)))
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-prefetch")
+        return self._executor
+
+    def submit(self, articles: list) -> int:
+        """安排下载文章中尚未缓存的图片，返回新排队的图片数量"""
+        if not self.enabled() or not articles:
+            return 0
+        queued = 0
+        max_pending = int(cfg.get("cache.image_prefetch_queue", 2000))
+        for article in articles:
+            for key, url in extract_image_urls(article):
+                with self._lock:
+                    if key in self._pending or len(self._pending) >= max_pending:
+                        continue
+                    self._pending.add(key)
+                    executor = self._get_executor()
+                executor.submit(self._fetch, key, url)
+                queued += 1
+        if queued:
+            print_info(f"已安排预取图片{queued}张")
+        return queued
+
+    def _fetch(self, key: str, url: str):
+        try:
+            meta = IMAGES.get(key)
+            if meta is not None and meta.fresh():
+                return
+            self.download(key, url)
+        except Exception as e:
+            print_warning(f"预取图片失败 {url}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def download(self, key: str, url: str) -> bool:
+        """下载一张图片放入缓存，内容按sha256去重"""
+        client = get_sync_http_client()
+        tmp = IMAGES.temp_path(key)
+        try:
+            with client.stream("GET", url) as resp:
+                if resp.status_code != 200:
+                    return False
+                size = 0
+                digest = hashlib.sha256()
+                with open(tmp, 'wb') as f:
+                    for chunk in resp.iter_bytes():
+                        f.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+                IMAGES.commit(key, tmp, url, size, digest.hexdigest(),
+                              content_type=resp.headers.get("content-type"),
+                              etag=resp.headers.get("etag"),
+                              last_modified=resp.headers.get("last-modified"))
+            IMAGES.count("prefetched")
+            return True
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+
+IMAGE_PREFETCH = ImagePrefetcher()
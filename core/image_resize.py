@@ -0,0 +1,132 @@
+import os
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from core.config import cfg
+from core.image_cache import IMAGES, ImageMeta
+from core.print import print_warning
+from core.image_transform import NEGOTIATE_ORDER, saveable_formats, transform
+# Desc: 图片缩放与格式转换
+# 图片代理支持width/quality/format参数，未指定格式时按Accept头协商WebP/AVIF
+# 转换在独立的进程池中使用Pillow完成，结果按(原图内容哈希, 参数)放入图片缓存，相同请求只转换一次
+# 动图、无法识别的图片或转换后不小于原图时直接使用原图
+
+
+class ImageResizer:
+    """图片缩放与格式转换"""
+
+    def __init__(self):
+        self._pool = None
+        self._formats = None
+        # 正在转换的缓存键 -> 任务，相同的转换请求只执行一次
+        self._tasks = {}
+
+    def negotiate(self) -> bool:
+        return bool(cfg.get("cache.image_negotiate", True))
+
+    def formats(self) -> set:
+        if self._formats is None:
+            self._formats = saveable_formats()
+        return self._formats
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            workers = max(1, int(cfg.get("cache.image_resize_workers", 2)))
+            # 使用spawn启动子进程，避免复制服务进程中的线程和连接
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def options(self, params, accept: str = "") -> dict:
+        """解析请求参数，不需要转换时返回None
+
+        Args:
+            params: 查询参数，支持width、quality、format
+            accept: 请求的Accept头，未指定format时用于协商输出格式
+        """
+        width = _int(params.get("width"))
+        if width is not None:
+            width = min(max(width, 16), int(cfg.get("cache.image_max_width", 1920)))
+        fmt = (params.get("format") or "").lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in self.formats():
+            fmt = None
+            if self.negotiate():
+                fmt = next((f for f in NEGOTIATE_ORDER if f in self.formats() and f"image/{f}" in accept), None)
+        if width is None and fmt is None:
+            return None
+        quality = _int(params.get("quality")) or int(cfg.get("cache.image_quality", 80))
+        return {"width": width, "quality": min(max(quality, 1), 100), "format": fmt}
+
+    def key(self, meta: ImageMeta, opts: dict) -> str:
+        return hashlib.sha256(f"{meta.blob}:{opts['width']}:{opts['quality']}:{opts['format']}".encode('utf-8')).hexdigest()
+
+    async def derive(self, meta: ImageMeta, opts: dict) -> ImageMeta:
+        """获取原图的转换结果，转换失败时返回原图"""
+        key = self.key(meta, opts)
+        derived = await asyncio.to_thread(IMAGES.get, key)
+        if derived is not None:
+            return derived
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(self._render(meta, opts, key))
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        try:
+            return await asyncio.shield(task)
+        except Exception as e:
+            print_warning(f"转换图片失败 {meta.url}: {e}")
+            return meta
+
+    async def _render(self, meta: ImageMeta, opts: dict, key: str) -> ImageMeta:
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_pool(), transform, IMAGES.path(meta.blob),
+                                                opts["width"], opts["quality"], opts["format"])
+        except BrokenProcessPool as e:
+            # 子进程异常退出，下次请求时重建进程池
+            print_warning(f"图片转换进程异常: {e}")
+            self._pool = None
+            return meta
+        except Exception as e:
+            # 无法识别的图片同样记录为原图
+            print_warning(f"转换图片失败 {meta.url}: {e}")
+            result = None
+        if result is not None and opts["width"] is None and len(result[0]) >= meta.size:
+            # 只转换格式但没有变小
+            result = None
+        return await asyncio.to_thread(self._store, meta, key, result)
+
+    def _store(self, meta: ImageMeta, key: str, result) -> ImageMeta:
+        if result is None:
+            # 记录为原图，之后不再重复转换
+            IMAGES.link(key, meta)
+        else:
+            data, content_type = result
+            tmp = IMAGES.temp_path(key)
+            try:
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                IMAGES.commit(key, tmp, meta.url, len(data), hashlib.sha256(data).hexdigest(),
+                              content_type=content_type, fetched=False)
+            finally:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+            IMAGES.count("derived")
+        return IMAGES.get(key) or meta
+
+
+def _int(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+IMAGE_RESIZER = ImageResizer()
@@ -0,0 +1,53 @@
+import io
+from PIL import Image, ImageOps
+# Desc: 图片缩放与格式转换的实际处理，在进程池的子进程中执行
+# 只依赖Pillow，子进程导入时不会加载配置、缓存索引等服务模块
+
+# 支持输出的格式 -> (Pillow格式, Content-Type)
+FORMATS = {
+    "avif": ("AVIF", "image/avif"),
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+# 协商时按优先级尝试的格式
+NEGOTIATE_ORDER = ("avif", "webp")
+
+
+def saveable_formats() -> set:
+    """当前Pillow可以写出的格式"""
+    Image.init()
+    return {name for name, (pil_format, _) in FORMATS.items() if pil_format in Image.SAVE}
+
+
+def transform(src: str, width: int = None, quality: int = 80, fmt: str = None):
+    """缩放并转换图片，在进程池中执行
+
+    Returns:
+        (图片数据, Content-Type)，无需转换或无法转换时返回None
+    """
+    with Image.open(src) as img:
+        if getattr(img, "is_animated", False):
+            return None
+        src_format = (img.format or "").lower()
+        fmt = fmt or src_format
+        if fmt not in FORMATS:
+            return None
+        resize = width is not None and img.width > width
+        if not resize and fmt == src_format:
+            return None
+        out = ImageOps.exif_transpose(img)
+        if resize:
+            height = max(1, round(out.height * width / out.width))
+            out = out.resize((width, height), Image.LANCZOS)
+        pil_format, content_type = FORMATS[fmt]
+        if pil_format == "JPEG" and out.mode not in ("RGB", "L"):
+            out = out.convert("RGB")
+        elif out.mode not in ("RGB", "RGBA", "L", "LA"):
+            out = out.convert("RGBA" if "transparency" in out.info else "RGB")
+        buf = io.BytesIO()
+        if pil_format == "PNG":
+            out.save(buf, pil_format, optimize=True)
+        else:
+            out.save(buf, pil_format, quality=quality)
+        return buf.getvalue(), content_type
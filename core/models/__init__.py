@@ -1,5 +1,5 @@
 # 导入文章模型
-from .article import Article 
+from .article import Article,ArticleContent
 # 导入订阅源模型
 from .feed import Feed
 # 导入用户模型
@@ -1,7 +1,16 @@
-from  .base import Base,Column,String,Integer,DateTime,Text,DATA_STATUS
+from  .base import Base,Column,String,Integer,DateTime,Text,Blob,ForeignKey,DATA_STATUS
+from sqlalchemy import Index,exists
+from sqlalchemy.orm import relationship,deferred
+from core.content_store import pack_content,unpack_content
 class ArticleBase(Base):
     from_attributes = True
     __tablename__ = 'articles'
+    __table_args__ = (
+        # 按公众号过滤状态并按发布时间排序(RSS源、文章列表、上一篇/下一篇)
+        Index('ix_articles_mp_status_time', 'mp_id', 'status', 'publish_time'),
+        # 全部文章按状态过滤并按发布时间排序
+        Index('ix_articles_status_time', 'status', 'publish_time'),
+    )
     id = Column(String(255), primary_key=True)
     mp_id = Column(String(255))
     title = Column(String(1000))
@@ -13,5 +22,50 @@ class ArticleBase(Base):
     created_at = Column(DateTime)
     updated_at = Column(DateTime)  
     is_export = Column(Integer)
+class ArticleContent(Base):
+    """文章正文，压缩后单独存储"""
+    __tablename__ = 'article_contents'
+    article_id = Column(String(255), ForeignKey('articles.id', ondelete='CASCADE'), primary_key=True)
+    # 压缩算法 zlib/zstd
+    codec = Column(String(20))
+    data = Column(Blob)
+    # 原文sha256
+    content_hash = Column(String(64))
+    # 原文字节数
+    size = Column(Integer)
+    # 压缩后字节数
+    stored_size = Column(Integer)
+    updated_at = Column(DateTime)
+    # 去除标签后的正文纯文本，仅MySQL使用(ngram全文索引)，SQLite由FTS5索引正文
+    search_text = deferred(Column(Text))
+    @property
+    def text(self):
+        if getattr(self,"_text",None) is None:
+            self._text=unpack_content(self.codec,self.data)
+        return self._text
+    @text.setter
+    def text(self,value):
+        values=pack_content(value)
+        if values["content_hash"]==self.content_hash:
+            return
+        for k,v in values.items():
+            setattr(self,k,v)
+        self._text=value or ""
 class Article(ArticleBase):
-    content = Column(Text)
+    # 正文延迟加载，需要正文的查询使用 options(selectinload(Article.body))
+    body = relationship(ArticleContent, uselist=False, lazy="select", cascade="all, delete-orphan")
+    @property
+    def content(self):
+        return self.body.text if self.body is not None else None
+    @content.setter
+    def content(self,value):
+        if value is None:
+            self.body=None
+            return
+        if self.body is None:
+            self.body=ArticleContent()
+        self.body.text=value
+    @classmethod
+    def has_content(cls):
+        """正文非空的过滤条件"""
+        return exists().where(ArticleContent.article_id==cls.id,ArticleContent.size>0)
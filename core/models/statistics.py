@@ -0,0 +1,18 @@
+from  .base import Base,Column,String,Integer,DateTime
+
+class Statistics(Base):
+    #统计计数表，写入时增量维护，定时任务校正
+    #name: articles 全部文章，articles:<mp_id> 单个公众号的文章，feeds/message_tasks/tags 对应表的记录数
+    __tablename__ = 'statistics'
+    name = Column(String(255), primary_key=True)
+    # 记录总数
+    total = Column(Integer, default=0)
+    # 正常状态的文章数
+    active = Column(Integer, default=0)
+    # 已删除的文章数
+    deleted = Column(Integer, default=0)
+    # 有正文的文章数
+    has_content = Column(Integer, default=0)
+    # 最新文章发布时间
+    latest_publish_time = Column(Integer)
+    updated_at = Column(DateTime)
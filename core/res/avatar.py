@@ -27,7 +27,7 @@ def save_avatar_locally(avatar_url):
     
     # 下载并保存文件
     try:
-        response = requests.get(avatar_url)
+        response = requests.get(avatar_url, timeout=10)
         response.raise_for_status()
         with open(file_path, "wb") as f:
             f.write(response.content)
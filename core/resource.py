@@ -16,14 +16,20 @@ _STATIC_INFO = {
     }
 }
 
+# 当前进程，cpu_percent按两次调用之间的间隔计算，需复用同一个对象
+_PROCESS = psutil.Process()
+# 首次调用作为计算基准，之后的调用不再阻塞等待采样
+psutil.cpu_percent(interval=None)
+_PROCESS.cpu_percent(interval=None)
+
 def get_system_resources():
     # 获取动态变化的资源信息
     mem = psutil.virtual_memory()
-    cpu_percent = psutil.cpu_percent(interval=0.1)
+    cpu_percent = psutil.cpu_percent(interval=None)
     disk = psutil.disk_usage('./')
     # 获取当前 Python 进程的资源占用情况
-    current_process = psutil.Process()
-    process_cpu_percent = current_process.cpu_percent(interval=0.1)
+    current_process = _PROCESS
+    process_cpu_percent = current_process.cpu_percent(interval=None)
     process_mem_info = current_process.memory_info()
     # 单位转换函数
     def to_gb(bytes_value):
@@ -3,17 +3,25 @@ from datetime import datetime, timedelta
 import os
 import json
 from core.content_format import format_content
+from core.rss_cache import get_index
+from core.content_cache import CONTENT_CACHE
+from core.fragment_cache import FRAGMENTS
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\r\n'
+# 支持流式输出的格式，自定义模板需要完整数据，不支持流式输出
+STREAM_EXTS = ('rss', 'xml', 'atom', 'md', 'txt', 'json', 'jmd')
 class RSS:
     cache_dir = os.path.normpath("data/cache/rss")
-    content_cache_dir = os.path.normpath("data/cache/content")
     rss_file="all"
     
-    def __init__(self, name:str="all",cache_dir: str = None,ext:str="rss"):
+    def __init__(self, name:str="all",cache_dir: str = None,ext:str="rss",feed_id:str=None,tag_id:str=None):
         if cache_dir is not None:
             self.cache_dir = cache_dir
         self.ext=ext    
+        # 缓存文件所属的公众号、标签，用于按公众号失效
+        self.feed_id=feed_id
+        self.tag_id=tag_id
+        self.cache_index=get_index(self.cache_dir)
         os.makedirs(self.cache_dir, exist_ok=True)
-        os.makedirs(self.content_cache_dir, exist_ok=True)
         normalized_path = os.path.normpath(f"{self.cache_dir}/{name}.{ext}")
         if not normalized_path.startswith(self.cache_dir):
             raise ValueError("Invalid file path: Path traversal detected.")
@@ -26,27 +34,16 @@ class RSS:
             return "application/json"
         return "text/plain"
     
-    def cache_content(self, content_id: str, content: dict):
-        """缓存文章内容"""
+    def cache_content(self, content_id: str, content: dict, hash: str = None):
+        """缓存文章内容，hash为正文哈希，与已缓存的一致时跳过"""
+        if hash is not None and CONTENT_CACHE.has(content_id, hash):
+            return
         content["content"]=self.add_logo_prefix_to_urls(content["content"])
-        content_path = os.path.normpath(f"{self.content_cache_dir}/{content_id}.json")
-        if not content_path.startswith(self.content_cache_dir):
-            raise ValueError("Invalid content path: Path traversal detected.")
-        
-        with open(content_path, "w", encoding="utf-8") as f:
-            json.dump(content, f, ensure_ascii=False, indent=2)
+        CONTENT_CACHE.put(content_id, content, hash)
 
     def get_cached_content(self, content_id: str) -> dict:
         """获取缓存的文章内容"""
-        content_path = os.path.normpath(f"{self.content_cache_dir}/{content_id}.json")
-        if not content_path.startswith(self.content_cache_dir):
-            raise ValueError("Invalid content path: Path traversal detected.")
-        
-        try:
-            with open(content_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return None
+        return CONTENT_CACHE.get(content_id)
     def serialize_datetime(self,obj):
         if isinstance(obj, datetime):
             return obj.isoformat
@@ -73,9 +70,8 @@ class RSS:
         except:
             return text
        
-    def generate_rss(self,rss_list: dict, title: str = "Mp-We-Rss", 
-                    link: str = "https://github.com/rachelos/we-mp-rss",
-                    description: str = "RSS频道", language: str = "zh-CN",image_url:str=""):
+    def _rss_channel(self, title: str, link: str, description: str, language: str, image_url: str):
+        """生成RSS根元素及频道信息，返回(rss, channel)"""
         from core.config import cfg
         full_context=bool(cfg.get("rss.full_context",False))
         
@@ -98,58 +94,50 @@ class RSS:
             ET.SubElement(image, "url").text = image_url
             ET.SubElement(image, "title").text = title
             ET.SubElement(image, "link").text = link
+        return rss, channel
 
-        for rss_item in rss_list:
-            item = ET.SubElement(channel, "item")
-            ET.SubElement(item, "id").text = rss_item["id"]
-            ET.SubElement(item, "title").text = rss_item["title"]
-            ET.SubElement(item, "description").text = rss_item["description"] 
-            ET.SubElement(item, "guid").text = rss_item["link"]
-            # 添加图片封面
-            if cfg.get("rss.add_cover",False)==True:
-                enclosure = ET.SubElement(item, "enclosure")
-                enclosure.set("url", rss_item["image"])
-                enclosure.set("length", "0")
-                enclosure.set("type", "image/jpeg")
-            if full_context==True:
-                try:
-                    if cfg.get("rss.cdata",False)==True:
-                        content = f"<![CDATA[{str(rss_item['content'])}]]>"  # 使用CDATA包裹内容
-                    else:
-                        content = str(rss_item['content'])
-                    ET.SubElement(item, "content:encoded").text = content
-                except Exception as e:
-                    print(f"Error adding content:encoded element: {e}")
-                pass
-            # ET.SubElement(item, "category").text = rss_item["category"]
-            # ET.SubElement(item, "author").text = rss_item["author"]
-            ET.SubElement(item, "link").text = rss_item["link"]
-            ET.SubElement(item, "pubDate").text = self.datetime_to_rfc822(str(rss_item["updated"]))
+    def _rss_item(self, channel, rss_item: dict):
+        """向频道添加一条RSS条目"""
+        from core.config import cfg
+        full_context=bool(cfg.get("rss.full_context",False))
+        item = ET.SubElement(channel, "item")
+        ET.SubElement(item, "id").text = rss_item["id"]
+        ET.SubElement(item, "title").text = rss_item["title"]
+        ET.SubElement(item, "description").text = rss_item["description"] 
+        ET.SubElement(item, "guid").text = rss_item["link"]
+        # 添加图片封面
+        if cfg.get("rss.add_cover",False)==True:
+            enclosure = ET.SubElement(item, "enclosure")
+            enclosure.set("url", rss_item["image"])
+            enclosure.set("length", "0")
+            enclosure.set("type", "image/jpeg")
+        if full_context==True:
+            try:
+                if cfg.get("rss.cdata",False)==True:
+                    content = f"<![CDATA[{str(rss_item['content'])}]]>"  # 使用CDATA包裹内容
+                else:
+                    content = str(rss_item['content'])
+                ET.SubElement(item, "content:encoded").text = content
+            except Exception as e:
+                print(f"Error adding content:encoded element: {e}")
+            pass
+        # ET.SubElement(item, "category").text = rss_item["category"]
+        # ET.SubElement(item, "author").text = rss_item["author"]
+        ET.SubElement(item, "link").text = rss_item["link"]
+        ET.SubElement(item, "pubDate").text = self.datetime_to_rfc822(str(rss_item["updated"]))
+        return item
 
-        # 生成XML字符串(添加声明和美化输出)
-        tree_str = '<?xml version="1.0" encoding="utf-8"?>\r\n' + \
-                ET.tostring(rss, encoding="utf-8", method="xml", short_empty_elements=False).decode("utf-8")
-        
-        if self.rss_file is not None:
-            with open(self.rss_file, "w", encoding="utf-8") as f:
-                f.write(tree_str)
-        return tree_str
-     
-    def generate_atom(self,rss_list: dict, title: str = "Mp-We-Rss", 
+    def generate_rss(self,rss_list: dict, title: str = "Mp-We-Rss", 
                     link: str = "https://github.com/rachelos/we-mp-rss",
-                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="") -> str:
-        """生成Atom格式的RSS内容
+                    description: str = "RSS频道", language: str = "zh-CN",image_url:str=""):
+        # 频道头部与缓存的条目片段拼接生成XML字符串
+        tree_str = "".join(self._render_parts(rss_list, "rss", title, link, description, language, image_url))
         
-        Args:
-            rss_list: RSS条目列表
-            title: 频道标题
-            link: 频道链接
-            description: 频道描述
-            language: 语言
-            
-        Returns:
-            Atom格式的XML字符串
-        """
+        self.save_cache(tree_str)
+        return tree_str
+
+    def _atom_feed(self, title: str, link: str, image_url: str):
+        """生成Atom根元素及频道信息"""
         from core.config import cfg
         full_context = bool(cfg.get("rss.full_context", False))
         
@@ -171,41 +159,60 @@ class RSS:
             ET.SubElement(image, "url").text = str(image_url)
             ET.SubElement(image, "title").text = str(title)
             ET.SubElement(image, "link").text = str(link)
-        for rss_item in rss_list:
-            entry = ET.SubElement(feed, "entry")
-            ET.SubElement(entry, "id").text = rss_item["id"]
-            ET.SubElement(entry, "title").text = str(rss_item["title"])
-            ET.SubElement(entry, "link", href=str(rss_item["link"]))
-            ET.SubElement(entry, "updated").text =self.datetime_to_rfc822(str(rss_item["updated"]))
-            ET.SubElement(entry, "summary").text = str(rss_item["description"])
-            ET.SubElement(entry, "author").text = str(rss_item["mp_name"])
-             # 添加图片封面
-            if cfg.get("rss.add_cover",False)==True:
-                enclosure = ET.SubElement(entry, "enclosure")
-                enclosure.set("url", str(rss_item["image"]))
-                enclosure.set("length", "0")
-                enclosure.set("type", "image/jpeg")
+        return feed
+
+    def _atom_entry(self, feed, rss_item: dict):
+        """向Atom频道添加一条条目"""
+        from core.config import cfg
+        full_context = bool(cfg.get("rss.full_context", False))
+        entry = ET.SubElement(feed, "entry")
+        ET.SubElement(entry, "id").text = rss_item["id"]
+        ET.SubElement(entry, "title").text = str(rss_item["title"])
+        ET.SubElement(entry, "link", href=str(rss_item["link"]))
+        ET.SubElement(entry, "updated").text =self.datetime_to_rfc822(str(rss_item["updated"]))
+        ET.SubElement(entry, "summary").text = str(rss_item["description"])
+        ET.SubElement(entry, "author").text = str(rss_item["mp_name"])
+         # 添加图片封面
+        if cfg.get("rss.add_cover",False)==True:
+            enclosure = ET.SubElement(entry, "enclosure")
+            enclosure.set("url", str(rss_item["image"]))
+            enclosure.set("length", "0")
+            enclosure.set("type", "image/jpeg")
+        
+        if full_context:
+            type=self.get_content_type()
+            # content = ET.SubElement(entry, "content", type=f"{str(type)}") 
+            # content.text = format_content(rss_item["content"],type)
+            content=format_content(rss_item["content"],type)
+            try:
+                if cfg.get("rss.cdata",False)==True:
+                    content = f"<![CDATA[{content}]]>"  # 使用CDATA包裹内容
+                else:
+                    ET.SubElement(entry, "content:encoded").text = content
+            except Exception as e:
+                print(f"Error adding content:encoded element: {e}")
+            pass
+        return entry
+     
+    def generate_atom(self,rss_list: dict, title: str = "Mp-We-Rss", 
+                    link: str = "https://github.com/rachelos/we-mp-rss",
+                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="") -> str:
+        """生成Atom格式的RSS内容
+        
+        Args:
+            rss_list: RSS条目列表
+            title: 频道标题
+            link: 频道链接
+            description: 频道描述
+            language: 语言
             
-            if full_context:
-                type=self.get_content_type()
-                # content = ET.SubElement(entry, "content", type=f"{str(type)}") 
-                # content.text = format_content(rss_item["content"],type)
-                content=format_content(rss_item["content"],type)
-                try:
-                    if cfg.get("rss.cdata",False)==True:
-                        content = f"<![CDATA[{content}]]>"  # 使用CDATA包裹内容
-                    else:
-                        ET.SubElement(entry, "content:encoded").text = content
-                except Exception as e:
-                    print(f"Error adding content:encoded element: {e}")
-                pass
-        # 生成XML字符串
-        tree_str = '<?xml version="1.0" encoding="utf-8"?>\r\n' + \
-                  ET.tostring(feed, encoding="utf-8", method="xml").decode("utf-8")
+        Returns:
+            Atom格式的XML字符串
+        """
+        # 频道头部与缓存的条目片段拼接生成XML字符串
+        tree_str = "".join(self._render_parts(rss_list, "atom", title, link, description, language, image_url))
         
-        if self.rss_file is not None:
-            with open(self.rss_file, "w", encoding="utf-8") as f:
-                f.write(tree_str)
+        self.save_cache(tree_str)
         return tree_str
     def set_content_type(self,type:str=None):
         self.content_type=type
@@ -218,9 +225,30 @@ class RSS:
         elif ext in("txt"):
             return "text"
         return "html"
+    def _json_channel(self, title: str, link: str, description: str, language: str, image_url: str, next_cursor: str = None) -> dict:
+        return {
+            "name":title,
+            "link":link,
+            "description":description,
+            "language": language,
+            "cover":image_url,
+            "next_cursor":next_cursor,
+        }
+    def _json_item(self, item: dict) -> dict:
+        type=self.get_content_type()
+        return {
+            "id": item["id"],
+            "title": item["title"],
+            "description": item["description"],
+            "link": item["link"],
+            "updated": item["updated"].isoformat() if isinstance(item["updated"], datetime) else item["updated"],
+            "content": format_content(item["content"],type),
+            "channel_name": item.get("mp_name", ""),
+            "feed": item.get("feed")
+        }
     def generate_json(self, rss_list: dict,title: str = "Mp-We-Rss", 
                     link: str = "https://github.com/rachelos/we-mp-rss",
-                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="") -> str:
+                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="",next_cursor:str=None) -> str:
         """获取JSON格式的RSS内容
         
         Args:
@@ -229,44 +257,102 @@ class RSS:
         Returns:
             JSON格式的字符串
         """
-        type=self.get_content_type()
-        result = {
-            "name":title,
-            "link":link,
-            "description":description,
-            "language": language,
-            "cover":image_url,
-            "items": [
-                {
-                    "id": item["id"],
-                    "title": item["title"],
-                    "description": item["description"],
-                    "link": item["link"],
-                    "updated": item["updated"].isoformat() if isinstance(item["updated"], datetime) else item["updated"],
-                    "content": format_content(item["content"],type),
-                    "channel_name": item.get("mp_name", ""),
-                    "feed": item.get("feed")
-                } for item in rss_list
-            ]
-        }
-        return json.dumps(result, ensure_ascii=False, indent=2, default=self.serialize_datetime)
+        return "".join(self._render_parts(rss_list, "json", title, link, description, language, image_url, next_cursor))
+
+    def can_stream(self, ext: str) -> bool:
+        return ext.lower().strip('.') in STREAM_EXTS
+
+    def stream(self, rss_list, ext: str, title: str = "Mp-We-Rss",
+                    link: str = "https://github.com/rachelos/we-mp-rss",
+                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="",next_cursor:str=None):
+        """逐条生成订阅源内容，依次输出头部、每个条目和尾部
+        
+        rss_list可以是生成器，内存中同一时间只保留一个条目；输出不写入磁盘缓存
+        
+        Args:
+            rss_list: RSS条目的可迭代对象
+            ext: 文件扩展名(.rss/.xml/.atom/.md/.txt/.json/.jmd)
+            
+        Yields:
+            str: 内容片段
+        """
+        ext = ext.lower().strip('.')
+        self.ext=ext
+        if ext in ('json','jmd'):
+            kind = "json"
+        elif ext in ('rss', 'xml'):
+            kind = "rss"
+        elif ext in ('atom','md','txt'):
+            kind = "atom"
+        else:
+            raise ValueError(f"Unsupported extension: {ext}")
+        yield from self._render_parts(rss_list, kind, title, link, description, language, image_url, next_cursor)
+
+    def _fragment_options(self, kind: str) -> tuple:
+        """影响条目输出的选项，作为片段缓存键的一部分"""
+        from core.config import cfg
+        return (kind, str(self.get_content_type()), bool(cfg.get("rss.full_context",False)),
+                bool(cfg.get("rss.cdata",False)), bool(cfg.get("rss.add_cover",False)))
+
+    def _xml_fragment(self, add_item, short: bool):
+        def render(rss_item: dict) -> str:
+            parent = ET.Element("channel")
+            element = add_item(parent, rss_item)
+            return ET.tostring(element, encoding="utf-8", method="xml", short_empty_elements=short).decode("utf-8")
+        return render
+
+    def _json_fragment(self, item: dict) -> str:
+        # 与整体json.dumps(indent=2)时items中对象的缩进保持一致
+        text = json.dumps(self._json_item(item), ensure_ascii=False, indent=2, default=self.serialize_datetime)
+        return "    " + text.replace("\n", "\n    ")
+
+    def _render_parts(self, rss_list, kind: str, title: str, link: str, description: str, language: str,
+                      image_url: str, next_cursor: str = None):
+        """依次生成频道头部、各条目片段和尾部，条目片段从片段缓存读取"""
+        options = self._fragment_options(kind)
+        if kind == "json":
+            head = json.dumps(self._json_channel(title, link, description, language, image_url, next_cursor), ensure_ascii=False, indent=2)
+            sep = head[:-2] + ',\n  "items": [\n'
+            for item in rss_list:
+                yield sep + FRAGMENTS.render(kind, options, item, self._json_fragment)
+                sep = ",\n"
+            yield '\n  ]\n}' if sep == ",\n" else head[:-2] + ',\n  "items": []\n}'
+            return
+        if kind == "rss":
+            root, _ = self._rss_channel(title, link, description, language, image_url)
+            render, short, close = self._xml_fragment(self._rss_item, False), False, "</channel>"
+        else:
+            root = self._atom_feed(title, link, image_url)
+            render, short, close = self._xml_fragment(self._atom_entry, True), True, "</feed>"
+        # 先序列化不含条目的文档，从频道结束标签处拆分出头部和尾部
+        doc = ET.tostring(root, encoding="utf-8", method="xml", short_empty_elements=short).decode("utf-8")
+        pos = doc.rindex(close)
+        yield XML_DECLARATION + doc[:pos]
+        for rss_item in rss_list:
+            yield FRAGMENTS.render(kind, options, rss_item, render)
+        yield doc[pos:]
 
     def get_cache(self):
         if not hasattr(self, 'rss_file') or not self.rss_file:
                return None
+        return self.cache_index.read(self.rss_file)
+    def save_cache(self,text:str):
+        """原子写入缓存文件并登记到缓存索引"""
+        if not self.rss_file:
+            return
         try:
-            with open(self.rss_file, "r", encoding="utf-8") as f:
-                return f.read()  
-        except FileNotFoundError:
-            return None     
+            self.cache_index.write(self.rss_file,text,feed_id=self.feed_id,tag_id=self.tag_id)
+        except Exception as e:
+            print(f"Error writing {self.rss_file}: {e}")
     def generate(self,rss_list: dict,ext=str, title: str = "Mp-We-Rss", 
                     link: str = "https://github.com/rachelos/we-mp-rss",
-                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="",template:str=None) -> str:
+                    description: str = "RSS频道", language: str = "zh-CN",image_url:str="",template:str=None,next_cursor:str=None) -> str:
         """根据扩展名获取对应格式的RSS内容
         
         Args:
             rss_list: RSS条目列表
             ext: 文件扩展名(.rss/.xml/.atom/.json)
+            next_cursor: 下一页游标(JSON格式输出，XML格式通过Link响应头返回)
             **kwargs: 传递给各格式生成方法的参数
             
         Returns:
@@ -282,7 +368,7 @@ class RSS:
         elif ext in ('atom','md','txt'):
             return self.generate_atom(rss_list, title=title, link=link, description=description,language=language,image_url=image_url)
         elif ext in ('json','jmd'):
-            return self.generate_json(rss_list, title=title, link=link, description=description,language=language,image_url=image_url)
+            return self.generate_json(rss_list, title=title, link=link, description=description,language=language,image_url=image_url,next_cursor=next_cursor)
         elif template is not None:
             return self.generate_by_template(rss_list,template, title=title, link=link, description=description,language=language,image_url=image_url)
         else:
@@ -294,23 +380,14 @@ class RSS:
             pass
     def clear_cache(self,mp_id:str=""):
 
-        """清除所有缓存文件
+        """清除缓存文件
         
-        删除data/cache/rss和data/cache/content目录中包含'mp_id'的文件
-        保持与现有方法相同的路径安全检查机制
+        按缓存索引删除公众号及全部文章、标签等聚合缓存，未指定公众号时清除全部缓存
         """
-        import shutil
-        
-        # 清除rss缓存目录
-        if os.path.exists(self.cache_dir):
-            for filename in os.listdir(self.cache_dir):
-                if f'{mp_id}_' not in filename:
-                    continue
-                file_path = os.path.normpath(f"{self.cache_dir}/{filename}")
-                if not file_path.startswith(self.cache_dir):
-                    raise ValueError("Invalid file path: Path traversal detected.")
-                try:
-                    if os.path.isfile(file_path):
-                        os.unlink(file_path)
-                except Exception as e:
-                    print(f"Error deleting {file_path}: {e}")
\ No newline at end of file
+        if mp_id:
+            return self.cache_index.invalidate(mp_id)
+        return self.cache_index.clear()
+
+    def clear_tag_cache(self,tag_id:str):
+        """标签修改或删除后清除该标签的订阅源缓存"""
+        return self.cache_index.invalidate_tag(tag_id)
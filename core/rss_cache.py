@@ -0,0 +1,227 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from core.config import cfg
+from core.print import print_error, print_info
+# Desc: RSS磁盘缓存索引
+# 记录每个缓存文件对应的公众号、标签，按公众号失效时只删除索引中的相关文件，不再遍历缓存目录
+# 缓存条数和总大小超出上限时按最近使用时间淘汰；文件先写临时文件再重命名，多进程不会读到写了一半的内容
+# 索引保存在缓存目录的index.db(SQLite)中，每次写入只更新一行，多个进程通过SQLite的锁共享同一索引
+
+INDEX_FILE = "index.db"
+# 旧版本的JSON索引
+LEGACY_INDEX_FILE = "index.json"
+# 全部文章、标签、订阅列表等聚合缓存，任一公众号更新时失效
+ALL_KEY = "all"
+# 中断写入遗留的临时文件超过该时间(秒)后删除
+TEMP_MAX_AGE = 3600
+# 访问时间累计到该数量时写入索引
+TOUCH_BATCH = 100
+
+
+def atomic_write(path: str, text: str):
+    """写入临时文件后重命名，保证读取方只看到完整内容"""
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _scope(feed_id: str = None, tag_id: str = None) -> tuple:
+    """缓存文件的失效范围，返回(范围, 是否为聚合缓存)"""
+    if tag_id:
+        return f"tag:{tag_id}", 1
+    if feed_id and feed_id != "all":
+        return f"feed:{feed_id}", 0
+    return ALL_KEY, 1
+
+
+class RssCacheIndex:
+    """RSS缓存目录的索引"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = os.path.normpath(cache_dir)
+        self.index_file = os.path.join(self.cache_dir, INDEX_FILE)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 待写入索引的访问时间 文件名 -> 时间
+        self._touched = {}
+        # 首次扫描持有的锁，扫描完成前其他线程等待，不会读到未登记的文件
+        self._scan_lock = threading.Lock()
+        self._scanned = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(self.index_file, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rss_cache ("
+                         "name TEXT PRIMARY KEY, scope TEXT NOT NULL, aggregate INTEGER NOT NULL, "
+                         "size INTEGER NOT NULL, atime REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rss_cache_scope ON rss_cache (scope)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rss_cache_atime ON rss_cache (atime)")
+            self._local.conn = conn
+        if not self._scanned:
+            with self._scan_lock:
+                if not self._scanned:
+                    self._scan(conn)
+                    self._scanned = True
+        return conn
+
+    def _is_index_file(self, name: str) -> bool:
+        return name.startswith(INDEX_FILE) or name == LEGACY_INDEX_FILE
+
+    def _scan(self, conn: sqlite3.Connection):
+        """进程首次使用时登记索引之外的缓存文件，按修改时间参与淘汰，并删除遗留的临时文件"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        try:
+            os.unlink(os.path.join(self.cache_dir, LEGACY_INDEX_FILE))
+        except FileNotFoundError:
+            pass
+        known = {row[0] for row in conn.execute("SELECT name FROM rss_cache")}
+        now = time.time()
+        rows = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or self._is_index_file(entry.name) or entry.name in known:
+                continue
+            try:
+                stat = entry.stat()
+                if entry.name.startswith(".tmp-"):
+                    if now - stat.st_mtime > TEMP_MAX_AGE:
+                        os.unlink(entry.path)
+                    continue
+            except OSError:
+                continue
+            # 无法确定所属公众号，按聚合缓存处理，任一公众号更新时失效
+            rows.append((entry.name, ALL_KEY, 1, stat.st_size, stat.st_mtime))
+        if rows:
+            conn.executemany("INSERT OR IGNORE INTO rss_cache (name, scope, aggregate, size, atime) "
+                             "VALUES (?, ?, ?, ?, ?)", rows)
+            print_info(f"已登记未建立索引的RSS缓存{len(rows)}个")
+            self._evict(conn)
+
+    def _unlink(self, name: str):
+        try:
+            os.unlink(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print_error(f"删除RSS缓存失败 {name}: {e}")
+
+    def _delete(self, conn: sqlite3.Connection, where: str, params: tuple = ()) -> int:
+        """删除满足条件的索引记录及对应文件"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            names = [row[0] for row in conn.execute(f"SELECT name FROM rss_cache WHERE {where}", params)]
+            conn.execute(f"DELETE FROM rss_cache WHERE {where}", params)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            for name in names:
+                self._touched.pop(name, None)
+        for name in names:
+            self._unlink(name)
+        return len(names)
+
+    def _flush(self, conn: sqlite3.Connection):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.executemany("UPDATE rss_cache SET atime=? WHERE name=?",
+                             [(atime, name) for name, atime in touched.items()])
+
+    def _evict(self, conn: sqlite3.Connection):
+        max_entries = int(cfg.get("cache.rss_max_entries", 1000))
+        max_size = int(cfg.get("cache.rss_max_size", 100)) * 1024 * 1024
+        count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM rss_cache").fetchone()
+        if not ((max_entries > 0 and count > max_entries) or (max_size > 0 and size > max_size)):
+            return
+        self._flush(conn)
+        victims = []
+        for name, item_size in conn.execute("SELECT name, size FROM rss_cache ORDER BY atime"):
+            if not ((max_entries > 0 and count > max_entries) or (max_size > 0 and size > max_size)):
+                break
+            victims.append(name)
+            count -= 1
+            size -= item_size
+        for start in range(0, len(victims), 500):
+            batch = victims[start:start + 500]
+            self._delete(conn, f"name IN ({','.join('?' * len(batch))})", tuple(batch))
+
+    def _name(self, path: str) -> str:
+        return os.path.relpath(os.path.normpath(path), self.cache_dir)
+
+    def read(self, path: str):
+        """读取已建立索引的缓存文件，未建立索引的文件视为不存在"""
+        name = self._name(path)
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM rss_cache WHERE name=?", (name,)).fetchone() is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            conn.execute("DELETE FROM rss_cache WHERE name=?", (name,))
+            return None
+        with self._lock:
+            self._touched[name] = time.time()
+            flush = len(self._touched) >= TOUCH_BATCH
+        if flush:
+            self._flush(conn)
+        return text
+
+    def write(self, path: str, text: str, feed_id: str = None, tag_id: str = None):
+        """原子写入缓存文件并更新索引"""
+        name = self._name(path)
+        conn = self._conn()
+        atomic_write(path, text)
+        scope, aggregate = _scope(feed_id, tag_id)
+        conn.execute("INSERT OR REPLACE INTO rss_cache (name, scope, aggregate, size, atime) VALUES (?, ?, ?, ?, ?)",
+                     (name, scope, aggregate, len(text.encode("utf-8")), time.time()))
+        with self._lock:
+            self._touched.pop(name, None)
+        self._evict(conn)
+
+    def invalidate(self, mp_id: str) -> int:
+        """使公众号及全部文章、标签等聚合缓存失效"""
+        return self._delete(self._conn(), "scope=? OR aggregate=1", (f"feed:{mp_id}",))
+
+    def invalidate_tag(self, tag_id: str) -> int:
+        """标签修改或删除后使该标签的订阅源缓存失效"""
+        return self._delete(self._conn(), "scope=?", (f"tag:{tag_id}",))
+
+    def clear(self) -> int:
+        return self._delete(self._conn(), "1=1")
+
+    def stats(self) -> dict:
+        count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM rss_cache").fetchone()
+        return {"entries": count, "size": size}
+
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_index(cache_dir: str) -> RssCacheIndex:
+    """缓存目录对应的索引，同一目录在进程内共享"""
+    cache_dir = os.path.normpath(cache_dir)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(cache_dir)
+        if index is None:
+            index = _INDEXES[cache_dir] = RssCacheIndex(cache_dir)
+        return index
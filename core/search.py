@@ -0,0 +1,360 @@
+import re
+import html
+from sqlalchemy import event, text, select, inspect, func, literal_column, table, column, union_all
+from core.models.article import Article, ArticleBase, ArticleContent
+from core.content_store import unpack_content
+from core.config import cfg
+from core.print import print_info, print_warning, print_error
+# Desc: 文章全文检索
+# SQLite使用FTS5，中日韩文字在写入和查询时切分为二元词组(bigram)，二字词也能命中索引
+# MySQL使用ngram解析器的FULLTEXT索引：标题和摘要建在文章表上，由数据库自动维护；
+# 正文压缩存储无法直接索引，写入时另存去除标签后的纯文本(article_contents.search_text)并建立索引
+# 二元词组无法匹配单个中日韩文字(如"京"匹配不到"北京")，这类关键字改用标题和摘要的LIKE检索
+
+FTS_TABLE = "articles_fts"
+MYSQL_INDEX = "ft_articles_title_desc"
+MYSQL_CONTENT_INDEX = "ft_article_contents_text"
+# MySQL检索排序时正文命中相对标题、摘要的权重
+MYSQL_CONTENT_WEIGHT = 0.2
+# 中日韩文字
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+# 可检索的词：连续的中日韩文字或字母数字
+TOKEN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+|[0-9a-zA-Z_]+')
+TAG_RE = re.compile(r'<(script|style)[^>]*>.*?</\1>|<[^>]+>', re.S | re.I)
+
+fts_table = table(FTS_TABLE, column("article_id"), column("rank"))
+
+
+def split_keywords(keyword: str) -> list:
+    """拆分检索关键字，与原LIKE检索的分隔规则一致"""
+    return [w for w in keyword.replace("-", " ").replace("|", " ").split(" ") if w.strip()]
+
+
+def ngram_tokens(value: str) -> list:
+    """将文本切分为索引词：中日韩文字切为二元词组，其余按单词切分"""
+    tokens = []
+    for match in TOKEN_RE.finditer((value or "").lower()):
+        word = match.group(0)
+        if CJK_RE.fullmatch(word) and len(word) > 1:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def html_to_text(content: str) -> str:
+    """去除HTML标签，得到用于索引的纯文本"""
+    if not content:
+        return ""
+    return html.unescape(TAG_RE.sub(" ", content))
+
+
+def highlight(value: str, terms: list, tag: str = "em") -> str:
+    """高亮文本中的检索词，原文和检索词都按HTML转义输出"""
+    terms = [t for t in terms or [] if t]
+    if not value or not terms:
+        return html.escape(value or "", quote=False)
+    pattern = re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)), re.I)
+    # 在原文上匹配后分段转义，检索词不会命中转义产生的实体(如&amp;)
+    parts = []
+    last = 0
+    for m in pattern.finditer(value):
+        parts.append(html.escape(value[last:m.start()], quote=False))
+        parts.append(f"<{tag}>{html.escape(m.group(0), quote=False)}</{tag}>")
+        last = m.end()
+    parts.append(html.escape(value[last:], quote=False))
+    return "".join(parts)
+
+
+def snippet(value: str, terms: list, size: int = 80, tag: str = "em") -> str:
+    """截取首个命中位置附近的文本片段并高亮"""
+    value = re.sub(r"\s+", " ", value or "").strip()
+    if not value:
+        return ""
+    lower = value.lower()
+    positions = [lower.find(t.lower()) for t in terms if lower.find(t.lower()) >= 0]
+    start = max(min(positions) - size // 4, 0) if positions else 0
+    part = value[start:start + size]
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if start + size < len(value) else ""
+    return f"{prefix}{highlight(part, terms, tag)}{suffix}"
+
+
+class ArticleSearch:
+    """文章全文检索索引"""
+
+    def __init__(self):
+        # 各数据库连接的索引可用状态缓存
+        self._available = {}
+
+    def enabled(self) -> bool:
+        return bool(cfg.get("search.fts", True))
+
+    def _key(self, bind) -> str:
+        return str(bind.engine.url)
+
+    def is_available(self, bind) -> bool:
+        """索引是否可用，结果按连接缓存"""
+        if not self.enabled():
+            return False
+        key = self._key(bind)
+        if key not in self._available:
+            try:
+                dialect = bind.dialect.name
+                if dialect == "sqlite":
+                    with bind.engine.connect() as conn:
+                        row = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name=:n"), {"n": FTS_TABLE}).first()
+                    self._available[key] = row is not None
+                elif dialect == "mysql":
+                    self._available[key] = all(self._has_mysql_index(bind.engine, t, name) for t, name, _ in self._mysql_indexes())
+                else:
+                    self._available[key] = False
+            except Exception as e:
+                print_warning(f"检查全文索引失败: {e}")
+                self._available[key] = False
+        return self._available[key]
+
+    def _mysql_indexes(self) -> list:
+        """MySQL全文索引 (表名, 索引名, 列)"""
+        return [
+            (Article.__tablename__, MYSQL_INDEX, "title, description"),
+            (ArticleContent.__tablename__, MYSQL_CONTENT_INDEX, "search_text"),
+        ]
+
+    def _has_mysql_index(self, engine, table_name: str, name: str) -> bool:
+        return any(i["name"] == name for i in inspect(engine).get_indexes(table_name))
+
+    def _plain(self, content: str) -> str:
+        """用于索引的正文纯文本，超出长度的部分不索引"""
+        max_length = int(cfg.get("search.content_max_length", 20000))
+        return html_to_text(content or "")[:max_length]
+
+    def _set_search_text(self, conn, rows: list):
+        """写入正文纯文本(MySQL)，rows为(文章ID, 正文HTML)"""
+        if rows:
+            conn.execute(text(f"UPDATE {ArticleContent.__tablename__} SET search_text=:search_text WHERE article_id=:article_id"),
+                         [{"article_id": i, "search_text": self._plain(content)} for i, content in rows])
+
+    def _doc(self, row: dict) -> dict:
+        content = self._plain(row.get("content"))
+        return {
+            "article_id": row.get("id"),
+            "title": " ".join(ngram_tokens(row.get("title"))),
+            "description": " ".join(ngram_tokens(row.get("description"))),
+            "content": " ".join(ngram_tokens(content)),
+        }
+
+    def index_rows(self, conn, rows: list):
+        """写入或更新文章索引，rows为包含id/title/description/content的字典
+
+        SQLite写入FTS5表；MySQL的标题和摘要由数据库维护，只写入正文纯文本
+        """
+        if not rows or not self.is_available(conn):
+            return
+        if conn.dialect.name == "mysql":
+            self._set_search_text(conn, [(row["id"], row["content"]) for row in rows
+                                         if row.get("id") and row.get("content") is not None])
+            return
+        docs = [self._doc(row) for row in rows if row.get("id")]
+        conn.execute(text(f"DELETE FROM {FTS_TABLE} WHERE article_id=:article_id"), [{"article_id": d["article_id"]} for d in docs])
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}(article_id,title,description,content) VALUES(:article_id,:title,:description,:content)"), docs)
+
+    def update_columns(self, conn, article_id: str, values: dict):
+        """只更新发生变化的索引列"""
+        if not values or not self.is_available(conn):
+            return
+        if conn.dialect.name == "mysql":
+            if "content" in values:
+                self._set_search_text(conn, [(article_id, values["content"])])
+            return
+        params = {"article_id": article_id}
+        sets = []
+        for name, value in values.items():
+            if name == "content":
+                value = self._plain(value)
+            params[name] = " ".join(ngram_tokens(value))
+            sets.append(f"{name}=:{name}")
+        conn.execute(text(f"UPDATE {FTS_TABLE} SET {','.join(sets)} WHERE article_id=:article_id"), params)
+
+    def delete_ids(self, conn, ids: list):
+        # MySQL的正文纯文本随article_contents的记录一起删除
+        if not ids or conn.dialect.name != "sqlite" or not self.is_available(conn):
+            return
+        conn.execute(text(f"DELETE FROM {FTS_TABLE} WHERE article_id=:article_id"), [{"article_id": i} for i in ids])
+
+    def ensure_index(self, engine):
+        """创建全文索引，SQLite首次创建时从文章表重建，MySQL补全缺少的正文纯文本"""
+        if not self.enabled():
+            return
+        dialect = engine.dialect.name
+        try:
+            if dialect == "sqlite":
+                with engine.begin() as conn:
+                    conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(article_id UNINDEXED, title, description, content, tokenize='unicode61')"))
+                self._available.pop(self._key(engine), None)
+                with engine.connect() as conn:
+                    indexed = conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+                    total = conn.execute(select(func.count()).select_from(Article.__table__)).scalar()
+                if indexed == 0 and total > 0:
+                    self.rebuild(engine)
+            elif dialect == "mysql":
+                for table_name, name, columns in self._mysql_indexes():
+                    if not self._has_mysql_index(engine, table_name, name):
+                        with engine.begin() as conn:
+                            conn.execute(text(f"ALTER TABLE {table_name} ADD FULLTEXT INDEX {name} ({columns}) WITH PARSER ngram"))
+                        print_info(f"已创建全文索引: {name}")
+                self._available.pop(self._key(engine), None)
+                self.fill_search_text(engine)
+            else:
+                print_warning(f"数据库{dialect}暂不支持全文索引，检索将使用LIKE")
+        except Exception as e:
+            print_error(f"创建全文索引失败: {e}")
+
+    def rebuild(self, engine, batch_size: int = 500):
+        """按批次重建SQLite全文索引"""
+        t = Article.__table__
+        c = ArticleContent.__table__
+        last_id = ""
+        count = 0
+        with engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(t.c.id, t.c.title, t.c.description, c.c.codec, c.c.data)
+                    .select_from(t.outerjoin(c, c.c.article_id == t.c.id))
+                    .where(t.c.id > last_id).order_by(t.c.id).limit(batch_size)
+                ).mappings().all()
+                if not rows:
+                    break
+                self.index_rows(conn, [{
+                    "id": r["id"],
+                    "title": r["title"],
+                    "description": r["description"],
+                    "content": unpack_content(r["codec"], r["data"]),
+                } for r in rows])
+            last_id = rows[-1]["id"]
+            count += len(rows)
+        print_info(f"全文索引重建完成，共{count}篇文章")
+
+    def fill_search_text(self, engine, batch_size: int = 500):
+        """按批次补全MySQL正文纯文本，可中断后重复执行"""
+        c = ArticleContent.__table__
+        last_id = ""
+        count = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(c.c.article_id, c.c.codec, c.c.data)
+                    .where(c.c.article_id > last_id, c.c.search_text.is_(None))
+                    .order_by(c.c.article_id).limit(batch_size)
+                ).all()
+                if not rows:
+                    break
+                self._set_search_text(conn, [(r.article_id, unpack_content(r.codec, r.data)) for r in rows])
+            last_id = rows[-1].article_id
+            count += len(rows)
+        if count:
+            print_info(f"正文全文索引补全完成，共{count}篇文章")
+
+    def match_query(self, keyword: str, dialect: str) -> str:
+        """将检索关键字转换为全文检索语法，多个关键字之间为OR关系"""
+        parts = []
+        for word in split_keywords(keyword):
+            tokens = ngram_tokens(word)
+            if not tokens:
+                continue
+            if dialect == "mysql":
+                parts.append('"' + word.replace('"', " ") + '"')
+                continue
+            phrase = '"' + " ".join(tokens).replace('"', '""') + '"'
+            # 以单个字或字母数字结尾时，末尾按前缀匹配
+            if len(tokens[-1]) == 1 or not CJK_RE.fullmatch(tokens[-1]):
+                phrase += "*"
+            parts.append(phrase)
+        return " OR ".join(parts)
+
+    def needs_like(self, keyword: str) -> bool:
+        """关键字中含有单独的中日韩文字时无法使用二元词组索引"""
+        return any(len(m.group(0)) == 1 for m in CJK_RE.finditer(keyword or ""))
+
+    def rank_subquery(self, session, keyword: str):
+        """返回(article_id, rank)子查询，rank越小越相关；索引不可用或需要LIKE检索时返回None"""
+        bind = session.get_bind()
+        if not self.is_available(bind) or self.needs_like(keyword):
+            return None
+        dialect = bind.dialect.name
+        q = self.match_query(keyword, dialect)
+        if not q:
+            return None
+        if dialect == "sqlite":
+            fts = literal_column(FTS_TABLE)
+            rank = func.bm25(fts, 0.0, 10.0, 5.0, 1.0)
+            return select(fts_table.c.article_id.label("article_id"), rank.label("rank")) \
+                .select_from(fts_table).where(fts.op("MATCH")(q)).subquery()
+        from sqlalchemy.dialects.mysql import match
+        # 标题摘要与正文的索引在不同的表上，分别检索后按文章合并得分
+        score = match(Article.title, Article.description, against=q).in_boolean_mode()
+        content_score = match(ArticleContent.search_text, against=q).in_boolean_mode()
+        hits = union_all(
+            select(Article.id.label("article_id"), score.label("score")).where(score > 0),
+            select(ArticleContent.article_id.label("article_id"), (content_score * MYSQL_CONTENT_WEIGHT).label("score")).where(content_score > 0),
+        ).subquery()
+        return select(hits.c.article_id, (-func.sum(hits.c.score)).label("rank")).group_by(hits.c.article_id).subquery()
+
+    def terms(self, keyword: str) -> list:
+        return split_keywords(keyword)
+
+
+SEARCH = ArticleSearch()
+
+
+# ORM写入时增量维护SQLite索引，正文由ArticleContent的事件单独更新
+@event.listens_for(ArticleBase, "after_insert", propagate=True)
+def _after_insert(mapper, connection, target):
+    try:
+        SEARCH.index_rows(connection, [{
+            "id": target.id,
+            "title": target.title,
+            "description": target.description,
+        }])
+    except Exception as e:
+        print_error(f"更新全文索引失败: {e}")
+
+
+@event.listens_for(ArticleBase, "after_update", propagate=True)
+def _after_update(mapper, connection, target):
+    try:
+        state = inspect(target)
+        values = {}
+        for name in ("title", "description"):
+            if name in state.attrs.keys() and state.attrs[name].history.has_changes():
+                values[name] = getattr(target, name)
+        SEARCH.update_columns(connection, target.id, values)
+    except Exception as e:
+        print_error(f"更新全文索引失败: {e}")
+
+
+@event.listens_for(ArticleBase, "after_delete", propagate=True)
+def _after_delete(mapper, connection, target):
+    try:
+        SEARCH.delete_ids(connection, [target.id])
+    except Exception as e:
+        print_error(f"删除全文索引失败: {e}")
+
+
+@event.listens_for(ArticleContent, "after_insert")
+@event.listens_for(ArticleContent, "after_update")
+def _after_content_write(mapper, connection, target):
+    try:
+        SEARCH.update_columns(connection, target.article_id, {"content": target.text})
+    except Exception as e:
+        print_error(f"更新全文索引失败: {e}")
+
+
+@event.listens_for(ArticleContent, "after_delete")
+def _after_content_delete(mapper, connection, target):
+    try:
+        SEARCH.update_columns(connection, target.article_id, {"content": ""})
+    except Exception as e:
+        print_error(f"更新全文索引失败: {e}")
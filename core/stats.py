@@ -0,0 +1,219 @@
+from datetime import datetime
+from sqlalchemy import event, select, update, delete, insert, func, case, inspect
+from core.models.statistics import Statistics
+from core.models.article import ArticleBase, ArticleContent
+from core.models.feed import Feed
+from core.models.message_task import MessageTask
+from core.models.tags import Tags
+from core.models.base import DATA_STATUS
+from core.print import print_info, print_error
+# Desc: 统计计数
+# 文章(全部及按公众号)、公众号、消息任务、标签的计数保存在statistics表中，
+# 写入、删除和状态变更时在同一事务内增量更新，列表和系统信息直接读取计数，不再COUNT(*)
+# ORM写入由core.db.AtomicFlushSession在flush时开启事务，批量SQL写入需自行在事务内调用article_delta
+# 其余未经过事件的写入(如手工修改数据库)由定时reconcile校正
+# 计数行由reconcile创建，未初始化时不做增量更新，读取方回退为COUNT(*)
+
+ARTICLES = "articles"
+TABLES = {
+    "feeds": Feed,
+    "message_tasks": MessageTask,
+    "tags": Tags,
+}
+
+
+def feed_key(mp_id: str) -> str:
+    return f"{ARTICLES}:{mp_id}"
+
+
+class StatsCounter:
+    """统计计数"""
+
+    def _apply(self, conn, name: str, values: dict, publish_time: int = None) -> int:
+        t = Statistics.__table__
+        params = {k: t.c[k] + v for k, v in values.items() if v}
+        if publish_time is not None:
+            latest = t.c.latest_publish_time
+            params["latest_publish_time"] = case(
+                (latest.is_(None), publish_time),
+                (latest < publish_time, publish_time),
+                else_=latest,
+            )
+        if not params:
+            return 1
+        params["updated_at"] = datetime.now().replace(microsecond=0)
+        return conn.execute(update(t).where(t.c.name == name).values(params)).rowcount
+
+    def article_delta(self, conn, mp_id: str, total: int = 0, active: int = 0, deleted: int = 0,
+                      has_content: int = 0, publish_time: int = None):
+        """更新全部文章及所属公众号的计数"""
+        values = {"total": total, "active": active, "deleted": deleted, "has_content": has_content}
+        # 全局计数不存在说明尚未初始化，等待reconcile
+        if not self._apply(conn, ARTICLES, values, publish_time):
+            return
+        if mp_id is None:
+            return
+        if not self._apply(conn, feed_key(mp_id), values, publish_time):
+            # 初始化之后才出现的公众号从0开始计数
+            row = {k: max(v, 0) for k, v in values.items()}
+            conn.execute(insert(Statistics.__table__).values(
+                name=feed_key(mp_id), latest_publish_time=publish_time,
+                updated_at=datetime.now().replace(microsecond=0), **row))
+
+    def table_delta(self, conn, name: str, total: int):
+        self._apply(conn, name, {"total": total})
+
+    def status_delta(self, status, sign: int = 1) -> dict:
+        return {
+            "active": sign if status == DATA_STATUS.ACTIVE else 0,
+            "deleted": sign if status == DATA_STATUS.DELETED else 0,
+        }
+
+    def get(self, session, name: str):
+        """读取计数行，不存在时返回None"""
+        try:
+            return session.get(Statistics, name, populate_existing=True)
+        except Exception as e:
+            print_error(f"读取统计计数失败: {e}")
+            return None
+
+    def total(self, session, name: str, field: str = "total", query=None):
+        """读取计数值，计数未初始化时使用query.count()"""
+        row = self.get(session, name)
+        if row is not None:
+            return getattr(row, field) or 0
+        return query.count() if query is not None else None
+
+    def articles_total(self, session, mp_id: str = None, status=None):
+        """按公众号和状态读取文章数，无法由计数得出时返回None"""
+        stats = self.get(session, ARTICLES)
+        if stats is None:
+            return None
+        row = self.get(session, feed_key(mp_id)) if mp_id else stats
+        if row is None:
+            return 0
+        if status in (None, ""):
+            # 列表默认排除已删除的文章
+            return (row.total or 0) - (row.deleted or 0)
+        if str(status) == str(DATA_STATUS.ACTIVE):
+            return row.active or 0
+        if str(status) == str(DATA_STATUS.DELETED):
+            return row.deleted or 0
+        return None
+
+    def reconcile(self, db) -> dict:
+        """按实际数据重新计算全部计数，修正增量更新的偏差"""
+        a = ArticleBase.__table__
+        c = ArticleContent.__table__
+        now = datetime.now().replace(microsecond=0)
+        columns = (
+            func.count(a.c.id),
+            func.sum(case((a.c.status == DATA_STATUS.ACTIVE, 1), else_=0)),
+            func.sum(case((a.c.status == DATA_STATUS.DELETED, 1), else_=0)),
+            func.sum(case((c.c.size > 0, 1), else_=0)),
+            func.max(a.c.publish_time),
+        )
+        source = a.outerjoin(c, c.c.article_id == a.c.id)
+
+        def row(name, values):
+            total, active, deleted, has_content, latest = values
+            return {"name": name, "total": total or 0, "active": active or 0, "deleted": deleted or 0,
+                    "has_content": has_content or 0, "latest_publish_time": latest, "updated_at": now}
+
+        try:
+            with db.write_lock(), db.transaction() as conn:
+                with conn.begin():
+                    rows = [row(ARTICLES, conn.execute(select(*columns).select_from(source)).one())]
+                    for mp_id, *values in conn.execute(select(a.c.mp_id, *columns).select_from(source).group_by(a.c.mp_id)):
+                        if mp_id is not None:
+                            rows.append(row(feed_key(mp_id), values))
+                    for name, model in TABLES.items():
+                        total = conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+                        rows.append(row(name, (total, 0, 0, 0, None)))
+                    conn.execute(delete(Statistics.__table__))
+                    conn.execute(insert(Statistics.__table__), rows)
+        except Exception as e:
+            print_error(f"校正统计计数失败: {e}")
+            return {}
+        print_info(f"统计计数已校正: 文章{rows[0]['total']}篇")
+        return rows[0]
+
+
+STATS = StatsCounter()
+
+
+def _committed(target, name):
+    """字段在本次flush之前的值"""
+    history = inspect(target).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, name)
+
+
+def _article_mp_id(connection, article_id):
+    a = ArticleBase.__table__
+    return connection.execute(select(a.c.mp_id).where(a.c.id == article_id)).scalar()
+
+
+# ORM写入时在同一事务内更新计数，出错时不捕获，行变更随事务一起回滚
+@event.listens_for(ArticleBase, "after_insert", propagate=True)
+def _article_insert(mapper, connection, target):
+    STATS.article_delta(connection, target.mp_id, total=1,
+                        publish_time=target.publish_time, **STATS.status_delta(target.status))
+
+
+@event.listens_for(ArticleBase, "after_update", propagate=True)
+def _article_update(mapper, connection, target):
+    history = inspect(target).attrs["status"].history
+    if not history.has_changes() or not history.deleted:
+        return
+    old, new = history.deleted[0], target.status
+    if old == new:
+        return
+    values = STATS.status_delta(old, -1)
+    for k, v in STATS.status_delta(new).items():
+        values[k] += v
+    STATS.article_delta(connection, target.mp_id, **values)
+
+
+@event.listens_for(ArticleBase, "after_delete", propagate=True)
+def _article_delete(mapper, connection, target):
+    STATS.article_delta(connection, _committed(target, "mp_id"), total=-1,
+                        **STATS.status_delta(_committed(target, "status"), -1))
+
+
+def _content_delta(connection, target, delta):
+    STATS.article_delta(connection, _article_mp_id(connection, target.article_id), has_content=delta)
+
+
+@event.listens_for(ArticleContent, "after_insert")
+def _content_insert(mapper, connection, target):
+    if target.size:
+        _content_delta(connection, target, 1)
+
+
+@event.listens_for(ArticleContent, "after_update")
+def _content_update(mapper, connection, target):
+    old, new = bool(_committed(target, "size")), bool(target.size)
+    if old != new:
+        _content_delta(connection, target, 1 if new else -1)
+
+
+@event.listens_for(ArticleContent, "after_delete")
+def _content_delete(mapper, connection, target):
+    if _committed(target, "size"):
+        _content_delta(connection, target, -1)
+
+
+def _listen_table(name, model):
+    @event.listens_for(model, "after_insert")
+    def _insert(mapper, connection, target):
+        STATS.table_delta(connection, name, 1)
+
+    @event.listens_for(model, "after_delete")
+    def _delete(mapper, connection, target):
+        STATS.table_delta(connection, name, -1)
+
+
+for _name, _model in TABLES.items():
+    _listen_table(_name, _model)
@@ -7,6 +7,7 @@ from core.models.feed import Feed
 from .cfg import cfg,wx_cfg
 from core.print import print_error,print_info
 from core.rss import RSS
+from core.feed_warmer import FEED_WARMER
 from driver.success import setStatus
 import random
 # 定义一些常见的 User-Agent
@@ -63,6 +64,11 @@ class WxGather:
         return wx
     def __init__(self,is_add:bool=False):
         self.articles=[]
+        # 待批量写入的文章缓冲区
+        self._pending=[]
+        self._callback=None
+        self._batch_callback=None
+        self.batch_size=int(cfg.get("gather.batch_size",50))
         self.is_add=is_add
         self._cookies={}
         session=  requests.Session()
@@ -71,8 +77,9 @@ class WxGather:
         self.session=session
         self.get_token()
     def get_token(self):
-        cfg.reload()
-        wx_cfg.reload()
+        # 配置文件被修改时才重新读取
+        cfg.refresh()
+        wx_cfg.refresh()
         self.Gather_Content=cfg.get('gather.content',False)
         self.cookies = wx_cfg.get('cookie', '')
         self.token=wx_cfg.get('token','')
@@ -129,12 +136,39 @@ class WxGather:
                 }
                 if 'digest' in data:
                     art['description']=data['digest']
+                # 指定了批量写入回调时先缓冲，按批次提交
+                if self._batch_callback is not None:
+                    art["ext"]=Ext_Data
+                    self._callback=CallBack
+                    self._pending.append(art)
+                    if len(self._pending)>=self.batch_size:
+                        self.FlushBack()
+                    return
                 if CallBack(art):
                     art["ext"]=Ext_Data
                     # art.pop("content")
                     self.articles.append(art)
 
 
+    def FlushBack(self):
+        """将缓冲区中的文章批量写入，新增的文章加入采集结果"""
+        pending=getattr(self,"_pending",None)
+        if not pending or self._batch_callback is None:
+            return
+        self._pending=[]
+        try:
+            self.articles.extend(self._batch_callback(pending))
+        except Exception as e:
+            print_error(f"批量写入文章失败，改为逐篇写入: {e}")
+            for art in pending:
+                ext=art.pop("ext",None)
+                try:
+                    if self._callback(art):
+                        art["ext"]=ext
+                        self.articles.append(art)
+                except Exception as e:
+                    print_error(f"写入文章失败 {art.get('id')}: {e}")
+
     #通过公众号码平台接口查询公众号
     def search_Biz(self,kw:str="",limit=10,offset=0):
 
@@ -179,8 +213,17 @@ class WxGather:
     
     
     
-    def Start(self,mp_id=None):
+    def Start(self,mp_id=None,BatchCallBack=None):
+        """开始采集
+
+        Args:
+            mp_id: 公众号ID
+            BatchCallBack: 批量写入回调，接收文章列表并返回新增的文章，为空时逐篇调用CallBack
+        """
+        # 上一次采集中断时遗留的缓冲先写入，不直接丢弃
+        self.FlushBack()
         self.articles=[]
+        self._batch_callback=BatchCallBack
         self.get_token()
         if self.token=="" or self.token is None:
              self.Error("请先扫码登录公众号平台")
@@ -193,6 +236,8 @@ class WxGather:
 
     def Item_Over(self,item=None,CallBack=None):
         print(f"item end")
+        # 每页结束时提交缓冲的文章
+        self.FlushBack()
         _cookies=[{'name': c.name, 'value': c.value, 'domain': c.domain,'expiry':c.expires,'expires':c.expires} for c in self._cookies]
         _cookies.append({'name':'token','value':self.token})
         if len(_cookies) > 0:   
@@ -215,6 +260,7 @@ class WxGather:
         # raise Exception(error)
 
     def Over(self,CallBack=None):
+        self.FlushBack()
         if getattr(self, 'articles', None) is not None:
             print(f"成功{len(self.articles)}条")
             rss=RSS()
@@ -224,6 +270,8 @@ class WxGather:
             except:
                 pass
             rss.clear_cache(mp_id=mp_id)  
+            # 采集完成后在后台预热该公众号的常用订阅源
+            FEED_WARMER.schedule([mp_id] if mp_id else None)
         if CallBack is not None:
             CallBack(self.articles)
 
@@ -40,8 +40,8 @@ class MpsApi(WxGather):
                 logger.error(e)
         return ""
     # 重写 get_Articles 方法
-    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page=0,MaxPage:int=1,interval=10,Gather_Content=True,Item_Over_CallBack=None,Over_CallBack=None):
-        super().Start(mp_id=Mps_id)
+    def get_Articles(self, faker_id:str=None,Mps_id:str=None,Mps_title="",CallBack=None,start_page=0,MaxPage:int=1,interval=10,Gather_Content=True,Item_Over_CallBack=None,Over_CallBack=None,BatchCallBack=None):
+        super().Start(mp_id=Mps_id,BatchCallBack=BatchCallBack)
         if self.Gather_Content:
              Gather_Content=True
         print(f"API获取模式,是否采集[{Mps_title}]内容：{Gather_Content}\n")
@@ -57,6 +57,20 @@ class DatabaseSynchronizer:
                 column.type = Text()
                 self.logger.debug(f"已将列 {column.name} 的类型从 MEDIUMTEXT 映射为 Text")
     
+    def _sync_indexes(self, model, inspector):
+        """创建模型中定义但数据库中缺失的索引"""
+        table_name = model.__tablename__
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table_name)}
+        for index in model.__table__.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(self.engine)
+                existing_indexes.add(index.name)
+                self.logger.info(f"新增索引: {table_name}.{index.name}")
+            except SQLAlchemyError as e:
+                self.logger.warning(f"创建索引失败 {table_name}.{index.name}: {e}")
+    
     def sync(self):
         """同步模型到数据库"""
         try:
@@ -108,6 +122,7 @@ class DatabaseSynchronizer:
                                 conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {col_name} {model_col.type}"))
                             self.logger.info(f"新增字段: {table_name}.{col_name}")
                     
+                    self._sync_indexes(model, inspector)
                     self.logger.info(f"表已同步: {table_name}")
             
             self.logger.info("模型同步完成")
@@ -30,6 +30,15 @@ def sync_models():
          time.sleep(3)
          synchronizer = DatabaseSynchronizer(db_url=cfg.get("db",""))
          synchronizer.sync()
+         # 迁移旧版本保存在文章表中的正文
+         from core.content_store import migrate_legacy_content
+         migrate_legacy_content(DB)
+         # 创建全文检索索引
+         from core.search import SEARCH
+         SEARCH.ensure_index(DB.engine)
+         # 初始化统计计数
+         from core.stats import STATS
+         STATS.reconcile(DB)
          print_info("模型同步完成")
 
      
@@ -15,6 +15,10 @@ def UpdateArticle(art:dict):
         mps_count=mps_count+1
         return True
     return False
+def UpdateArticles(arts:list[dict])->list[dict]:
+    """批量写入文章，返回新增的文章数据"""
+    result=DB.add_articles(arts)
+    return result["articles"]
 def Update_Over(data=None):
     print("更新完成")
     pass
\ No newline at end of file
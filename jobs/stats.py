@@ -0,0 +1,22 @@
+from core.task import TaskScheduler
+from core.config import cfg
+from core.print import print_success,print_warning
+from core.stats import STATS
+import core.db as db
+DB=db.Db(tag="统计校正")
+scheduler=TaskScheduler()
+def reconcile_stats():
+    """按实际数据校正统计计数"""
+    return STATS.reconcile(DB)
+def start_reconcile_stats():
+    interval=int(cfg.get("stats.reconcile_interval",60)) # 每隔多少分钟
+    if interval<=0:
+        print_warning("统计计数定时校正未启用")
+        return
+    cron_exp=f"*/{interval} * * * *" if interval<60 else f"0 */{interval//60} * * *"
+    scheduler.clear_all_jobs()
+    job_id=scheduler.add_cron_job(reconcile_stats,cron_expr=cron_exp,job_id="reconcile_stats",tag="统计校正")
+    print_success(f"已添加统计计数校正任务: {job_id}")
+    scheduler.start()
+if __name__ == "__main__":
+    reconcile_stats()
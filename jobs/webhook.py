@@ -178,26 +178,28 @@ def web_hook(hook:MessageWebHook):
             # raise ValueError("没有更新到文章")
             logger.warning("没有更新到文章")
             return 
+        # 正文单独存储，不在文章表的列中
+        fields = [field.name for field in Article.__table__.columns] + ["content"]
         for article in hook.articles:
             if isinstance(article, dict):
                 # 如果是字典类型，直接使用
                 processed_article = {
-                    field.name: (
-                        datetime.fromtimestamp(article[field.name]).strftime("%Y-%m-%d %H:%M:%S")
-                        if field.name == "publish_time" and field.name in article
-                        else article.get(field.name, "")
+                    field: (
+                        datetime.fromtimestamp(article[field]).strftime("%Y-%m-%d %H:%M:%S")
+                        if field == "publish_time" and field in article
+                        else article.get(field, "")
                     )
-                    for field in Article.__table__.columns
+                    for field in fields
                 }
             else:
                 # 如果是Article对象，使用getattr获取属性
                 processed_article = {
-                    field.name: (
-                        datetime.fromtimestamp(getattr(article, field.name)).strftime("%Y-%m-%d %H:%M:%S")
-                        if field.name == "publish_time"
-                        else getattr(article, field.name)
+                    field: (
+                        datetime.fromtimestamp(getattr(article, field)).strftime("%Y-%m-%d %H:%M:%S")
+                        if field == "publish_time"
+                        else getattr(article, field)
                     )
-                    for field in Article.__table__.columns
+                    for field in fields
                 }
             processed_articles.append(processed_article)
         
@@ -0,0 +1,58 @@
+import os
+import sys
+import shutil
+import tempfile
+import pytest
+# Desc: 测试环境
+# 测试在临时目录中运行，使用config.example.yaml的默认配置和独立的SQLite数据库，不影响本地数据
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WORK_DIR = tempfile.mkdtemp(prefix="werss-test-")
+shutil.copy(os.path.join(ROOT, "config.example.yaml"), os.path.join(WORK_DIR, "config.yaml"))
+# 模型同步和静态资源按工作目录下的相对路径查找
+for name in ("core", "static"):
+    os.symlink(os.path.join(ROOT, name), os.path.join(WORK_DIR, name))
+os.chdir(WORK_DIR)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def db():
+    """初始化表结构的数据库"""
+    import init_sys
+    from core.db import DB
+    init_sys.sync_models()
+    return DB
+
+
+@pytest.fixture(scope="session")
+def client(db):
+    from fastapi.testclient import TestClient
+    import web
+    return TestClient(web.app)
+
+
+@pytest.fixture(scope="session")
+def feed(db):
+    """测试用公众号"""
+    from datetime import datetime
+    from core.models import Feed
+    session = db.get_session()
+    session.add(Feed(id="MP_WXS_TEST", mp_name="测试号", mp_cover="c", mp_intro="i", status=1,
+                     faker_id="MQ==", created_at=datetime.now(), updated_at=datetime.now()))
+    session.commit()
+    return "MP_WXS_TEST"
+
+
+@pytest.fixture(scope="session")
+def auth_headers(db):
+    import init_sys
+    from core.auth import create_access_token
+    init_sys.init_user(db)
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
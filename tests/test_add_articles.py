@@ -0,0 +1,90 @@
+from sqlalchemy import insert
+from core.models.article import Article
+from core.stats import STATS, feed_key
+from core.wx.base import WxGather
+
+MP = "MP_WXS_BATCH"
+
+
+def _art(i, mp=MP):
+    return {"id": f"b{i}", "mp_id": mp, "title": f"批量{i}", "url": "u", "pic_url": "",
+            "content": f"<p>{i}</p>", "publish_time": 1730000000 + i, "description": "d"}
+
+
+def _total(db, mp):
+    row = STATS.get(db.get_session(), feed_key(mp))
+    return (row.total or 0) if row is not None else 0
+
+
+def test_counts_only_rows_actually_inserted(db, monkeypatch):
+    mp = "MP_WXS_RACE"
+    insert_new = db._insert_new
+
+    def racing(conn, table, new_rows):
+        # 预查之后另一个写入方抢先写入了第一篇
+        row, _ = new_rows[0]
+        conn.execute(insert(table), {**row})
+        return insert_new(conn, table, new_rows)
+    monkeypatch.setattr(db, "_insert_new", racing)
+    before = _total(db, mp)
+    result = db.add_articles([_art(i, mp) for i in range(3)])
+    assert result["inserted"] == 2
+    assert result["skipped"] == 1
+    assert [a["id"] for a in result["articles"]] == ["b1", "b2"]
+    assert _total(db, mp) - before == 2
+
+
+def test_failed_batch_falls_back_to_single_inserts(db, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(db, "_insert_new", broken)
+    result = db.add_articles([_art(i) for i in range(10, 13)] + [{**_art(10), "ext": {"mp_id": MP}}])
+    assert result["inserted"] == 3
+    assert result["skipped"] == 1
+    ids = {a.id for a in db.get_session().query(Article).filter(Article.mp_id == MP)}
+    assert {"BATCH-b10", "BATCH-b11", "BATCH-b12"} <= ids
+
+
+def _gather(batch):
+    wx = WxGather.__new__(WxGather)
+    wx.articles = []
+    wx._pending = []
+    wx._callback = None
+    wx._batch_callback = batch
+    wx.batch_size = 2
+    return wx
+
+
+def _item(i):
+    return {"id": i, "mp_id": MP, "title": "t", "link": "l", "cover": "", "update_time": 1}
+
+
+def test_flush_back_batches_and_falls_back():
+    batches = []
+    wx = _gather(lambda arts: batches.append(len(arts)) or arts)
+    for i in range(3):
+        wx.FillBack(CallBack=lambda art: True, data=_item(i), Ext_Data={"mp_id": MP})
+    assert batches == [2]
+    wx.FlushBack()
+    assert batches == [2, 1]
+    assert len(wx.articles) == 3
+
+    def broken(arts):
+        raise RuntimeError("boom")
+    written = []
+    wx = _gather(broken)
+    wx.FillBack(CallBack=lambda art: written.append(dict(art)) or True, data=_item(9), Ext_Data={"mp_id": MP})
+    wx.FlushBack()
+    # 逐篇写入时不带ext字段，加入采集结果时恢复
+    assert "ext" not in written[0]
+    assert wx.articles[0]["ext"] == {"mp_id": MP}
+
+
+def test_single_add_prefetches_only_new_rows(db, monkeypatch):
+    import core.db
+    submitted = []
+    monkeypatch.setattr(core.db.IMAGE_PREFETCH, "submit", lambda arts: submitted.append(arts))
+    art = _art(30, "MP_WXS_SINGLE")
+    assert db.add_article(dict(art))
+    assert not db.add_article(dict(art))
+    assert len(submitted) == 1
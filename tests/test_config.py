@@ -0,0 +1,52 @@
+import os
+import pytest
+import core.config
+from core.config import Config
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    # 每次读取都检查文件是否变化
+    monkeypatch.setattr(core.config, "MTIME_CHECK_INTERVAL", -1)
+    path = tmp_path / "config.yaml"
+
+    def write(text):
+        path.write_text(text, encoding="utf-8")
+        # 保证修改时间变化
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    write("rss:\n  title: A\n  page_size: '10'\n  full: 'true'\n")
+    return path, write
+
+
+def test_snapshot_flattens_and_coerces(config_file, monkeypatch):
+    path, write = config_file
+    monkeypatch.setenv("TEST_CFG_TITLE", "环境变量")
+    write("rss:\n  title: ${TEST_CFG_TITLE:-默认}\n  size: ${TEST_CFG_MISSING:-20}\n  cdata: 'False'\n  empty: ''\n")
+    config = Config(str(path))
+    assert config.get("rss.title") == "环境变量"
+    assert config.get("rss.size") == 20
+    assert config.get("rss.cdata") is False
+    assert config.get("rss.empty") == ""
+    assert config.get("rss.missing", "d") == "d"
+    assert config.get("rss")["title"] == "环境变量"
+
+
+def test_snapshot_refreshes_when_file_changes(config_file):
+    path, write = config_file
+    config = Config(str(path))
+    changes = []
+    config.on_change(lambda c, keys: changes.append(keys))
+    assert config.get("rss.title") == "A"
+    assert config.refresh() is False
+    write("rss:\n  title: B\n  page_size: '10'\n  full: 'true'\n")
+    assert config.get("rss.title") == "B"
+    assert changes == [{"rss.title"}]
+
+
+def test_failed_reload_keeps_last_good_config(config_file):
+    path, write = config_file
+    config = Config(str(path))
+    write("rss: [unclosed\n")
+    assert config.get("rss.title") == "A"
+    assert config.get("rss.page_size") == 10
@@ -0,0 +1,18 @@
+from core.content_cache import CONTENT_CACHE
+from core.models.article import Article
+
+
+def test_content_change_drops_cache_after_commit(db):
+    session = db.get_session()
+    article = Article(id="content-1", mp_id="MP_WXS_CONTENT", title="t", url="u", publish_time=1730000000, status=1)
+    article.content = "<p>旧</p>"
+    session.add(article)
+    session.commit()
+    CONTENT_CACHE.put("content-1", {"content": "<p>旧</p>"}, "h1")
+    article.content = "<p>新</p>"
+    session.flush()
+    # 提交前缓存保持不变
+    assert CONTENT_CACHE.has("content-1", "h1")
+    session.commit()
+    assert not CONTENT_CACHE.has("content-1", "h1")
+    assert CONTENT_CACHE.get("content-1") is None
@@ -0,0 +1,72 @@
+import re
+from types import SimpleNamespace
+import pytest
+from apis.base import encode_cursor, decode_cursor, next_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(1700000000, "3-abc")
+    assert re.fullmatch(r"[A-Za-z0-9_-]+", cursor)
+    assert decode_cursor(cursor) == (1700000000, "3-abc")
+
+
+def test_cursor_round_trip_non_ascii_id():
+    assert decode_cursor(encode_cursor(1, "文章-1")) == (1, "文章-1")
+
+
+@pytest.mark.parametrize("cursor", ["", "!!!", encode_cursor(None, "1").replace("null", "x"), "W251bGwsICIxIl0"])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def _rows(*keys):
+    return [SimpleNamespace(publish_time=t, id=i) for t, i in keys]
+
+
+def test_next_cursor_last_row():
+    rows = _rows((3, "c"), (2, "b"))
+    assert decode_cursor(next_cursor(rows, 2)) == (2, "b")
+
+
+def test_next_cursor_short_page():
+    assert next_cursor(_rows((3, "c")), 2) is None
+    assert next_cursor([], 2) is None
+
+
+def test_next_cursor_null_publish_time():
+    assert next_cursor(_rows((3, "c"), (None, "b")), 2) is None
+
+
+def _ids(client, url):
+    r = client.get(url)
+    assert r.status_code == 200
+    return [item["id"] for item in r.json()["items"]], r.headers.get("link")
+
+
+def test_search_feed_pages_with_cjk_keyword(client, db, feed):
+    db.add_articles([{"id": f"bj{i}", "mp_id": feed, "title": f"北京新闻{i}", "url": "u", "pic_url": "",
+                      "content": "<p>正文</p>", "publish_time": 1710000000 + i, "description": "d"}
+                     for i in range(5)])
+    ids, link = _ids(client, "/feed/search/北京/all.json?limit=2")
+    assert len(ids) == 2
+    pages = [ids]
+    while link:
+        url = re.match(r"<([^>]+)>", link).group(1)
+        assert url.isascii() and "%E5%8C%97%E4%BA%AC" in url
+        ids, link = _ids(client, url)
+        pages.append(ids)
+    seen = [i for page in pages for i in page]
+    assert len(seen) == len(set(seen)) == 5
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_ranked_search_has_no_cursor(client, db, feed, auth_headers):
+    db.add_articles([{"id": f"sh{i}", "mp_id": feed, "title": f"上海{'上海' * i}", "url": "u", "pic_url": "",
+                      "content": "", "publish_time": 1720000000 + i, "description": "d"} for i in range(3)])
+    r = client.get("/api/v1/wx/articles?limit=2&search=上海", headers=auth_headers)
+    data = r.json()["data"]
+    assert len(data["list"]) == 2
+    assert data["next_cursor"] is None
+    r = client.get("/api/v1/wx/articles?limit=2&offset=2&search=上海", headers=auth_headers)
+    assert len(r.json()["data"]["list"]) == 1
@@ -0,0 +1,140 @@
+import gzip
+import time
+import threading
+import pytest
+from email.utils import formatdate
+from core.feed_cache import FeedCache, conditional_response, is_not_modified
+
+
+class _Request:
+    def __init__(self, **headers):
+        self.headers = {k.replace("_", "-"): v for k, v in headers.items()}
+
+
+def _entry(body="<rss>" + "x" * 2000 + "</rss>"):
+    return FeedCache().set("k", body, "application/xml", {"X-Feed": "1"})
+
+
+def test_etag_revalidation():
+    entry = _entry()
+    assert not is_not_modified(_Request(), entry)
+    assert is_not_modified(_Request(if_none_match=entry.etag), entry)
+    assert is_not_modified(_Request(if_none_match=f'"other", W/{entry.etag}'), entry)
+    assert is_not_modified(_Request(if_none_match="*"), entry)
+    assert not is_not_modified(_Request(if_none_match='"other"'), entry)
+    # If-None-Match优先于If-Modified-Since
+    since = formatdate(entry.last_modified + 60, usegmt=True)
+    assert not is_not_modified(_Request(if_none_match='"other"', if_modified_since=since), entry)
+    assert is_not_modified(_Request(if_modified_since=since), entry)
+    assert not is_not_modified(_Request(if_modified_since=formatdate(entry.last_modified - 60, usegmt=True)), entry)
+    assert not is_not_modified(_Request(if_modified_since="garbage"), entry)
+
+
+def test_conditional_response_per_encoding():
+    entry = _entry()
+    full = conditional_response(_Request(accept_encoding="gzip"), entry)
+    assert full.status_code == 200
+    assert full.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(full.body) == entry.body
+    assert full.headers["etag"] != entry.etag
+    assert full.headers["x-feed"] == "1"
+    not_modified = conditional_response(_Request(accept_encoding="gzip", if_none_match=full.headers["etag"]), entry)
+    assert not_modified.status_code == 304
+    assert not_modified.body == b""
+    plain = conditional_response(_Request(), entry)
+    assert plain.body == entry.body and plain.headers["etag"] == entry.etag
+
+
+def test_unchanged_content_keeps_last_modified():
+    cache = FeedCache()
+    first = cache.set("k", "body", "application/xml")
+    first.last_modified -= 100
+    assert cache.set("k", "body", "application/xml").last_modified == first.last_modified
+    assert cache.set("k", "changed", "application/xml").last_modified > first.last_modified
+
+
+def test_invalidate_by_feed():
+    cache = FeedCache()
+    cache.set("a", "a", "text/plain", feeds={"A"})
+    cache.set("b", "b", "text/plain", feeds={"B"})
+    cache.set("all", "all", "text/plain")
+    cache.invalidate("A")
+    assert cache.get("a") is None and cache.get("all") is None
+    assert cache.get("b") is not None
+
+
+def test_concurrent_builds_share_one_flight():
+    cache = FeedCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "body", "text/plain", {}, {"A"}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.fetch("k", build))) for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert len(calls) == 1
+    assert len(results) == 5 and len({id(r) for r in results}) == 1
+
+
+def test_failed_build_is_raised_to_waiters():
+    cache = FeedCache()
+
+    def build():
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        cache.fetch("k", build)
+    # 失败不会留下进行中的生成
+    assert cache.fetch("k", lambda: ("ok", "text/plain", {}, None)).body == b"ok"
+
+
+def test_stale_entry_is_served_while_refreshing(monkeypatch):
+    cache = FeedCache()
+    entry = cache.set("k", "old", "text/plain")
+    # 已过期但仍在容忍期内
+    monkeypatch.setattr(entry, "age", lambda: 700)
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return "new", "text/plain", {}, None
+    assert cache.fetch("k", build=None, refresh=refresh).body == b"old"
+    assert refreshed.wait(5)
+    for _ in range(50):
+        if cache.get("k") is not None and cache.get("k").body == b"new":
+            break
+        time.sleep(0.05)
+    assert cache.get("k").body == b"new"
+
+
+def test_build_overlapping_invalidation_is_not_cached():
+    cache = FeedCache()
+
+    def build():
+        cache.invalidate("A")
+        return "body", "text/plain", {}, {"A"}
+    assert cache.fetch("k", build).body == b"body"
+    assert cache.get("k") is None
+
+
+def test_article_write_invalidates_after_commit(db):
+    from core.feed_cache import FEED_CACHE
+    from core.models.article import Article
+    FEED_CACHE.set("after-commit", "body", "text/plain", feeds={"MP_WXS_COMMIT"})
+    session = db.get_session()
+    session.add(Article(id="commit-1", mp_id="MP_WXS_COMMIT", title="t", url="u", publish_time=1730000000, status=1))
+    session.flush()
+    # 提交前并发请求仍使用原缓存，不会按未提交的数据重新生成
+    assert FEED_CACHE.get("after-commit") is not None
+    session.commit()
+    assert FEED_CACHE.get("after-commit") is None
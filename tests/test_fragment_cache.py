@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+from core.fragment_cache import FragmentCache
+
+ITEM = {"id": "1", "title": "标题", "content": "<p>正文</p>"}
+
+
+def test_key_depends_on_option_order():
+    cache = FragmentCache()
+    assert cache.key("rss", ("rss", True, False), ITEM) != cache.key("rss", ("rss", False, True), ITEM)
+    assert cache.key("rss", ("rss", True, False), ITEM) == cache.key("rss", ("rss", True, False), dict(ITEM))
+
+
+def test_key_is_stable_across_processes():
+    # 字符串的hash()受PYTHONHASHSEED影响，各进程不同
+    code = ("from core.fragment_cache import FragmentCache;"
+            f"print(FragmentCache().key('rss', ('rss', 'html', True), {ITEM!r}))")
+    keys = {subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                           env={**os.environ, "PYTHONHASHSEED": seed}).stdout.strip().splitlines()[-1] for seed in ("1", "2")}
+    assert len(keys) == 1
+    assert keys == {FragmentCache().key("rss", ("rss", "html", True), ITEM)}
@@ -0,0 +1,104 @@
+import os
+import asyncio
+import httpx
+import pytest
+import apis.res
+from core.image_cache import IMAGES
+
+IMG = os.urandom(20000)
+URL = "/static/res/logo/http://mmbiz.qpic.cn/proxy-test/0"
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    state = {"calls": 0}
+
+    def handler(request):
+        state["calls"] += 1
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"content-type": "image/png", "etag": '"v1"'}, content=IMG)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(apis.res, "get_http_client", lambda: client)
+    return state
+
+
+@pytest.fixture
+def cache_threads(monkeypatch):
+    """记录图片缓存方法是否在事件循环中执行"""
+    threads = []
+    for name in ("get", "hit", "commit", "revalidated", "temp_path"):
+        method = getattr(IMAGES, name)
+
+        def wrapper(*args, _method=method, _name=name, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                threads.append((_name, True))
+            except RuntimeError:
+                threads.append((_name, False))
+            return _method(*args, **kwargs)
+        monkeypatch.setattr(IMAGES, name, wrapper)
+    return threads
+
+
+def test_cache_io_runs_off_the_event_loop(client, upstream, cache_threads):
+    r = client.get(URL)
+    assert r.status_code == 200 and r.content == IMG
+    assert client.get(URL).content == IMG
+    IMAGES._conn().execute("UPDATE images SET expires_at=0 WHERE url=?", ("http://mmbiz.qpic.cn/proxy-test/0",))
+    assert client.get(URL).content == IMG
+    assert upstream["calls"] == 2
+    names = {name for name, _ in cache_threads}
+    assert {"get", "hit", "commit", "revalidated", "temp_path"} <= names
+    assert [name for name, in_loop in cache_threads if in_loop] == []
+
+
+def _request(receive):
+    from starlette.requests import Request
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": []}, receive)
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def test_unread_stream_releases_flight(upstream):
+    path = "http://mmbiz.qpic.cn/proxy-unread/0"
+    closed = []
+
+    async def run():
+        response = await apis.res.reverse_proxy(_request(_receive), path)
+        assert apis.res._inflight
+        real_aclose = apis.res._close_quietly
+
+        async def spy(resp):
+            closed.append(resp)
+            await real_aclose(resp)
+        apis.res._close_quietly = spy
+        try:
+            # 客户端在读取正文前断开：StreamingResponse只执行background
+            await response.background()
+        finally:
+            apis.res._close_quietly = real_aclose
+    asyncio.run(run())
+    assert not apis.res._inflight
+    assert closed and closed[0].is_closed
+
+
+def test_failed_request_body_releases_flight(upstream):
+    async def broken():
+        raise RuntimeError("disconnected")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await apis.res.reverse_proxy(_request(broken), "http://mmbiz.qpic.cn/proxy-broken/0")
+    asyncio.run(run())
+    assert not apis.res._inflight
+
+
+def test_transform_worker_imports_only_pillow():
+    import subprocess
+    import sys
+    code = "import sys, core.image_transform; print(sorted(m for m in sys.modules if m.startswith('core')))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "['core', 'core.image_transform']"
@@ -0,0 +1,87 @@
+import os
+import time
+from core.config import cfg
+from core.rss_cache import RssCacheIndex, LEGACY_INDEX_FILE
+
+
+def _write(index, tmp_path, name, **kw):
+    index.write(str(tmp_path / name), name, **kw)
+
+
+def test_invalidate_feed_keeps_other_feeds(tmp_path):
+    index = RssCacheIndex(str(tmp_path))
+    _write(index, tmp_path, "a.rss", feed_id="a")
+    _write(index, tmp_path, "b.rss", feed_id="b")
+    _write(index, tmp_path, "all.rss")
+    _write(index, tmp_path, "t.rss", tag_id="t")
+    assert index.read(str(tmp_path / "a.rss")) == "a.rss"
+    assert index.invalidate("a") == 3
+    assert sorted(p.name for p in tmp_path.glob("*.rss")) == ["b.rss"]
+    assert index.read(str(tmp_path / "a.rss")) is None
+
+
+def test_invalidate_tag(tmp_path):
+    index = RssCacheIndex(str(tmp_path))
+    _write(index, tmp_path, "t1.rss", tag_id="t1")
+    _write(index, tmp_path, "t2.rss", tag_id="t2")
+    assert index.invalidate_tag("t1") == 1
+    assert not (tmp_path / "t1.rss").exists()
+    assert index.read(str(tmp_path / "t2.rss")) == "t2.rss"
+
+
+def test_evicts_least_recently_used(tmp_path, monkeypatch):
+    real_get = cfg.get
+    monkeypatch.setattr(cfg, "get", lambda key, default=None: 2 if key == "cache.rss_max_entries" else real_get(key, default))
+    index = RssCacheIndex(str(tmp_path))
+    _write(index, tmp_path, "1.rss", feed_id="1")
+    _write(index, tmp_path, "2.rss", feed_id="2")
+    index.read(str(tmp_path / "1.rss"))
+    _write(index, tmp_path, "3.rss", feed_id="3")
+    assert sorted(p.name for p in tmp_path.glob("*.rss")) == ["1.rss", "3.rss"]
+    assert index.stats()["entries"] == 2
+
+
+def test_untracked_files_are_adopted_and_evictable(tmp_path, monkeypatch):
+    # 旧版本遗留的缓存文件和JSON索引
+    (tmp_path / LEGACY_INDEX_FILE).write_text("{}")
+    for i, name in enumerate(["old1.rss", "old2.rss"]):
+        (tmp_path / name).write_text(name)
+        os.utime(tmp_path / name, (time.time() - 100 + i, time.time() - 100 + i))
+    index = RssCacheIndex(str(tmp_path))
+    assert index.stats()["entries"] == 2
+    assert not (tmp_path / LEGACY_INDEX_FILE).exists()
+    # 未知来源的文件按聚合缓存处理，任一公众号更新时失效
+    assert index.invalidate("x") == 2
+    assert not list(tmp_path.glob("*.rss"))
+
+    (tmp_path / "old3.rss").write_text("x")
+    os.utime(tmp_path / "old3.rss", (1, 1))
+    real_get = cfg.get
+    monkeypatch.setattr(cfg, "get", lambda key, default=None: 1 if key == "cache.rss_max_entries" else real_get(key, default))
+    index = RssCacheIndex(str(tmp_path))
+    _write(index, tmp_path, "new.rss", feed_id="n")
+    assert [p.name for p in tmp_path.glob("*.rss")] == ["new.rss"]
+
+
+def test_concurrent_first_use_waits_for_scan(tmp_path, monkeypatch):
+    import threading
+    index = RssCacheIndex(str(tmp_path))
+    real_scan = index._scan
+    started = threading.Event()
+    scans = []
+
+    def slow_scan(conn):
+        scans.append(1)
+        started.set()
+        time.sleep(0.2)
+        real_scan(conn)
+        scans.append(2)
+    monkeypatch.setattr(index, "_scan", slow_scan)
+    first = threading.Thread(target=index._conn)
+    first.start()
+    assert started.wait(5)
+    index._conn()
+    # 第二个线程返回时扫描已经完成
+    assert scans == [1, 2]
+    first.join(5)
+    assert scans == [1, 2]
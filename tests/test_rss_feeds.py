@@ -0,0 +1,39 @@
+import re
+from datetime import datetime, timedelta
+from core.models import Feed
+
+
+def _add_feeds(db):
+    session = db.get_session()
+    base = datetime(2024, 1, 1)
+    for i, created_at in enumerate([base, None, base + timedelta(days=1), None, base]):
+        session.add(Feed(id=f"MP_WXS_P{i}", mp_name=f"分页{i}", mp_cover="c", mp_intro="i", status=1,
+                         faker_id="MQ==", created_at=created_at, updated_at=created_at))
+    session.commit()
+
+
+def test_feed_list_pages_are_stable(client, db, feed):
+    _add_feeds(db)
+    feeds = db.get_session().query(Feed).all()
+    # 创建时间倒序，为空的排在最后，相同时按id排序
+    dated = sorted(sorted((f for f in feeds if f.created_at), key=lambda f: f.id), key=lambda f: f.created_at, reverse=True)
+    expected = [f.id for f in dated] + sorted(f.id for f in feeds if not f.created_at)
+    seen = []
+    for offset in range(0, len(expected) + 2, 2):
+        r = client.get("/rss", params={"limit": 2, "offset": offset, "is_update": True})
+        assert r.status_code == 200
+        seen.extend(dict.fromkeys(re.findall(r"rss/(MP_WXS_\w+)", r.text)))
+    assert seen == expected
+
+
+def test_all_feed_excludes_unknown_feeds(client, db, feed):
+    db.add_articles([
+        {"id": "known", "mp_id": feed, "title": "有公众号", "url": "u", "pic_url": "", "content": "",
+         "publish_time": 1740000000},
+        {"id": "orphan", "mp_id": "MP_WXS_NOFEED", "title": "无公众号", "url": "u", "pic_url": "", "content": "",
+         "publish_time": 1740000001},
+    ])
+    r = client.get("/feed/all.json", params={"limit": 100})
+    titles = {item["title"] for item in r.json()["items"]}
+    assert "有公众号" in titles
+    assert "无公众号" not in titles
@@ -0,0 +1,76 @@
+import pytest
+from core.search import SEARCH, ngram_tokens, highlight, snippet, split_keywords
+
+URL = "/api/v1/wx/articles"
+
+
+def test_ngram_tokens():
+    assert ngram_tokens("北京大学 Python3") == ["北京", "京大", "大学", "python3"]
+    assert ngram_tokens("京") == ["京"]
+    assert split_keywords("北京-上海|  广州") == ["北京", "上海", "广州"]
+
+
+def test_match_query():
+    assert SEARCH.match_query("北京大学", "sqlite") == '"北京 京大 大学"'
+    assert SEARCH.match_query("py 北京", "sqlite") == '"py"* OR "北京"'
+    assert SEARCH.match_query('a"b', "mysql") == '"a b"'
+    assert SEARCH.needs_like("京")
+    assert SEARCH.needs_like("北京 京")
+    assert not SEARCH.needs_like("北京 py")
+
+
+def test_highlight_escapes_text_and_terms():
+    assert highlight("<b>北京</b>", ["北京"]) == "&lt;b&gt;<em>北京</em>&lt;/b&gt;"
+    assert highlight("a&b c.d", ["a&b", "."]) == "<em>a&amp;b</em> c<em>.</em>d"
+    # 检索词不会命中转义产生的实体
+    assert highlight("x & y", ["amp"]) == "x &amp; y"
+    assert highlight("a+b(", ["+b("]) == "a<em>+b(</em>"
+    assert highlight("<i>", []) == "&lt;i&gt;"
+    assert snippet("前" * 100 + "北京" + "后" * 100, ["北京"], size=20).startswith("...前")
+
+
+@pytest.fixture(scope="module")
+def articles(db, feed):
+    db.add_articles([
+        {"id": "s1", "mp_id": feed, "title": "去北京", "url": "u", "pic_url": "", "content": "<p>晴</p>",
+         "publish_time": 1730000001, "description": "今日"},
+        {"id": "s2", "mp_id": feed, "title": "上海新闻", "url": "u", "pic_url": "",
+         "content": "<p>正文提到南京路</p>", "publish_time": 1730000002, "description": "东方"},
+    ])
+
+
+def _titles(client, auth_headers, search):
+    r = client.get(URL, params={"search": search, "limit": 100}, headers=auth_headers)
+    assert r.status_code == 200
+    return {a["title"] for a in r.json()["data"]["list"]}
+
+
+def test_single_character_falls_back_to_like(client, auth_headers, articles):
+    titles = _titles(client, auth_headers, "京")
+    assert "去北京" in titles
+    assert "上海新闻" not in titles
+
+
+def test_fulltext_matches_content(client, auth_headers, articles):
+    assert "上海新闻" in _titles(client, auth_headers, "南京路")
+    r = client.get(URL, params={"search": "北京"}, headers=auth_headers)
+    item = next(a for a in r.json()["data"]["list"] if a["title"] == "去北京")
+    assert item["highlight"]["title"] == "去<em>北京</em>"
+
+
+def test_mysql_content_text_is_indexed(monkeypatch):
+    calls = []
+
+    class Conn:
+        class dialect:
+            name = "mysql"
+
+        def execute(self, statement, params=None):
+            calls.append((str(statement), params))
+    monkeypatch.setattr(SEARCH, "is_available", lambda bind: True)
+    SEARCH.index_rows(Conn(), [{"id": "m1", "title": "t", "content": "<p>北京&amp;上海</p>"}, {"id": "m2", "title": "t"}])
+    SEARCH.update_columns(Conn(), "m2", {"title": "t2"})
+    assert len(calls) == 1
+    statement, params = calls[0]
+    assert statement.startswith("UPDATE article_contents SET search_text")
+    assert params == [{"article_id": "m1", "search_text": " 北京&上海 "}]
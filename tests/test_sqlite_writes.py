@@ -0,0 +1,60 @@
+import threading
+from sqlalchemy import create_engine, event, update, Column, Integer, String
+from sqlalchemy.orm import declarative_base, sessionmaker
+from core.db import SQLITE_WRITE_LOCK, SerializedWriteSession
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+def _factory(tmp_path):
+    # 与性能模式相同：AUTOCOMMIT，锁等待超时极短，写入冲突会立即报错
+    engine = create_engine(f"sqlite:///{tmp_path / 'w.db'}", isolation_level="AUTOCOMMIT",
+                           pool_size=1, max_overflow=8, connect_args={"check_same_thread": False, "timeout": 0.01})
+    Base.metadata.create_all(engine)
+    return engine, sessionmaker(bind=engine, class_=SerializedWriteSession)
+
+
+def test_flush_and_dml_hold_write_lock(tmp_path):
+    engine, factory = _factory(tmp_path)
+    owned = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, stmt, *a: owned.append((stmt.split()[0], SQLITE_WRITE_LOCK._is_owned())))
+    session = factory()
+    session.add(Item(name="a"))
+    session.flush()
+    session.execute(update(Item).values(name="b"))
+    session.query(Item).filter(Item.name == "b").delete()
+    session.query(Item).all()
+    session.close()
+    assert [o for s, o in owned if s in ("INSERT", "UPDATE", "DELETE")] == [True, True, True]
+    assert [o for s, o in owned if s == "SELECT"] == [False]
+
+
+def test_concurrent_sessions_do_not_hit_database_locked(tmp_path):
+    engine, factory = _factory(tmp_path)
+    errors = []
+
+    def writer(n):
+        session = factory()
+        try:
+            for i in range(30):
+                session.add(Item(name=f"{n}-{i}"))
+                session.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.close()
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    session = factory()
+    assert session.query(Item).count() == 180
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from core.models import Article
+from core.models.tags import Tags
+from core.stats import STATS, ARTICLES, feed_key
+
+
+@pytest.fixture
+def counters(db):
+    STATS.reconcile(db)
+
+    def read(name, field="total"):
+        row = STATS.get(db.get_session(), name)
+        return getattr(row, field) if row is not None else None
+    return read
+
+
+def test_flush_and_counters_commit_together(db, counters):
+    statements = []
+    listener = lambda conn, cursor, stmt, *a: statements.append(stmt.split()[0])
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        session = db.get_session()
+        session.add(Tags(id="stats-tag", name="t", status=1, mps_id="[]"))
+        session.commit()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert [s for s in statements if s != "SELECT"] == ["BEGIN", "INSERT", "UPDATE", "COMMIT"]
+    assert counters("tags") == 1
+
+
+def test_failed_flush_rolls_back_counters(db, counters):
+    before = counters("tags")
+    session = db.get_session()
+    session.add(Tags(id="stats-tag-2", name="t", status=1, mps_id="[]"))
+    session.add(Tags(id="stats-tag-2-dup", name="t", status=1, mps_id="[]"))
+    session.flush()
+    session.commit()
+    session.add(Tags(id="stats-tag-3", name="t", status=1, mps_id="[]"))
+    session.add(Tags(id="stats-tag-2", name="t", status=1, mps_id="[]"))
+    with pytest.raises(IntegrityError):
+        session.flush()
+    session.rollback()
+    # 失败的flush中已执行的写入和计数一起回滚
+    assert session.get(Tags, "stats-tag-3") is None
+    assert counters("tags") == before + 2
+
+
+def test_delete_orphan_articles_updates_counters(db, counters):
+    gone = "MP_WXS_GONE"
+    db.add_articles([{"id": f"o{i}", "mp_id": gone, "title": "孤立", "url": "u", "pic_url": "",
+                      "content": "<p>x</p>" if i else "", "publish_time": 1730000000 + i} for i in range(3)])
+    total = counters(ARTICLES)
+    assert counters(feed_key(gone)) == 3
+    assert counters(feed_key(gone), "has_content") == 2
+    # 其他测试写入的无主文章也会一起删除
+    deleted = db.delete_orphan_articles()
+    assert deleted >= 3
+    assert counters(feed_key(gone)) == 0
+    assert counters(feed_key(gone), "has_content") == 0
+    assert counters(ARTICLES) == total - deleted
+    assert db.get_session().query(Article).filter(Article.mp_id == gone).count() == 0
+    # 与重新统计的结果一致
+    incremental = {f: counters(ARTICLES, f) for f in ("total", "active", "deleted", "has_content")}
+    STATS.reconcile(db)
+    assert incremental == {f: counters(ARTICLES, f) for f in ("total", "active", "deleted", "has_content")}
+
+
+def test_counter_failure_rolls_back_the_row(db, counters, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("counter")
+    monkeypatch.setattr(STATS, "table_delta", broken)
+    session = db.get_session()
+    session.add(Tags(id="stats-broken", name="t", status=1, mps_id="[]"))
+    with pytest.raises(RuntimeError):
+        session.commit()
+    session.rollback()
+    assert db.get_session().get(Tags, "stats-broken") is None
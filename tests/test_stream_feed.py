@@ -0,0 +1,52 @@
+import pytest
+import apis.rss
+from core.feed_cache import FEED_CACHE
+
+URL = "/feed/MP_WXS_TEST.json?limit=100"
+
+
+@pytest.fixture(scope="module")
+def articles(db, feed):
+    db.add_articles([{"id": f"st{i}", "mp_id": feed, "title": f"流式{i}", "url": "u", "pic_url": "",
+                      "content": f"<p>正文{i}</p>", "publish_time": 1730000000 + i, "description": "d"}
+                     for i in range(30)])
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    FEED_CACHE.clear()
+    yield
+    FEED_CACHE.clear()
+
+
+def test_streamed_feed_is_cached(client, articles):
+    first = client.get(URL)
+    assert first.status_code == 200
+    assert "etag" not in first.headers
+    cached = client.get(URL)
+    assert cached.text == first.text
+    etag = cached.headers["etag"]
+    assert client.get(URL, headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_error_before_first_batch_is_500(client, articles, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+        yield
+    monkeypatch.setattr(apis.rss, "feed_items", broken)
+    r = client.get(URL)
+    assert r.status_code == 500
+
+
+def test_error_after_first_batch_aborts(client, articles, monkeypatch):
+    feed_items = apis.rss.feed_items
+
+    def failing(*args, **kwargs):
+        for i, item in enumerate(feed_items(*args, **kwargs)):
+            if i == 25:
+                raise RuntimeError("boom")
+            yield item
+    monkeypatch.setattr(apis.rss, "feed_items", failing)
+    with pytest.raises(RuntimeError):
+        client.get(URL)
+    assert FEED_CACHE.stats()["entries"] == 0
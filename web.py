@@ -57,6 +57,23 @@ async def add_custom_header(request: Request, call_next):
     response.headers["GITHUB"] = "https://github.com/rachelos/we-mp-rss"
     response.headers["Server"] = cfg.get("app_name", "WeRSS")
     return response
+@app.on_event("startup")
+async def init_executor():
+    # 同步路由线程池大小及调试模式下的事件循环阻塞检测
+    from core.blocking import configure_threadpool,start_loop_block_detector
+    configure_threadpool()
+    start_loop_block_detector()
+    # 图片缓存后台清理
+    from core.image_cache import IMAGES
+    IMAGES.start_sweeper()
+@app.on_event("shutdown")
+async def close_clients():
+    # 释放共享的HTTP连接池
+    from core.http_client import close_http_client
+    await close_http_client()
+    # 关闭图片转换进程池
+    from core.image_resize import IMAGE_RESIZER
+    IMAGE_RESIZER.shutdown()
 # 创建API路由分组
 api_router = APIRouter(prefix=f"{API_BASE}")
 api_router.include_router(auth_router)
@@ -85,7 +102,7 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 from core.res.avatar import files_dir
 app.mount("/files", StaticFiles(directory=files_dir), name="files")
 @app.get("/{path:path}",tags=['默认'],include_in_schema=False)
-async def serve_vue_app(request: Request, path: str):
+def serve_vue_app(request: Request, path: str):
     """处理Vue应用路由"""
     # 排除API和静态文件路由
     if path.startswith(('api', 'assets', 'static')) or path in ['favicon.ico','vite.svg','logo.svg']:
@@ -99,6 +116,6 @@ async def serve_vue_app(request: Request, path: str):
     return {"error": "Not Found"}, 404
 
 @app.get("/",tags=['默认'],include_in_schema=False)
-async def serve_root(request: Request):
+def serve_root(request: Request):
     """处理根路由"""
-    return await serve_vue_app(request, "")
\ No newline at end of file
+    return serve_vue_app(request, "")
\ No newline at end of file